@@ -0,0 +1,58 @@
+# Throughput of the utilities.analytics kernels on synthetic readings.
+# Usage: python benchmarks/analytics_benchmark.py [--readings 1000000]
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'utility_management.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from utilities import analytics  # noqa: E402
+
+
+def synthetic_series(count, seed=7):
+    # About three years of readings at random times, four utility types
+    rng = np.random.default_rng(seed)
+    start = 1672531200  # 2023-01-01
+    timestamps = np.sort(rng.integers(start, start + 3 * 365 * analytics.SECONDS_PER_DAY, count))
+    usage = rng.gamma(2.0, 50.0, count)
+    type_codes = rng.integers(0, len(analytics.TYPE_CODES), count).astype(np.int8)
+    return analytics.UsageSeries(timestamps, usage, type_codes)
+
+
+def timed(label, count, func, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<28} {best * 1000:9.2f} ms  {count / best / 1e6:8.1f} M readings/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--readings', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    series = synthetic_series(args.readings)
+    print(f"{args.readings:,} synthetic readings")
+    for period in analytics.PERIODS:
+        timed(f"resample ({period})", len(series), lambda: analytics.resample(series, period))
+    daily = analytics.resample(series, 'day')
+    timed("percentile bands (day)", len(series),
+          lambda: analytics.percentile_bands(daily['index'], series.usage, len(daily['codes'])))
+    timed("moving average (7 day)", len(series), lambda: analytics.moving_average(daily['total'], 7))
+    timed("full chart (day)", len(series), lambda: analytics.usage_chart(series, 'day'))
+    timed("full chart (gas, month)", len(series), lambda: analytics.usage_chart(series.only('gas'), 'month'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# Cost of turning model rows into DynamoDB items (both tables) and SQS task
+# messages: the old per-layer dicts and conversions versus one UtilityRecord
+# per reading. Also compares the memory held by a chunk of readings.
+# Usage: python benchmarks/record_benchmark.py [--readings 100000]
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from python_library.utility_messages import build_task_message  # noqa: E402
+from python_library.utility_record import UtilityRecord, timeseries_key  # noqa: E402
+
+TYPES = ('electricity', 'gas', 'steam', 'air_conditioning')
+
+
+def synthetic_rows(count):
+    # Stand-ins for utilities.models.Utility instances
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [SimpleNamespace(pk=i, user_id=7, type=TYPES[i % 4], usage=10 + i % 997 / 7,
+                            date=start + timedelta(minutes=i), notes='')
+            for i in range(count)]
+
+
+def dict_path(rows):
+    # What the importer/outbox did before: a payload dict per layer, each
+    # converting usage (to the stored Decimal), ids and dates again
+    records = [{'utility_id': u.pk, 'user_id': u.user_id, 'type': u.type, 'usage': u.usage,
+                'date': str(u.date), 'notes': u.notes} for u in rows]
+    for r in records:
+        {'utility_id': str(r['utility_id']), 'type': r['type'], 'usage': Decimal(str(r['usage'])),
+         'date': r['date'], 'notes': r['notes']}
+    for r in records:
+        item = dict(r)
+        item.update({'utility_id': str(r['utility_id']), 'type': r['type'], 'usage': Decimal(str(r['usage'])),
+                     'date': r['date'], 'notes': r['notes']})
+        item.update(timeseries_key(r['user_id'], r['type'], r['date'], item['utility_id']))
+    for u in rows:
+        build_task_message('utility.created', u.pk, u.type, u.usage, u.date, 'user@example.com')
+
+
+def record_path(rows):
+    records = [UtilityRecord.from_model(u) for u in rows]
+    for record in records:
+        record.to_item()
+    for record in records:
+        record.to_item(timeseries=True)
+    for record in records:
+        record.to_message('utility.created', 'user@example.com')
+
+
+def timed(label, count, func, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<28} {best * 1000:9.2f} ms  {count / best / 1e6:8.2f} M readings/s")
+
+
+def held_bytes(build):
+    tracemalloc.start()
+    held = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--readings', type=int, default=100_000)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.readings)
+    print(f"{args.readings:,} synthetic readings")
+    timed("dicts per layer", len(rows), lambda: dict_path(rows))
+    timed("UtilityRecord", len(rows), lambda: record_path(rows))
+
+    as_dicts = held_bytes(lambda: [{'utility_id': str(u.pk), 'user_id': str(u.user_id), 'type': u.type,
+                                    'usage': float(u.usage), 'date': str(u.date), 'notes': u.notes}
+                                   for u in rows])
+    as_records = held_bytes(lambda: [UtilityRecord.from_model(u) for u in rows])
+    print(f"{'held as dicts':<28} {as_dicts / len(rows):9.1f} bytes/reading")
+    print(f"{'held as UtilityRecords':<28} {as_records / len(rows):9.1f} bytes/reading")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# Cold-start cost of the Django project: django.setup() plus resolving a URL,
+# measured in fresh interpreters so nothing is already imported or cached.
+# Also reports which heavy optional modules got imported along the way.
+# Usage: python benchmarks/startup_benchmark.py [--runs 15] [--root /path/to/checkout]
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+from django.urls import resolve
+resolve('/')
+resolve('/api/summary/')
+end = time.perf_counter()
+heavy = ('boto3', 'botocore.config', 's3transfer', 'numpy', 'msgpack')
+print(json.dumps({
+    'setup': (setup_done - start) * 1000,
+    'resolve': (end - setup_done) * 1000,
+    'total': (end - start) * 1000,
+    'loaded': [name for name in heavy if name in sys.modules],
+}))
+"""
+
+
+def run_once(root):
+    env = dict(os.environ, PYTHONPATH=root, DJANGO_SETTINGS_MODULE='utility_management.settings')
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=root, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=15)
+    parser.add_argument('--root', default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        help="Project checkout to measure (defaults to this one)")
+    args = parser.parse_args()
+
+    run_once(args.root)  # warm the OS file cache and .pyc files
+    results = [run_once(args.root) for _ in range(args.runs)]
+    print(f"{args.runs} cold starts of {args.root}")
+    for key in ('setup', 'resolve', 'total'):
+        values = [r[key] for r in results]
+        print(f"{key:<10} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms")
+    print(f"heavy modules imported: {', '.join(results[-1]['loaded']) or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
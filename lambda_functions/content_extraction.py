@@ -0,0 +1,180 @@
+# Streaming extraction of meter readings from uploaded CSV / JSON exports.
+# The object is read with ranged get_object calls (RANGE_SIZE bytes at a
+# time), decoded and parsed incrementally, and the readings are written to
+# UtilityRecords2025 through one batch_writer, so memory stays bounded by a
+# range plus one DynamoDB batch however large the export is.
+#
+# CSV columns follow the Django bulk importer: type, usage, date, notes
+# (type may be left out when the upload path says it, e.g. uploads/gas/...).
+# JSON may be an array of objects or newline-delimited objects with the same
+# field names.
+
+import codecs
+import contextlib
+import csv
+import hashlib
+import json
+import math
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+
+RANGE_SIZE = 8 * 1024 * 1024
+RECORDS_TABLE = 'UtilityRecords2025'
+# Per-user copy keyed by user_id / "date#utility_id"; only written when the
+# upload names its user
+TIMESERIES_TABLE = 'UtilityReadings2025'
+# A single JSON row larger than this means the file is not what we expect
+MAX_JSON_VALUE_CHARS = 1024 * 1024
+UTILITY_TYPES = ('electricity', 'gas', 'steam', 'air_conditioning')
+
+EXTENSION_FORMATS = {'.csv': 'csv', '.json': 'json', '.ndjson': 'json', '.jsonl': 'json'}
+CONTENT_TYPE_FORMATS = {'text/csv': 'csv', 'application/json': 'json', 'application/x-ndjson': 'json'}
+
+
+def detect_format(key, content_type):
+    # 'csv', 'json' or None for files we do not read (PDFs, images, ...)
+    extension = os.path.splitext(key)[1].lower()
+    if extension in EXTENSION_FORMATS:
+        return EXTENSION_FORMATS[extension]
+    return CONTENT_TYPE_FORMATS.get((content_type or '').split(';')[0].strip().lower())
+
+
+def iter_ranges(s3, bucket, key, size, etag=None, range_size=RANGE_SIZE):
+    # Yields the object's bytes one ranged GET at a time; IfMatch stops us
+    # stitching together two versions if the object is replaced mid-read
+    for start in range(0, size, range_size):
+        end = min(start + range_size, size) - 1
+        params = {'Bucket': bucket, 'Key': key, 'Range': f'bytes={start}-{end}'}
+        if etag:
+            params['IfMatch'] = etag
+        yield s3.get_object(**params)['Body'].read()
+
+
+def iter_text(chunks):
+    # Incremental UTF-8 decoding (BOM dropped); multi-byte characters split
+    # across ranges are carried over by the decoder
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def iter_lines(texts):
+    pending = ''
+    for text in texts:
+        lines = (pending + text).splitlines(keepends=True)
+        pending = lines.pop() if lines and not lines[-1].endswith(('\n', '\r')) else ''
+        yield from lines
+    if pending:
+        yield pending
+
+
+def iter_json_values(texts):
+    # Top-level values of a JSON array, or of newline/whitespace separated
+    # JSON documents, decoded as soon as each one is complete
+    decoder = json.JSONDecoder()
+    buffer, pos, in_array = '', 0, None
+    for text in texts:
+        buffer = buffer[pos:] + text
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if in_array is None:
+                in_array = buffer[pos] == '['
+                if in_array:
+                    pos += 1
+                    continue
+            if in_array and buffer[pos] == ']':
+                pos += 1
+                continue
+            try:
+                value, pos = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                if len(buffer) - pos > MAX_JSON_VALUE_CHARS:
+                    raise ValueError(f"Malformed JSON near character {pos}")
+                break  # incomplete value, wait for the next range
+            yield value
+    if buffer[pos:].strip(' \t\r\n,]'):
+        raise ValueError("Truncated or malformed JSON at end of file")
+
+
+def iter_rows(file_format, texts):
+    if file_format == 'csv':
+        return csv.DictReader(iter_lines(texts))
+    return iter_json_values(texts)
+
+
+def parse_reading(row, default_type):
+    # (type, usage, date, notes) in the format the app writes to the same
+    # tables: usage as a Decimal, the date as str() of an aware UTC datetime
+    # (naive dates are taken as UTC, like the app's bulk importer).
+    # Raises ValueError for rows we cannot use.
+    if not isinstance(row, dict):
+        raise ValueError("row is not an object")
+    utility_type = str(row.get('type') or default_type or '').strip().lower()
+    if utility_type not in UTILITY_TYPES:
+        raise ValueError(f"unknown type '{utility_type}'")
+    usage = float(row.get('usage'))
+    if not math.isfinite(usage):
+        raise ValueError(f"invalid usage '{row.get('usage')}'")
+    date = datetime.fromisoformat(str(row.get('date') or '').strip())
+    date = date.replace(tzinfo=timezone.utc) if date.tzinfo is None else date.astimezone(timezone.utc)
+    return utility_type, Decimal(str(usage)), str(date), str(row.get('notes') or '').strip()
+
+
+def extract_readings(s3, dynamodb, details, range_size=RANGE_SIZE):
+    # Streams one uploaded file into UtilityRecords2025 (and UtilityReadings2025
+    # when the user is known); returns counts.
+    # Item ids are derived from (bucket, key, etag) and the row number, so a
+    # retried extraction overwrites instead of duplicating.
+    file_format = detect_format(details['key'], details.get('file_type'))
+    if file_format is None:
+        return None
+    source = f"{details['bucket']}/{details['key']}:{details.get('etag', '')}"
+    prefix = 'file-' + hashlib.sha1(source.encode()).hexdigest()[:16]
+    default_type = details.get('utility_type') if details.get('utility_type') in UTILITY_TYPES else None
+    readings = skipped = 0
+
+    chunks = iter_ranges(s3, details['bucket'], details['key'], details['size'], details.get('etag'), range_size)
+    user_id = str(details['user_id']) if details.get('user_id') else None
+    with contextlib.ExitStack() as stack:
+        batch = stack.enter_context(dynamodb.Table(RECORDS_TABLE).batch_writer(overwrite_by_pkeys=['utility_id']))
+        timeseries = None
+        if user_id:
+            timeseries = stack.enter_context(
+                dynamodb.Table(TIMESERIES_TABLE).batch_writer(overwrite_by_pkeys=['user_id', 'date_id']))
+        for row_number, row in enumerate(iter_rows(file_format, iter_text(chunks)), start=1):
+            try:
+                utility_type, usage, date, notes = parse_reading(row, default_type)
+            except (TypeError, ValueError):
+                skipped += 1
+                continue
+            item = {
+                'utility_id': f'{prefix}-{row_number}',
+                'type': utility_type,
+                'usage': usage,
+                'date': date,
+                'notes': notes,
+                'source_key': details['key'],
+                'source_row': row_number,
+            }
+            if user_id:
+                item['user_id'] = user_id
+            batch.put_item(Item=item)
+            if timeseries:
+                timeseries.put_item(Item=dict(
+                    item,
+                    date_id=f"{date}#{item['utility_id']}",
+                    user_type=f'{user_id}#{utility_type}',
+                ))
+            readings += 1
+    print(f"Extracted {readings} readings from {details['key']} ({skipped} rows skipped)")
+    return {'readings': readings, 'skipped': skipped}
@@ -1,71 +1,142 @@
 import json
+import time
+import uuid
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import unquote_plus
 from datetime import datetime
+from content_extraction import extract_readings
 
-s3 = boto3.client('s3')  # S3 client for file metadata checks
+# Files in one event are looked up in parallel, at most this many at a time
+HEAD_OBJECT_CONCURRENCY = 16
+# CSV/JSON exports are read in parallel too; each one holds at most one
+# RANGE_SIZE chunk plus a DynamoDB batch in memory
+EXTRACT_CONCURRENCY = 4
+
+s3 = boto3.client('s3', config=Config(max_pool_connections=HEAD_OBJECT_CONCURRENCY))  # S3 client for file metadata checks
 sns = boto3.client('sns')  # SNS client to send system notifications
 dynamodb = boto3.resource('dynamodb')  # DynamoDB for log storage
 
 SNS_TOPIC_ARN = 'arn:aws:sns:us-east-1:263072075949:utility-alerts-topic-2025'  # Our SNS topic ARN
+UPLOADS_TABLE = 'UtilityFileUploads2025'
+MAX_SUMMARY_LINES = 50  # SNS messages are capped at 256 KB, keep the summary short
+# The function's configured timeout (Lambda allows at most 900 s). A claim that
+# is still unprocessed after this long belongs to an invocation that died, so
+# a later delivery of the same upload may take it over.
+FUNCTION_TIMEOUT_SECONDS = 900
 
 def lambda_handler(event, context):
     print(f"Lambda triggered with event: {json.dumps(event)}")
-    processed_files = []  # List to capture all processed file keys
 
-    # Check if triggered programmatically (e.g., via Django app, not just S3 event)
-    if 'bucket' in event and 'key' in event:
-        bucket = event['bucket']
-        key = event['key']
-        if key:
-            key = unquote_plus(key)  # Handles URL-encoded S3 keys
-        print(f"Processing file (direct trigger): s3://{bucket}/{key}")
-        try:
-            file_metadata = s3.head_object(Bucket=bucket, Key=key)  # Look up details for file
-            file_size = file_metadata['ContentLength']
-            file_type = file_metadata.get('ContentType', 'unknown')
-            print(f"File size: {file_size} bytes")
-            print(f"File type: {file_type}")
-            utility_type = determine_utility_type(key)  # Guess utility based on filename
-            print(f"Detected utility type: {utility_type}")
-            send_file_notification(bucket, key, file_size, file_type, utility_type)  # Alert via SNS
-            log_file_upload(bucket, key, file_size, file_type, utility_type)  # Store info in DynamoDB table
-            processed_files.append(key)
-        except Exception as e:
-            print(f"Error processing file {key}: {str(e)}")
-
-    # If triggered by an S3 upload event, loop through all records
-    elif 'Records' in event:
-        for record in event['Records']:
-            bucket = record['s3']['bucket']['name']
-            key = unquote_plus(record['s3']['object']['key'])
-            print(f"Processing file (S3 event): s3://{bucket}/{key}")
-            try:
-                file_metadata = s3.head_object(Bucket=bucket, Key=key)
-                file_size = file_metadata['ContentLength']
-                file_type = file_metadata.get('ContentType', 'unknown')
-                print(f"File size: {file_size} bytes")
-                print(f"File type: {file_type}")
-                utility_type = determine_utility_type(key)
-                print(f"Detected utility type: {utility_type}")
-                send_file_notification(bucket, key, file_size, file_type, utility_type)
-                log_file_upload(bucket, key, file_size, file_type, utility_type)
-                processed_files.append(key)
-            except Exception as e:
-                print(f"Error processing file {key}: {str(e)}")
-                continue
-    else:
+    targets = event_targets(event)
+    if targets is None:
         print("Unsupported event format.")
+        targets = []
+
+    # Concurrent head_object + conditional log write per file, then one SNS
+    # message per invocation for the files this invocation claimed. The Django
+    # app invokes us directly and S3 notifies us for the same upload; whichever
+    # arrives second finds the (bucket, key, etag) row already claimed and stops.
+    # A claim is only marked processed once extraction and the notification
+    # succeeded; otherwise it is released so a retry can do the work.
+    files, duplicates, failed = process_files(targets)
+    extracted = extract_files(files)
+    released = [f for f in files if 'error' in (extracted.get(f['key']) or {})]
+    files = [f for f in files if f not in released]
+    if files and not send_summary_notification(files):
+        released, files = released + files, []
+    for f in released:
+        release_file_upload(f)
+    for f in files:
+        mark_file_processed(f)
+    failed += [f['key'] for f in released]
 
     return {
         'statusCode': 200,
         'body': json.dumps({
             'message': 'Files processed successfully',
-            'processed_files': processed_files,
-            'count': len(processed_files)
+            'processed_files': [f['key'] for f in files],
+            'duplicate_files': duplicates,
+            'failed_files': failed,
+            'extracted': extracted,
+            'count': len(files)
         })
     }
 
+def event_targets(event):
+    # [(bucket, key, user_id)] for a direct trigger (e.g. the Django app) or an
+    # S3 event (user_id None, see describe_file); None if neither
+    if 'bucket' in event and 'key' in event:
+        key = unquote_plus(event['key']) if event['key'] else event['key']  # Handles URL-encoded S3 keys
+        print(f"Processing file (direct trigger): s3://{event['bucket']}/{key}")
+        return [(event['bucket'], key, event.get('user_id'))]
+    if 'Records' in event:
+        targets = []
+        for record in event['Records']:
+            bucket = record['s3']['bucket']['name']
+            key = unquote_plus(record['s3']['object']['key'])
+            print(f"Processing file (S3 event): s3://{bucket}/{key}")
+            targets.append((bucket, key, None))
+        return targets
+    return None
+
+def describe_file(target):
+    # head_object plus the derived utility type for one (bucket, key, user_id)
+    bucket, key, user_id = target
+    file_metadata = s3.head_object(Bucket=bucket, Key=key)  # Look up details for file
+    details = {
+        'bucket': bucket,
+        'key': key,
+        # S3 events carry no user; uploads may name one in x-amz-meta-user-id
+        'user_id': user_id or file_metadata.get('Metadata', {}).get('user-id'),
+        'etag': file_metadata.get('ETag', '').strip('"'),
+        'size': file_metadata['ContentLength'],
+        'file_type': file_metadata.get('ContentType', 'unknown'),
+        'utility_type': determine_utility_type(key),  # Guess utility based on filename
+    }
+    print(f"{key}: {details['size']} bytes, {details['file_type']}, utility type {details['utility_type']}")
+    return details
+
+def process_files(targets):
+    # Returns (details of newly claimed files, duplicate keys, failed keys)
+    if not targets:
+        return [], [], []
+    timestamp = datetime.now().isoformat()
+
+    def attempt(target):
+        try:
+            details = describe_file(target)
+            return ('new' if claim_file_upload(details, timestamp) else 'duplicate'), details
+        except Exception as e:
+            print(f"Error processing file {target[1]}: {str(e)}")
+            return 'failed', None
+
+    workers = min(HEAD_OBJECT_CONCURRENCY, len(targets))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(attempt, targets))  # map keeps the event's order
+    files = [details for outcome, details in results if outcome == 'new']
+    duplicates = [target[1] for target, (outcome, _) in zip(targets, results) if outcome == 'duplicate']
+    failed = [target[1] for target, (outcome, _) in zip(targets, results) if outcome == 'failed']
+    return files, duplicates, failed
+
+def extract_files(files):
+    # Streams readings out of newly claimed CSV/JSON exports into
+    # UtilityRecords2025; returns {key: counts} for the files that were read
+    def attempt(details):
+        try:
+            return extract_readings(s3, dynamodb, details)
+        except Exception as e:
+            print(f"Error extracting readings from {details['key']}: {str(e)}")
+            return {'error': str(e)}
+
+    if not files:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(EXTRACT_CONCURRENCY, len(files))) as executor:
+        results = list(executor.map(attempt, files))
+    return {details['key']: result for details, result in zip(files, results) if result is not None}
+
 def determine_utility_type(filename):
     # Try to guess type of utility by looking for keywords in the filename or S3 path
     filename_lower = filename.lower()
@@ -115,22 +186,106 @@ def send_file_notification(bucket, key, size, file_type, utility_type):
         print(f"Error sending notification: {str(e)}")
         return False
 
-def log_file_upload(bucket, key, size, file_type, utility_type):
-    # Store details about the new upload in our DynamoDB table for tracking/reporting
+def send_summary_notification(files):
+    # A single file keeps the detailed message; several files share one summary
+    if len(files) == 1:
+        f = files[0]
+        return send_file_notification(f['bucket'], f['key'], f['size'], f['file_type'], f['utility_type'])
     try:
-        table = dynamodb.Table('UtilityFileUploads2025')
-        table.put_item(Item={
-            'file_key': key,
-            'bucket': bucket,
-            'file_size': size,
-            'file_type': file_type,
-            'utility_type': utility_type,
-            'upload_timestamp': datetime.now().isoformat(),
-            'status': 'uploaded',
-            'processed': False
-        })
-        print(f"Upload logged to DynamoDB")
+        total_kb = round(sum(f['size'] for f in files) / 1024, 2)
+        lines = [
+            f"- s3://{f['bucket']}/{f['key']} ({f['utility_type'].replace('_', ' ').title()}, "
+            f"{round(f['size'] / 1024, 2)} KB, {f['file_type']})"
+            for f in files[:MAX_SUMMARY_LINES]
+        ]
+        if len(files) > MAX_SUMMARY_LINES:
+            lines.append(f"... and {len(files) - MAX_SUMMARY_LINES} more")
+        message = (
+            f"{len(files)} NEW UTILITY FILES UPLOADED ({total_kb} KB in total)\n"
+            + "\n".join(lines) + "\n"
+            f"The files have been successfully stored and are ready for processing.\n"
+            f"Utility Management System\n"
+            f"Automated notification from AWS Lambda"
+        )
+        sns.publish(
+            TopicArn=SNS_TOPIC_ARN,
+            Subject=f"{len(files)} New Utility Files Uploaded",
+            Message=message
+        )
+        print(f"Summary notification sent for {len(files)} files")
         return True
     except Exception as e:
-        print(f"Could not log to DynamoDB: {str(e)}")
+        print(f"Error sending notification: {str(e)}")
+        return False
+
+def claim_file_upload(details, timestamp):
+    # Logs the upload in DynamoDB unless this exact object version (bucket, key,
+    # etag) is already there, processed or still being worked on. Returns False
+    # for a duplicate delivery. A conditional write cannot go through
+    # batch_writer, but it runs on the same thread pool as head_object.
+    # details['claim_id'] identifies our claim for mark/release below.
+    table = dynamodb.Table(UPLOADS_TABLE)
+    details['claim_id'] = str(uuid.uuid4())
+    now = int(time.time())
+    try:
+        table.put_item(
+            Item={
+                'file_key': details['key'],
+                'bucket': details['bucket'],
+                'etag': details['etag'],
+                'file_size': details['size'],
+                'file_type': details['file_type'],
+                'utility_type': details['utility_type'],
+                'upload_timestamp': timestamp,
+                'status': 'uploaded',
+                'processed': False,
+                'claim_id': details['claim_id'],
+                'claimed_at': now,
+            },
+            # A new object version under the same key (re-upload) still goes
+            # through, and so does a retry once an unfinished claim has outlived
+            # any invocation that could still be holding it
+            ConditionExpression=('attribute_not_exists(file_key) OR #b <> :bucket OR etag <> :etag'
+                                 ' OR (#p = :false AND claimed_at < :stale)'),
+            ExpressionAttributeNames={'#b': 'bucket', '#p': 'processed'},
+            ExpressionAttributeValues={':bucket': details['bucket'], ':etag': details['etag'],
+                                       ':false': False, ':stale': now - FUNCTION_TIMEOUT_SECONDS},
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            print(f"Already claimed: s3://{details['bucket']}/{details['key']} ({details['etag']})")
+            return False
+        raise
+    print(f"Upload logged to DynamoDB: {details['key']}")
+    return True
+
+def mark_file_processed(details):
+    # Only our own claim is updated: if it went stale and another invocation
+    # took it over, that invocation records the outcome
+    try:
+        dynamodb.Table(UPLOADS_TABLE).update_item(
+            Key={'file_key': details['key']},
+            UpdateExpression='SET #p = :true, #s = :status',
+            ConditionExpression='claim_id = :claim',
+            ExpressionAttributeNames={'#p': 'processed', '#s': 'status'},
+            ExpressionAttributeValues={':true': True, ':status': 'processed', ':claim': details['claim_id']},
+        )
+        return True
+    except ClientError as e:
+        print(f"Could not mark {details['key']} processed: {str(e)}")
+        return False
+
+def release_file_upload(details):
+    # Drops our claim after a failure so the next delivery of this upload
+    # (S3 retry, the app's direct trigger, a manual re-run) starts over
+    try:
+        dynamodb.Table(UPLOADS_TABLE).delete_item(
+            Key={'file_key': details['key']},
+            ConditionExpression='claim_id = :claim',
+            ExpressionAttributeValues={':claim': details['claim_id']},
+        )
+        print(f"Released claim on {details['key']}")
+        return True
+    except ClientError as e:
+        print(f"Could not release claim on {details['key']}: {str(e)}")
         return False
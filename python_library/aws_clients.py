@@ -0,0 +1,103 @@
+# Process-wide registry of boto3 clients and resources.
+# Clients are created on first use, shared by every caller in the process and
+# configured in one place (connection pool size, retries, timeouts), instead of
+# each module building its own default client at import time. boto3 clients
+# are thread-safe once built, but building them is not, so creation is
+# serialized on a lock. The registry notices when it is running in a forked
+# child (gunicorn --preload, multiprocessing) and starts over there rather than
+# sharing the parent's sockets.
+#
+# boto3 and botocore.config are imported on the first client request, not with
+# this module: together they take a couple of hundred ms to import, which every
+# Django worker, management command and test run would otherwise pay even when
+# it never talks to AWS. See benchmarks/startup_benchmark.py.
+
+import os
+import threading
+
+AWS_DEFAULT_REGION = os.environ.get('AWS_DEFAULT_REGION', 'us-east-1')
+# boto3 defaults to 10 pooled connections per client, which the upload, SQS
+# producer/consumer and outbox thread pools easily exceed
+AWS_MAX_POOL_CONNECTIONS = 50
+AWS_CONNECT_TIMEOUT = 5
+AWS_READ_TIMEOUT = 60
+AWS_RETRY_MODE = 'standard'
+AWS_MAX_ATTEMPTS = 5  # including the first try
+
+_settings = {
+    'max_pool_connections': AWS_MAX_POOL_CONNECTIONS,
+    'connect_timeout': AWS_CONNECT_TIMEOUT,
+    'read_timeout': AWS_READ_TIMEOUT,
+    'retry_mode': AWS_RETRY_MODE,
+    'max_attempts': AWS_MAX_ATTEMPTS,
+}
+_registry = {}
+_session = None
+_lock = threading.Lock()
+_pid = os.getpid()
+
+
+def configure(**options):
+    # Override pool/retry/timeout settings (keys as in _settings); clients
+    # created before the call are dropped so the next lookup uses the new values
+    unknown = set(options) - set(_settings)
+    if unknown:
+        raise ValueError(f"Unknown AWS client option(s): {', '.join(sorted(unknown))}")
+    with _lock:
+        _settings.update(options)
+        _registry.clear()
+
+
+def client_config(**overrides):
+    from botocore.config import Config
+    options = dict(_settings, **overrides)
+    return Config(
+        max_pool_connections=options['max_pool_connections'],
+        connect_timeout=options['connect_timeout'],
+        read_timeout=options['read_timeout'],
+        retries={'mode': options['retry_mode'], 'total_max_attempts': options['max_attempts']},
+    )
+
+
+def _check_fork():
+    # In a forked child, forget everything inherited from the parent, including
+    # a lock another parent thread may have been holding at fork time
+    global _pid, _session, _lock
+    if _pid != os.getpid():
+        _pid = os.getpid()
+        _session = None
+        _lock = threading.Lock()
+        _registry.clear()
+
+
+def _get(kind, service, region, overrides):
+    _check_fork()
+    key = (kind, service, region or AWS_DEFAULT_REGION, tuple(sorted(overrides.items())))
+    instance = _registry.get(key)
+    if instance is not None:
+        return instance
+    global _session
+    with _lock:
+        instance = _registry.get(key)
+        if instance is None:
+            if _session is None:
+                import boto3.session
+                _session = boto3.session.Session()
+            factory = _session.client if kind == 'client' else _session.resource
+            instance = factory(service, region_name=key[2], config=client_config(**overrides))
+            _registry[key] = instance
+    return instance
+
+
+def get_client(service, region=None, **overrides):
+    return _get('client', service, region, overrides)
+
+
+def get_resource(service, region=None, **overrides):
+    return _get('resource', service, region, overrides)
+
+
+def reset():
+    # Drops every cached client/resource (e.g. after changing credentials)
+    with _lock:
+        _registry.clear()
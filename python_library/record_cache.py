@@ -0,0 +1,138 @@
+# Read-through cache for DynamoDB utility records.
+# Two tiers: a per-process LRU with a short TTL, and optionally a shared
+# backend (a Django cache such as Redis/memcached, or anything with the same
+# get_many/set_many/delete_many methods) so all workers benefit from one fetch.
+# Writes made through UtilityAWS / utility_database invalidate both tiers.
+# Another process's local tier only learns about a write when its entry
+# expires, so `ttl` is the bound on cross-process staleness; keep it short.
+# The shared tier is deleted on every write, but a read racing a write in
+# another process can put the old item back for up to `shared_ttl`.
+#
+# Only found items are cached: a record that is not in DynamoDB yet (the
+# outbox mirrors writes asynchronously) is looked up again next time.
+
+import threading
+import time
+from collections import OrderedDict
+
+RECORD_CACHE_TTL = 30
+RECORD_CACHE_MAX_ENTRIES = 10000
+RECORD_CACHE_SHARED_TTL = 300
+RECORD_CACHE_KEY_PREFIX = 'utility-record'
+
+
+class RecordCache:
+    def __init__(self, ttl=RECORD_CACHE_TTL, max_entries=RECORD_CACHE_MAX_ENTRIES, shared=None,
+                 shared_ttl=RECORD_CACHE_SHARED_TTL):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared = shared
+        self.shared_ttl = shared_ttl
+        self._entries = OrderedDict()  # (table, id) -> (item, expires), oldest first
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; a fetch that overlapped one does not
+        # fill the cache, so a slow read cannot bring back a deleted record
+        self._generation = 0
+        self.stats = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def configure(self, ttl=None, max_entries=None, shared=None, shared_ttl=None):
+        with self._lock:
+            if ttl is not None:
+                self.ttl = ttl
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if shared_ttl is not None:
+                self.shared_ttl = shared_ttl
+            self.shared = shared
+            self._entries.clear()
+
+    def _shared_key(self, table_name, utility_id):
+        return f'{RECORD_CACHE_KEY_PREFIX}:{table_name}:{utility_id}'
+
+    def generation(self):
+        return self._generation
+
+    def get_many(self, table_name, utility_ids):
+        # {utility_id: item} for the ids found in either tier; the rest are
+        # counted as misses and left for the caller to fetch
+        found, missing = {}, []
+        now = time.monotonic()
+        with self._lock:
+            for utility_id in utility_ids:
+                entry = self._entries.get((table_name, utility_id))
+                if entry and entry[1] > now:
+                    self._entries.move_to_end((table_name, utility_id))
+                    found[utility_id] = dict(entry[0])
+                    self.stats['hits'] += 1
+                else:
+                    missing.append(utility_id)
+        if missing and self.shared is not None:
+            generation = self._generation
+            keys = {self._shared_key(table_name, utility_id): utility_id for utility_id in missing}
+            try:
+                shared_items = self.shared.get_many(list(keys))
+            except Exception as e:
+                print(f"Record cache read error: {e}")
+                shared_items = {}
+            for key, item in shared_items.items():
+                found[keys[key]] = dict(item)
+            with self._lock:
+                self.stats['shared_hits'] += len(shared_items)
+            self._fill_local(table_name, {keys[key]: item for key, item in shared_items.items()}, generation)
+            missing = [utility_id for utility_id in missing if utility_id not in found]
+        with self._lock:
+            self.stats['misses'] += len(missing)
+        return found
+
+    def get(self, table_name, utility_id):
+        return self.get_many(table_name, [utility_id]).get(utility_id)
+
+    def set_many(self, table_name, items, generation):
+        # items: {utility_id: item} fetched from DynamoDB after generation()
+        # returned `generation`
+        if not items or not self._fill_local(table_name, items, generation):
+            return
+        if self.shared is not None:
+            try:
+                self.shared.set_many({self._shared_key(table_name, utility_id): item
+                                      for utility_id, item in items.items()}, self.shared_ttl)
+            except Exception as e:
+                print(f"Record cache write error: {e}")
+
+    def _fill_local(self, table_name, items, generation):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            if generation != self._generation:
+                return False
+            for utility_id, item in items.items():
+                self._entries[(table_name, utility_id)] = (dict(item), expires)
+                self._entries.move_to_end((table_name, utility_id))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+        return True
+
+    def invalidate(self, table_name, utility_ids):
+        utility_ids = list(utility_ids)
+        with self._lock:
+            self._generation += 1
+            for utility_id in utility_ids:
+                self._entries.pop((table_name, utility_id), None)
+            self.stats['invalidations'] += len(utility_ids)
+        if self.shared is not None and utility_ids:
+            try:
+                self.shared.delete_many([self._shared_key(table_name, utility_id) for utility_id in utility_ids])
+            except Exception as e:
+                print(f"Record cache invalidation error: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats, cached=len(self._entries))
+        lookups = stats['hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['shared_hits']) / lookups, 4) if lookups else None
+        return stats
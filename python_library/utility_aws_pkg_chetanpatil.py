@@ -1,14 +1,95 @@
-import boto3
+import atexit
+import json
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from botocore.exceptions import ClientError
 from decimal import Decimal
 
+from python_library.aws_clients import get_client, get_resource
+from python_library.record_cache import RecordCache
+from python_library.utility_record import UtilityRecord, as_record, timeseries_bound, timeseries_key
+
+# Presigned URLs are cached for this fraction of their lifetime, so a cached
+# link always has at least half of its validity left when handed out
+PRESIGNED_CACHE_TTL_RATIO = 0.5
+PRESIGNED_CACHE_MAX_ENTRIES = 10000
+
+# Streaming multipart uploads: S3 needs parts of at least 5 MB (except the last).
+# Memory use is bounded by (concurrency + 1) * part size regardless of file size.
+UPLOAD_PART_SIZE = 8 * 1024 * 1024
+UPLOAD_CONCURRENCY = 4
+# Object metadata naming the uploading user (x-amz-meta-user-id); the file
+# processor Lambda reads it when an S3 event, which carries no user, wins the
+# race with the app's direct trigger
+UPLOAD_USER_METADATA = 'user-id'
+
+# Error codes SQS uses for a deleted/unknown queue (query and JSON protocols)
+SQS_MISSING_QUEUE_CODES = ('AWS.SimpleQueueService.NonExistentQueue', 'QueueDoesNotExist')
+
+# SendMessageBatch limits, plus how long a partial batch may wait for company
+SQS_BATCH_MAX_ENTRIES = 10
+SQS_BATCH_MAX_BYTES = 256 * 1024
+SQS_BATCH_LINGER_SECONDS = 0.5
+SQS_BATCH_MAX_RETRIES = 3
+
+# BatchGetItem takes at most 100 keys; unprocessed keys are retried with backoff
+DYNAMODB_BATCH_GET_MAX_KEYS = 100
+DYNAMODB_BATCH_GET_MAX_RETRIES = 5
+
+# Time-series layout (UtilityReadings2025): user_id partition key, date#utility_id
+# sort key, and a user#type partition on the type index, so "user X between
+# two dates (of type T)" is a single Query instead of a Scan
+TIMESERIES_TYPE_INDEX = 'user-type-date-index'
+# Appended to the end bound so it matches every timestamp and id under that
+# prefix: the highest code point, so nothing stored can sort after it
+TIMESERIES_END_SUFFIX = '\U0010ffff'
+
+# Consumer defaults: 20s is the longest long-poll SQS allows
+SQS_RECEIVE_WAIT_SECONDS = 20
+SQS_VISIBILITY_TIMEOUT = 30
+SQS_CONSUMER_CONCURRENCY = 8
+# Finished messages wait at most this long for a full DeleteMessageBatch
+SQS_DELETE_LINGER_SECONDS = 1.0
+# Receive errors back off exponentially up to this long between attempts
+SQS_RECEIVE_MAX_BACKOFF_SECONDS = 20
+
 # Core AWS utility class for S3, DynamoDB, SQS, SNS
 class UtilityAWS:
     def __init__(self, region='us-east-1'):
-        self.s3 = boto3.client('s3', region_name=region)
-        self.dynamodb = boto3.resource('dynamodb', region_name=region)
-        self.sqs = boto3.client('sqs', region_name=region)
-        self.sns = boto3.client('sns', region_name=region)
+        # Clients come from the shared registry (python_library.aws_clients) on first use
+        self.region = region
+        self._presigned_cache = {}
+        self._presigned_lock = threading.Lock()
+        self._tables = {}
+        self._queue_urls = {}
+        self._queue_url_lock = threading.Lock()
+        self.queue_url_stats = {'hits': 0, 'misses': 0}
+        # Read-through cache for get/batch_get_utility_record(s); Django wires
+        # in a shared tier from settings.UTILITY_RECORD_CACHE
+        self.record_cache = RecordCache()
+
+    @property
+    def s3(self):
+        return get_client('s3', self.region)
+
+    @property
+    def dynamodb(self):
+        return get_resource('dynamodb', self.region)
+
+    @property
+    def sqs(self):
+        return get_client('sqs', self.region)
+
+    @property
+    def sns(self):
+        return get_client('sns', self.region)
+
+    @property
+    def lambda_client(self):
+        return get_client('lambda', self.region)
 
     # S3 Methods
     def upload_file_to_s3(self, bucket_name, local_path, remote_key):
@@ -20,6 +101,169 @@ class UtilityAWS:
             print(f"S3 upload error: {e}")
             return False
 
+    def upload_stream_to_s3(self, bucket_name, chunks, remote_key, part_size=UPLOAD_PART_SIZE,
+                            max_concurrency=UPLOAD_CONCURRENCY, progress_callback=None, extra_args=None):
+        # Streams an iterable of byte chunks (e.g. UploadedFile.chunks()) into S3
+        # without staging it on disk; the multipart upload is aborted on any failure
+        extra_args = extra_args or {}
+        buffer = bytearray()
+        upload_id = None
+        parts = []
+        futures = []
+        uploaded = [0]
+        lock = threading.Lock()
+        slots = threading.BoundedSemaphore(max_concurrency)
+        executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+        def send_part(part_number, body):
+            try:
+                response = self.s3.upload_part(
+                    Bucket=bucket_name, Key=remote_key, UploadId=upload_id,
+                    PartNumber=part_number, Body=body
+                )
+                with lock:
+                    parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+                    uploaded[0] += len(body)
+                    sent = uploaded[0]
+                if progress_callback:
+                    progress_callback(sent)
+            finally:
+                slots.release()
+
+        def submit(body):
+            # Blocks while max_concurrency parts are in flight, keeping memory flat
+            slots.acquire()
+            futures.append(executor.submit(send_part, len(futures) + 1, body))
+            for future in futures:
+                if future.done() and future.exception():
+                    raise future.exception()
+
+        try:
+            for chunk in chunks:
+                buffer += chunk
+                while len(buffer) >= part_size:
+                    if upload_id is None:
+                        upload_id = self.s3.create_multipart_upload(
+                            Bucket=bucket_name, Key=remote_key, **extra_args
+                        )['UploadId']
+                    body = bytes(buffer[:part_size])
+                    del buffer[:part_size]
+                    submit(body)
+
+            if upload_id is None:
+                # Small file: a single PUT is cheaper than a multipart round-trip
+                self.s3.put_object(Bucket=bucket_name, Key=remote_key, Body=bytes(buffer), **extra_args)
+                if progress_callback:
+                    progress_callback(len(buffer))
+            else:
+                if buffer:
+                    submit(bytes(buffer))
+                for future in futures:
+                    future.result()
+                parts.sort(key=lambda part: part['PartNumber'])
+                self.s3.complete_multipart_upload(
+                    Bucket=bucket_name, Key=remote_key, UploadId=upload_id,
+                    MultipartUpload={'Parts': parts}
+                )
+            print(f"Streamed upload to S3 as {remote_key}")
+            return True
+        except Exception as e:
+            print(f"S3 streaming upload error: {e}")
+            for future in futures:
+                future.cancel()
+            if upload_id is not None:
+                try:
+                    self.s3.abort_multipart_upload(Bucket=bucket_name, Key=remote_key, UploadId=upload_id)
+                except ClientError as abort_error:
+                    print(f"S3 abort multipart error: {abort_error}")
+            return False
+        finally:
+            executor.shutdown(wait=True)
+
+    # Direct browser-to-S3 uploads: the app only signs, the bytes never touch Django
+    def generate_presigned_post(self, bucket_name, remote_key, expiration=3600, max_size=None, content_type=None,
+                                user_id=None):
+        fields = {}
+        conditions = []
+        if content_type:
+            fields['Content-Type'] = content_type
+            conditions.append({'Content-Type': content_type})
+        if user_id is not None:
+            # Part of the signed policy, so the browser cannot change or drop it
+            field = f'x-amz-meta-{UPLOAD_USER_METADATA}'
+            fields[field] = str(user_id)
+            conditions.append({field: str(user_id)})
+        if max_size:
+            conditions.append(['content-length-range', 1, max_size])
+        try:
+            return self.s3.generate_presigned_post(
+                bucket_name, remote_key, Fields=fields or None,
+                Conditions=conditions or None, ExpiresIn=expiration
+            )
+        except ClientError as e:
+            print(f"S3 presigned POST error: {e}")
+            return None
+
+    def create_multipart_upload(self, bucket_name, remote_key, content_type=None, user_id=None):
+        extra_args = upload_extra_args(content_type, user_id) or {}
+        try:
+            response = self.s3.create_multipart_upload(Bucket=bucket_name, Key=remote_key, **extra_args)
+            return response['UploadId']
+        except ClientError as e:
+            print(f"S3 create multipart error: {e}")
+            return None
+
+    def generate_presigned_part_url(self, bucket_name, remote_key, upload_id, part_number, expiration=3600):
+        try:
+            return self.s3.generate_presigned_url(
+                'upload_part',
+                Params={'Bucket': bucket_name, 'Key': remote_key,
+                        'UploadId': upload_id, 'PartNumber': part_number},
+                ExpiresIn=expiration
+            )
+        except ClientError as e:
+            print(f"S3 presign part error: {e}")
+            return None
+
+    def complete_multipart_upload(self, bucket_name, remote_key, upload_id, parts):
+        try:
+            parts = sorted(
+                ({'PartNumber': int(part['PartNumber']), 'ETag': part['ETag']} for part in parts),
+                key=lambda part: part['PartNumber']
+            )
+            self.s3.complete_multipart_upload(
+                Bucket=bucket_name, Key=remote_key, UploadId=upload_id,
+                MultipartUpload={'Parts': parts}
+            )
+            print(f"Completed multipart upload {remote_key}")
+            return True
+        except (ClientError, KeyError, ValueError) as e:
+            print(f"S3 complete multipart error: {e}")
+            return False
+
+    def abort_multipart_upload(self, bucket_name, remote_key, upload_id):
+        try:
+            self.s3.abort_multipart_upload(Bucket=bucket_name, Key=remote_key, UploadId=upload_id)
+            return True
+        except ClientError as e:
+            print(f"S3 abort multipart error: {e}")
+            return False
+
+    def s3_object_exists(self, bucket_name, remote_key):
+        try:
+            self.s3.head_object(Bucket=bucket_name, Key=remote_key)
+            return True
+        except ClientError:
+            return False
+
+    def delete_s3_object(self, bucket_name, remote_key):
+        try:
+            self.s3.delete_object(Bucket=bucket_name, Key=remote_key)
+            return True
+        except ClientError as e:
+            print(f"S3 delete error: {e}")
+            return False
+
     def list_s3_files(self, bucket_name, prefix=''):
         try:
             response = self.s3.list_objects_v2(Bucket=bucket_name, Prefix=prefix)
@@ -28,51 +272,271 @@ class UtilityAWS:
             print(f"S3 list error: {e}")
             return []
 
+    def generate_presigned_url(self, bucket_name, remote_key, expiration=3600):
+        # Reuses this instance's S3 client and caches URLs keyed by (bucket, key, expiration)
+        cache_key = (bucket_name, remote_key, expiration)
+        now = time.monotonic()
+        with self._presigned_lock:
+            cached = self._presigned_cache.get(cache_key)
+            if cached and cached[1] > now:
+                return cached[0]
+        try:
+            url = self.s3.generate_presigned_url(
+                'get_object',
+                Params={'Bucket': bucket_name, 'Key': remote_key},
+                ExpiresIn=expiration
+            )
+        except ClientError as e:
+            print(f"S3 presign error: {e}")
+            return None
+        with self._presigned_lock:
+            if len(self._presigned_cache) >= PRESIGNED_CACHE_MAX_ENTRIES:
+                self._evict_presigned(now)
+            self._presigned_cache[cache_key] = (url, now + expiration * PRESIGNED_CACHE_TTL_RATIO)
+        return url
+
+    def _evict_presigned(self, now):
+        # Drop expired URLs first; if still full, drop the oldest insertions
+        for key in [k for k, (_, expires) in self._presigned_cache.items() if expires <= now]:
+            del self._presigned_cache[key]
+        while len(self._presigned_cache) >= PRESIGNED_CACHE_MAX_ENTRIES:
+            del self._presigned_cache[next(iter(self._presigned_cache))]
+
     # DynamoDB Methods
+    def _table(self, table_name):
+        # Table resources are cheap to reuse and pointless to rebuild per call,
+        # as long as they still sit on the current (post-fork) resource
+        dynamodb = self.dynamodb
+        table = self._tables.get(table_name)
+        if table is None or table.meta.client is not dynamodb.meta.client:
+            table = self._tables[table_name] = dynamodb.Table(table_name)
+        return table
+
     def add_utility_record(self, table_name, utility_id, utility_type, usage, date, notes=''):
+        return self.put_utility_record(table_name, UtilityRecord(utility_id, utility_type, usage, date, notes))
+
+    def put_utility_record(self, table_name, record):
         try:
-            table = self.dynamodb.Table(table_name)
-            table.put_item(Item={
-                'utility_id': str(utility_id),
-                'type': utility_type,
-                'usage': str(usage),
-                'date': date,
-                'notes': notes
-            })
-            print(f"Added record {utility_id} to {table_name}")
+            table = self._table(table_name)
+            table.put_item(Item=record.to_item())
+            print(f"Added record {record.utility_id} to {table_name}")
             return True
         except ClientError as e:
             print(f"DynamoDB add error: {e}")
             return False
+        finally:
+            self.record_cache.invalidate(table_name, [record.utility_id])
+
+    def add_utility_records(self, table_name, records):
+        # Bulk mirror via batch_writer: 25-item BatchWriteItem calls, with
+        # UnprocessedItems re-queued by boto3 and duplicate utility_ids within a
+        # batch collapsed (last write wins) so DynamoDB doesn't reject the batch.
+        # records: iterable of UtilityRecords (or dicts with the same fields)
+        count = 0
+        written = []
+        try:
+            with self._table(table_name).batch_writer(overwrite_by_pkeys=['utility_id']) as batch:
+                for record in records:
+                    record = as_record(record)
+                    batch.put_item(Item=record.to_item())
+                    written.append(record.utility_id)
+                    count += 1
+            print(f"Added {count} records to {table_name}")
+            return True
+        except ClientError as e:
+            print(f"DynamoDB batch add error after {count} records: {e}")
+            return False
+        finally:
+            self.record_cache.invalidate(table_name, written)
 
     def get_utility_record(self, table_name, utility_id):
+        utility_id = str(utility_id)
+        item = self.record_cache.get(table_name, utility_id)
+        if item is not None:
+            return item
+        generation = self.record_cache.generation()
         try:
-            table = self.dynamodb.Table(table_name)
-            response = table.get_item(Key={'utility_id': str(utility_id)})
-            return response.get('Item', None)
+            table = self._table(table_name)
+            response = table.get_item(Key={'utility_id': utility_id})
         except ClientError as e:
             print(f"DynamoDB get error: {e}")
             return None
+        item = response.get('Item', None)
+        if item is not None:
+            self.record_cache.set_many(table_name, {utility_id: item}, generation)
+        return item
+
+    def batch_get_utility_records(self, table_name, utility_ids):
+        # {utility_id: item} for the records that exist. Cached records are
+        # served from the cache; the rest are read with BatchGetItem, 100 keys
+        # per call, re-requesting UnprocessedKeys with exponential backoff.
+        # Returns None if DynamoDB fails or keeps throttling.
+        utility_ids = list(dict.fromkeys(str(utility_id) for utility_id in utility_ids))
+        found = self.record_cache.get_many(table_name, utility_ids)
+        missing = [utility_id for utility_id in utility_ids if utility_id not in found]
+        generation = self.record_cache.generation()
+        fetched = {}
+        try:
+            for start in range(0, len(missing), DYNAMODB_BATCH_GET_MAX_KEYS):
+                request = {table_name: {'Keys': [{'utility_id': utility_id} for utility_id in
+                                                 missing[start:start + DYNAMODB_BATCH_GET_MAX_KEYS]]}}
+                for attempt in range(DYNAMODB_BATCH_GET_MAX_RETRIES + 1):
+                    response = self.dynamodb.batch_get_item(RequestItems=request)
+                    for item in response.get('Responses', {}).get(table_name, []):
+                        fetched[item['utility_id']] = item
+                    request = response.get('UnprocessedKeys')
+                    if not request:
+                        break
+                    time.sleep(min(0.05 * 2 ** attempt, 1))
+                else:
+                    print(f"DynamoDB batch get gave up with {len(request[table_name]['Keys'])} unprocessed keys")
+                    return None
+        except ClientError as e:
+            print(f"DynamoDB batch get error: {e}")
+            return None
+        self.record_cache.set_many(table_name, fetched, generation)
+        found.update(fetched)
+        return found
 
     def delete_utility_record(self, table_name, utility_id):
         try:
-            table = self.dynamodb.Table(table_name)
+            table = self._table(table_name)
             table.delete_item(Key={'utility_id': str(utility_id)})
             print(f"Deleted record {utility_id} from {table_name}")
             return True
         except ClientError as e:
             print(f"DynamoDB delete error: {e}")
             return False
+        finally:
+            self.record_cache.invalidate(table_name, [str(utility_id)])
+
+    def delete_utility_records(self, table_name, utility_ids):
+        count = 0
+        deleted = []
+        try:
+            with self._table(table_name).batch_writer(overwrite_by_pkeys=['utility_id']) as batch:
+                for utility_id in utility_ids:
+                    batch.delete_item(Key={'utility_id': str(utility_id)})
+                    deleted.append(str(utility_id))
+                    count += 1
+            print(f"Deleted {count} records from {table_name}")
+            return True
+        except ClientError as e:
+            print(f"DynamoDB batch delete error after {count} records: {e}")
+            return False
+        finally:
+            self.record_cache.invalidate(table_name, deleted)
+
+    def scan_utility_records(self, table_name, segment=0, total_segments=1):
+        # Yields one page (list of items) at a time; run several segments in
+        # parallel to spread a full-table read across partitions
+        params = {'Segment': segment, 'TotalSegments': total_segments}
+        table = self._table(table_name)
+        while True:
+            response = table.scan(**params)
+            yield response.get('Items', [])
+            if 'LastEvaluatedKey' not in response:
+                return
+            params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def put_timeseries_records(self, table_name, records):
+        # records: iterable of UtilityRecords (or dicts) that know their user_id
+        count = 0
+        try:
+            with self._table(table_name).batch_writer(overwrite_by_pkeys=['user_id', 'date_id']) as batch:
+                for record in records:
+                    batch.put_item(Item=as_record(record).to_item(timeseries=True))
+                    count += 1
+            print(f"Added {count} records to {table_name}")
+            return True
+        except ClientError as e:
+            print(f"DynamoDB time-series add error after {count} records: {e}")
+            return False
+
+    def delete_timeseries_record(self, table_name, user_id, date, utility_id):
+        key = timeseries_key(user_id, None, date, utility_id)
+        try:
+            self._table(table_name).delete_item(Key={'user_id': key['user_id'], 'date_id': key['date_id']})
+            print(f"Deleted record {utility_id} from {table_name}")
+            return True
+        except ClientError as e:
+            print(f"DynamoDB delete error: {e}")
+            return False
+
+    def query_utility_records(self, table_name, user_id, start=None, end=None, utility_type=None, limit=None):
+        # One user's readings with start <= date <= end (both optional, ISO
+        # dates or timestamps, date or datetime objects; end covers the whole
+        # day/prefix), oldest first.
+        # Follows LastEvaluatedKey page by page, so the cost is proportional to
+        # the number of matching items. Returns None on error.
+        from boto3.dynamodb.conditions import Key
+        if utility_type:
+            index, condition = TIMESERIES_TYPE_INDEX, Key('user_type').eq(f'{user_id}#{utility_type}')
+        else:
+            index, condition = None, Key('user_id').eq(str(user_id))
+        start = timeseries_bound(start) if start else None
+        end = f'{timeseries_bound(end)}{TIMESERIES_END_SUFFIX}' if end else None
+        if start and end:
+            condition &= Key('date_id').between(start, end)
+        elif start:
+            condition &= Key('date_id').gte(start)
+        elif end:
+            condition &= Key('date_id').lte(end)
+        params = {'KeyConditionExpression': condition}
+        if index:
+            params['IndexName'] = index
+        items = []
+        try:
+            table = self._table(table_name)
+            while True:
+                if limit:
+                    params['Limit'] = limit - len(items)
+                response = table.query(**params)
+                items.extend(response.get('Items', []))
+                if 'LastEvaluatedKey' not in response or (limit and len(items) >= limit):
+                    return items
+                params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        except ClientError as e:
+            print(f"DynamoDB query error: {e}")
+            return None
+
+    def record_cache_stats(self):
+        return self.record_cache.snapshot()
 
     # SQS Methods
+    def resolve_queue_url(self, queue_name_or_url):
+        # Full queue URLs are used as-is; names are looked up once and cached
+        if queue_name_or_url.startswith(('https://', 'http://')):
+            return queue_name_or_url
+        with self._queue_url_lock:
+            queue_url = self._queue_urls.get(queue_name_or_url)
+            if queue_url:
+                self.queue_url_stats['hits'] += 1
+                return queue_url
+            self.queue_url_stats['misses'] += 1
+        queue_url = self.sqs.get_queue_url(QueueName=queue_name_or_url)['QueueUrl']
+        with self._queue_url_lock:
+            self._queue_urls[queue_name_or_url] = queue_url
+        return queue_url
+
+    def invalidate_queue_url(self, queue_name):
+        with self._queue_url_lock:
+            self._queue_urls.pop(queue_name, None)
+
+    def queue_url_cache_stats(self):
+        with self._queue_url_lock:
+            return dict(self.queue_url_stats, cached=len(self._queue_urls))
+
     def send_sqs_message(self, queue_name, message_body):
         try:
-            response = self.sqs.get_queue_url(QueueName=queue_name)
-            queue_url = response['QueueUrl']
+            queue_url = self.resolve_queue_url(queue_name)
             self.sqs.send_message(QueueUrl=queue_url, MessageBody=message_body)
             print(f"Sent message to {queue_name}")
             return True
         except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in SQS_MISSING_QUEUE_CODES:
+                # Queue was deleted/recreated; the next send looks the URL up again
+                self.invalidate_queue_url(queue_name)
             print(f"SQS send error: {e}")
             return False
 
@@ -86,28 +550,462 @@ class UtilityAWS:
             print(f"SNS publish error: {e}")
             return False
 
+    # Lambda Methods
+    def invoke_lambda_async(self, function_name, payload):
+        try:
+            self.lambda_client.invoke(
+                FunctionName=function_name,
+                InvocationType='Event',  # Async
+                Payload=json.dumps(payload)
+            )
+            print(f"Lambda {function_name} triggered")
+            return True
+        except ClientError as e:
+            print(f"Lambda invoke error: {e}")
+            return False
+
+# Buffered SQS producer: send() only appends to an in-memory buffer, and a
+# background thread ships SendMessageBatch calls of up to 10 entries / 256 KB,
+# either when a batch is full or when the oldest message has waited max_linger
+class SQSBatchProducer:
+    def __init__(self, aws, queue_name_or_url, max_linger=SQS_BATCH_LINGER_SECONDS,
+                 max_retries=SQS_BATCH_MAX_RETRIES, on_failure=None):
+        self.aws = aws
+        self.queue = queue_name_or_url
+        self.max_linger = max_linger
+        self.max_retries = max_retries
+        self.on_failure = on_failure  # called with (message_body, error) for dropped messages
+        self._reset()
+        with self._cond:
+            self._start()
+        if hasattr(os, 'register_at_fork'):
+            # Forked child (e.g. gunicorn worker): the parent's lock may have
+            # been held by another thread at fork time and its flusher thread
+            # did not come along, so the child starts from a clean slate
+            producer = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: producer() and producer()._reset())
+        atexit.register(self.close)
+
+    def _reset(self):
+        # Runs in __init__ and in a freshly forked child, where only one thread exists
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+        self.stats = {'sent': 0, 'failed': 0, 'batches': 0, 'retried': 0}  # updated under _cond
+        self._pending = []  # [message_body, attempts, size]
+        self._pending_bytes = 0
+        self._first_at = None
+        self._in_flight = 0
+        self._flush_requested = False
+        self._closed = False
+        self._thread = None
+
+    def _start(self):
+        # Called with _cond held; the flusher is started on first use in each process
+        self._thread = threading.Thread(target=self._run, name='sqs-batch-producer', daemon=True)
+        self._thread.start()
+
+    def send(self, message_body):
+        size = len(message_body.encode('utf-8'))
+        if size > SQS_BATCH_MAX_BYTES:
+            raise ValueError(f"SQS message of {size} bytes exceeds {SQS_BATCH_MAX_BYTES}")
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("SQSBatchProducer is closed")
+            if self._thread is None:
+                self._start()
+            if not self._pending:
+                self._first_at = time.monotonic()
+            self._pending.append([message_body, 0, size])
+            self._pending_bytes += size
+            self._cond.notify()
+
+    def flush(self, timeout=None):
+        # Blocks until everything buffered so far has been sent (or dropped)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._pending or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self._flush_requested = False
+            return True
+
+    def close(self, timeout=10):
+        with self._cond:
+            if self._closed or self._pid != os.getpid():
+                return
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _batch_ready(self):
+        if not self._pending:
+            return False
+        if self._closed or self._flush_requested:
+            return True
+        if len(self._pending) >= SQS_BATCH_MAX_ENTRIES or self._pending_bytes >= SQS_BATCH_MAX_BYTES:
+            return True
+        return time.monotonic() - self._first_at >= self.max_linger
+
+    def _take_batch(self):
+        batch, batch_bytes = [], 0
+        while self._pending and len(batch) < SQS_BATCH_MAX_ENTRIES:
+            size = self._pending[0][2]
+            if batch and batch_bytes + size > SQS_BATCH_MAX_BYTES:
+                break
+            batch.append(self._pending.pop(0))
+            batch_bytes += size
+        self._pending_bytes -= batch_bytes
+        self._first_at = time.monotonic() if self._pending else None
+        self._in_flight += len(batch)
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._batch_ready():
+                    if self._closed and not self._pending:
+                        return
+                    timeout = None
+                    if self._first_at is not None:
+                        timeout = max(self.max_linger - (time.monotonic() - self._first_at), 0)
+                    self._cond.wait(timeout)
+                batch = self._take_batch()
+            retry = []
+            try:
+                retry = self._send_batch(batch)
+            except Exception as e:
+                # _send_batch handles send errors itself; this only guards the
+                # bookkeeping so the thread cannot die with messages buffered
+                # and leave flush() waiting on _in_flight forever
+                with self._cond:
+                    self.stats['failed'] += len(batch)
+                print(f"SQS batch producer error, {len(batch)} messages dropped: {e}")
+            finally:
+                with self._cond:
+                    # Failed-but-retriable entries go back to the front of the buffer
+                    self._pending[:0] = retry
+                    self._pending_bytes += sum(entry[2] for entry in retry)
+                    if retry and self._first_at is None:
+                        self._first_at = time.monotonic()
+                    self._in_flight -= len(batch)
+                    self._cond.notify_all()
+            if retry:
+                time.sleep(min(0.1 * 2 ** retry[0][1], 2))
+
+    def _send_batch(self, batch):
+        entries = [{'Id': str(i), 'MessageBody': entry[0]} for i, entry in enumerate(batch)]
+        try:
+            response = self.aws.sqs.send_message_batch(
+                QueueUrl=self.aws.resolve_queue_url(self.queue), Entries=entries
+            )
+            failures = response.get('Failed', [])
+        except Exception as e:
+            # ClientError as well as transport errors (BotoCoreError:
+            # EndpointConnectionError, NoCredentialsError, ...) fail the whole
+            # batch as retriable, within max_retries
+            if isinstance(e, ClientError) and e.response.get('Error', {}).get('Code') in SQS_MISSING_QUEUE_CODES:
+                self.aws.invalidate_queue_url(self.queue)
+            print(f"SQS batch send error: {e}")
+            failures = [{'Id': entry['Id'], 'SenderFault': False, 'Message': str(e)} for entry in entries]
+
+        retry, dropped = [], []
+        for failure in failures:
+            entry = batch[int(failure['Id'])]
+            entry[1] += 1
+            if not failure.get('SenderFault') and entry[1] <= self.max_retries:
+                retry.append(entry)
+            else:
+                dropped.append((entry, failure.get('Message')))
+        with self._cond:
+            self.stats['failed'] += len(dropped)
+            self.stats['retried'] += len(retry)
+            self.stats['sent'] += len(batch) - len(failures)
+            self.stats['batches'] += 1
+        for entry, message in dropped:
+            print(f"SQS batch entry dropped: {message}")
+            if self.on_failure:
+                try:
+                    self.on_failure(entry[0], message)
+                except Exception as e:
+                    print(f"SQS on_failure callback error: {e}")
+        return retry
+
+# SQS consumer engine: long-polls up to 10 messages per receive, runs the
+# handler on a thread pool, keeps slow messages invisible with heartbeat
+# visibility extensions and deletes finished messages with DeleteMessageBatch.
+# A handler that raises leaves its message on the queue for redelivery.
+class SQSConsumer:
+    def __init__(self, aws, queue_name_or_url, handler, concurrency=SQS_CONSUMER_CONCURRENCY,
+                 visibility_timeout=SQS_VISIBILITY_TIMEOUT, wait_seconds=SQS_RECEIVE_WAIT_SECONDS):
+        self.aws = aws
+        self.queue = queue_name_or_url
+        self.handler = handler  # handler(body, message)
+        self.concurrency = concurrency
+        self.visibility_timeout = visibility_timeout
+        self.wait_seconds = wait_seconds
+        self.metrics = {'received': 0, 'processed': 0, 'failed': 0, 'deleted': 0,
+                        'extended': 0, 'last_lag_seconds': 0.0, 'max_lag_seconds': 0.0}
+        self._started = time.monotonic()
+        self._cond = threading.Condition()
+        self._in_flight = {}  # receipt handle -> monotonic start time
+        self._to_delete = []
+        self._first_delete_at = None
+        self._receive_errors = 0
+
+    def metrics_snapshot(self):
+        with self._cond:
+            snapshot = dict(self.metrics, in_flight=len(self._in_flight))
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        snapshot['throughput_per_second'] = round(snapshot['processed'] / elapsed, 2)
+        return snapshot
+
+    def run(self, stop_event=None, exit_when_idle=False):
+        stop_event = stop_event or threading.Event()
+        queue_url = self.aws.resolve_queue_url(self.queue)
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='sqs-consumer')
+        heartbeat = threading.Thread(target=self._heartbeat, args=(queue_url, stop_event), daemon=True)
+        heartbeat.start()
+        try:
+            while not stop_event.is_set():
+                self._flush_deletes(queue_url)
+                with self._cond:
+                    free = self.concurrency - len(self._in_flight)
+                    if free <= 0:
+                        self._cond.wait(1)
+                        continue
+                messages = self._receive(queue_url, min(10, free))
+                if messages is None:
+                    continue  # receive failed and backed off; that is not idleness
+                if not messages and exit_when_idle:
+                    with self._cond:
+                        if not self._in_flight:
+                            break
+                for message in messages:
+                    with self._cond:
+                        self._in_flight[message['ReceiptHandle']] = time.monotonic()
+                    executor.submit(self._process, queue_url, message)
+        finally:
+            executor.shutdown(wait=True)
+            stop_event.set()
+            heartbeat.join()
+            self._flush_deletes(queue_url, force=True)
+
+    def _receive(self, queue_url, max_messages):
+        try:
+            response = self.aws.sqs.receive_message(
+                QueueUrl=queue_url,
+                MaxNumberOfMessages=max_messages,
+                WaitTimeSeconds=self.wait_seconds,
+                VisibilityTimeout=self.visibility_timeout,
+                AttributeNames=['SentTimestamp', 'ApproximateReceiveCount'],
+            )
+        except Exception as e:
+            # Transport errors (BotoCoreError) included: log, back off, keep polling
+            self._receive_errors += 1
+            print(f"SQS receive error: {e}")
+            time.sleep(min(0.5 * 2 ** (self._receive_errors - 1), SQS_RECEIVE_MAX_BACKOFF_SECONDS))
+            return None
+        self._receive_errors = 0
+        messages = response.get('Messages', [])
+        now = time.time()
+        with self._cond:
+            self.metrics['received'] += len(messages)
+            for message in messages:
+                sent = message.get('Attributes', {}).get('SentTimestamp')
+                if sent:
+                    lag = max(now - int(sent) / 1000.0, 0.0)
+                    self.metrics['last_lag_seconds'] = round(lag, 3)
+                    self.metrics['max_lag_seconds'] = round(max(self.metrics['max_lag_seconds'], lag), 3)
+        return messages
+
+    def _process(self, queue_url, message):
+        receipt = message['ReceiptHandle']
+        try:
+            self.handler(message['Body'], message)
+            ok = True
+        except Exception as e:
+            print(f"SQS handler error for {message.get('MessageId')}: {e}")
+            ok = False
+        with self._cond:
+            self._in_flight.pop(receipt, None)
+            if ok:
+                self.metrics['processed'] += 1
+                if not self._to_delete:
+                    self._first_delete_at = time.monotonic()
+                self._to_delete.append(receipt)
+            else:
+                self.metrics['failed'] += 1
+            self._cond.notify_all()
+        if ok:
+            self._flush_deletes(queue_url)
+
+    def _flush_deletes(self, queue_url, force=False):
+        with self._cond:
+            if not self._to_delete:
+                return
+            waited = time.monotonic() - self._first_delete_at
+            if len(self._to_delete) < 10 and not force and self._in_flight and waited < SQS_DELETE_LINGER_SECONDS:
+                return
+            receipts, self._to_delete = self._to_delete, []
+        for start in range(0, len(receipts), 10):
+            entries = [{'Id': str(i), 'ReceiptHandle': r} for i, r in enumerate(receipts[start:start + 10])]
+            try:
+                response = self.aws.sqs.delete_message_batch(QueueUrl=queue_url, Entries=entries)
+                deleted = len(response.get('Successful', []))
+                for failure in response.get('Failed', []):
+                    print(f"SQS delete failed: {failure.get('Message')}")
+            except Exception as e:
+                # The messages reappear after their visibility timeout
+                print(f"SQS delete batch error: {e}")
+                deleted = 0
+            with self._cond:
+                self.metrics['deleted'] += deleted
+
+    def _heartbeat(self, queue_url, stop_event):
+        # Extends visibility for messages whose handler has used half the timeout
+        interval = max(self.visibility_timeout / 2.0, 1)
+        while not stop_event.wait(interval):
+            now = time.monotonic()
+            with self._cond:
+                slow = [r for r, started in self._in_flight.items() if now - started >= interval]
+            for start in range(0, len(slow), 10):
+                entries = [{'Id': str(i), 'ReceiptHandle': r, 'VisibilityTimeout': self.visibility_timeout}
+                           for i, r in enumerate(slow[start:start + 10])]
+                try:
+                    response = self.aws.sqs.change_message_visibility_batch(QueueUrl=queue_url, Entries=entries)
+                    with self._cond:
+                        self.metrics['extended'] += len(response.get('Successful', []))
+                except Exception as e:
+                    # Keep the heartbeat alive; the next interval tries again
+                    print(f"SQS visibility extension error: {e}")
+
 # --- GLOBAL INTEGRATION WRAPPERS FOR DJANGO IMPORTS ---
 
 aws = UtilityAWS(region='us-east-1')
 BUCKET_NAME = 'utility-management-files-2025'
 TABLE_NAME = 'UtilityRecords2025'
+TIMESERIES_TABLE_NAME = 'UtilityReadings2025'
 QUEUE_NAME = 'utility-tasks-queue-2025'
 SNS_TOPIC_ARN = 'arn:aws:sns:us-east-1:263072075949:utility-alerts-topic-2025'
+FILE_PROCESSOR_FUNCTION = 'utility-file-processor'
 
 def upload_utility_file(local_path, remote_key):
     return aws.upload_file_to_s3(BUCKET_NAME, local_path, remote_key)
 
+def upload_extra_args(content_type=None, user_id=None):
+    # put_object / create_multipart_upload arguments for an app upload
+    extra_args = {}
+    if content_type:
+        extra_args['ContentType'] = content_type
+    if user_id is not None:
+        extra_args['Metadata'] = {UPLOAD_USER_METADATA: str(user_id)}
+    return extra_args or None
+
+def upload_utility_stream(chunks, remote_key, part_size=UPLOAD_PART_SIZE, max_concurrency=UPLOAD_CONCURRENCY,
+                          progress_callback=None, content_type=None, user_id=None):
+    return aws.upload_stream_to_s3(BUCKET_NAME, chunks, remote_key, part_size, max_concurrency,
+                                   progress_callback, upload_extra_args(content_type, user_id))
+
+def presign_utility_upload(remote_key, expiration=3600, max_size=None, content_type=None, user_id=None):
+    return aws.generate_presigned_post(BUCKET_NAME, remote_key, expiration, max_size, content_type, user_id)
+
+def start_utility_multipart_upload(remote_key, content_type=None, user_id=None):
+    return aws.create_multipart_upload(BUCKET_NAME, remote_key, content_type, user_id)
+
+def presign_utility_upload_part(remote_key, upload_id, part_number, expiration=3600):
+    return aws.generate_presigned_part_url(BUCKET_NAME, remote_key, upload_id, part_number, expiration)
+
+def complete_utility_multipart_upload(remote_key, upload_id, parts):
+    return aws.complete_multipart_upload(BUCKET_NAME, remote_key, upload_id, parts)
+
+def abort_utility_multipart_upload(remote_key, upload_id):
+    return aws.abort_multipart_upload(BUCKET_NAME, remote_key, upload_id)
+
+def utility_file_exists(remote_key):
+    return aws.s3_object_exists(BUCKET_NAME, remote_key)
+
+def delete_utility_file(remote_key):
+    return aws.delete_s3_object(BUCKET_NAME, remote_key)
+
+def generate_utility_file_url(remote_key, expiration=3600):
+    return aws.generate_presigned_url(BUCKET_NAME, remote_key, expiration)
+
 def add_utility_record(utility_id, utility_type, usage, date, notes=''):
     return aws.add_utility_record(TABLE_NAME, utility_id, utility_type, usage, date, notes)
 
+def put_utility_record(record):
+    return aws.put_utility_record(TABLE_NAME, record)
+
+def add_utility_records(records):
+    return aws.add_utility_records(TABLE_NAME, records)
+
+def get_utility_record(utility_id):
+    return aws.get_utility_record(TABLE_NAME, utility_id)
+
+def batch_get_utility_records(utility_ids):
+    return aws.batch_get_utility_records(TABLE_NAME, utility_ids)
+
 def delete_utility_record(utility_id):
     return aws.delete_utility_record(TABLE_NAME, utility_id)
 
+def delete_utility_records(utility_ids):
+    return aws.delete_utility_records(TABLE_NAME, utility_ids)
+
+def scan_utility_records(segment=0, total_segments=1):
+    return aws.scan_utility_records(TABLE_NAME, segment, total_segments)
+
+def add_timeseries_records(records):
+    return aws.put_timeseries_records(TIMESERIES_TABLE_NAME, records)
+
+def delete_timeseries_record(user_id, date, utility_id):
+    return aws.delete_timeseries_record(TIMESERIES_TABLE_NAME, user_id, date, utility_id)
+
+def query_utility_records(user_id, start=None, end=None, utility_type=None, limit=None):
+    return aws.query_utility_records(TIMESERIES_TABLE_NAME, user_id, start, end, utility_type, limit)
+
 def send_utility_task(queue_url_or_name, message_body):
     return aws.send_sqs_message(queue_url_or_name, message_body)
 
 def create_utility_queue():
     return QUEUE_NAME
 
+def utility_queue_url_cache_stats():
+    return aws.queue_url_cache_stats()
+
+def utility_record_cache_stats():
+    return aws.record_cache_stats()
+
+_task_producer = None
+_task_producer_lock = threading.Lock()
+
+def get_utility_task_producer():
+    # One buffered producer per process for the tasks queue, created on first use
+    global _task_producer
+    with _task_producer_lock:
+        if _task_producer is None:
+            _task_producer = SQSBatchProducer(aws, QUEUE_NAME)
+        return _task_producer
+
+def send_utility_task_batched(message_body):
+    get_utility_task_producer().send(message_body)
+
+def create_utility_task_consumer(handler, queue_name_or_url=QUEUE_NAME, **options):
+    return SQSConsumer(aws, queue_name_or_url, handler, **options)
+
 def publish_utility_alert(topic_arn, message, subject='Utility Alert'):
     return aws.publish_sns_notification(topic_arn, message, subject)
+
+def trigger_utility_file_processor(remote_key, user_id, action):
+    payload = {
+        'bucket': BUCKET_NAME,
+        'key': remote_key,
+        'user_id': user_id,
+        'action': action
+    }
+    return aws.invoke_lambda_async(FILE_PROCESSOR_FUNCTION, payload)
@@ -0,0 +1,102 @@
+# Versioned envelope for the utility task messages sent over SQS.
+# Producers (Django views, bulk imports) build messages with build_task_message()
+# and encode them; consumers call decode_task_message() and get back the same
+# dict, whichever wire format was used:
+#   {"v":1,...}       JSON object, readable in the AWS console
+#   [1,0,...]         compact positional JSON array (no field names)
+#   m1:<base64>       the positional array packed with msgpack (binary=True)
+# SQS bodies are text, so msgpack output has to be base64'd; for these small
+# records that makes it larger than the JSON array, hence the array is the
+# default compact form and msgpack is opt-in.
+
+import base64
+import json
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional and only needed for binary=True
+    msgpack = None
+
+ENVELOPE_VERSION = 1
+MSGPACK_PREFIX = 'm1:'
+
+EVENTS = ('utility.created', 'utility.edited', 'utility.deleted')
+UTILITY_TYPES = ('electricity', 'gas', 'steam', 'air_conditioning')
+
+# Order of the positional (compact) form after the version number
+FIELDS = ('event', 'utility_id', 'type', 'usage', 'date', 'user_email')
+
+_EVENT_CODES = {name: code for code, name in enumerate(EVENTS)}
+_TYPE_CODES = {name: code for code, name in enumerate(UTILITY_TYPES)}
+
+
+class MessageFormatError(ValueError):
+    pass
+
+
+def build_task_message(event, utility_id, utility_type, usage, date, user_email=''):
+    if event not in _EVENT_CODES:
+        raise MessageFormatError(f"Unknown task event: {event}")
+    return {
+        'v': ENVELOPE_VERSION,
+        'event': event,
+        'utility_id': int(utility_id),
+        'type': utility_type,
+        'usage': float(usage),
+        'date': str(date),
+        'user_email': user_email or '',
+    }
+
+
+def encode_task_message(message, compact=False, binary=False):
+    if not (compact or binary):
+        return json.dumps(message, separators=(',', ':'))
+    row = [
+        ENVELOPE_VERSION,
+        _EVENT_CODES[message['event']],
+        message['utility_id'],
+        _TYPE_CODES.get(message['type'], message['type']),
+        message['usage'],
+        message['date'],
+        message['user_email'],
+    ]
+    if binary:
+        if msgpack is None:
+            raise MessageFormatError("msgpack is required for binary task messages")
+        return MSGPACK_PREFIX + base64.b64encode(msgpack.packb(row)).decode('ascii')
+    return json.dumps(row, separators=(',', ':'))
+
+
+def _from_row(row):
+    if not row or row[0] != ENVELOPE_VERSION or len(row) != len(FIELDS) + 1:
+        raise MessageFormatError("Unsupported compact task message")
+    message = dict(zip(FIELDS, row[1:]), v=ENVELOPE_VERSION)
+    try:
+        message['event'] = EVENTS[message['event']]
+    except (IndexError, TypeError):
+        raise MessageFormatError(f"Unknown task event code: {message['event']}")
+    if isinstance(message['type'], int) and 0 <= message['type'] < len(UTILITY_TYPES):
+        message['type'] = UTILITY_TYPES[message['type']]
+    return message
+
+
+def decode_task_message(body):
+    # Returns the canonical dict; legacy free-text bodies come back as event 'legacy'
+    if body.startswith(MSGPACK_PREFIX):
+        if msgpack is None:
+            raise MessageFormatError("msgpack is required to decode this message")
+        try:
+            return _from_row(msgpack.unpackb(base64.b64decode(body[len(MSGPACK_PREFIX):])))
+        except (ValueError, TypeError, msgpack.exceptions.UnpackException) as e:
+            raise MessageFormatError(f"Corrupt compact task message: {e}")
+    if body[:1] in ('{', '['):
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            raise MessageFormatError(f"Corrupt task message: {e}")
+        if isinstance(data, list):
+            return _from_row(data)
+        if data.get('v') != ENVELOPE_VERSION:
+            raise MessageFormatError(f"Unsupported task message version: {data.get('v')}")
+        return data
+    return {'v': 0, 'event': 'legacy', 'text': body}
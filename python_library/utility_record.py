@@ -0,0 +1,124 @@
+# One meter reading as it travels between the Django model, the outbox, the
+# DynamoDB tables and the SQS task envelope.
+# Values are normalized once, when the record is built (usage as float, ids and
+# dates as strings), so each serializer is a single dict literal instead of a
+# chain of str()/Decimal()/float() calls per field and per layer. The SQS
+# envelope is built by utility_messages.build_task_message, which owns
+# that format.
+# With __slots__ the object itself is about a third of the size of the
+# equivalent dict, which adds up in the bulk import and backfill paths.
+# See benchmarks/record_benchmark.py.
+
+import datetime
+from decimal import Decimal
+
+from python_library.utility_messages import build_task_message
+
+# Everything else on a DynamoDB item ends up in UtilityRecord.extra
+_ITEM_FIELDS = frozenset(('utility_id', 'type', 'usage', 'date', 'notes', 'user_id', 'date_id', 'user_type'))
+
+
+def usage_attribute(usage):
+    # DynamoDB stores usage as a number; boto3 rejects floats, and going
+    # through str() keeps the shortest decimal that reads back as the float
+    return Decimal(str(float(usage)))
+
+
+def timeseries_bound(value):
+    # A query bound in the format date_id is stored in, str(datetime), e.g.
+    # '2025-01-31 08:00:00+00:00'. ISO strings use a 'T' separator, which
+    # sorts after the stored ' ' and would skip the whole start day.
+    if isinstance(value, datetime.datetime):
+        return str(value)
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    value = str(value).strip()
+    if len(value) > 10 and value[10] == 'T':
+        value = f'{value[:10]} {value[11:]}'
+    return value
+
+
+def timeseries_key(user_id, utility_type, date, utility_id):
+    # Key attributes of an item in the time-series table
+    key = {'user_id': str(user_id), 'date_id': f'{date}#{utility_id}'}
+    if utility_type:
+        key['user_type'] = f'{user_id}#{utility_type}'
+    return key
+
+
+class UtilityRecord:
+    __slots__ = ('utility_id', 'type', 'usage', 'date', 'notes', 'user_id', 'extra')
+
+    def __init__(self, utility_id, utility_type, usage, date, notes='', user_id=None, extra=None):
+        self.utility_id = str(utility_id)
+        self.type = utility_type
+        self.usage = float(usage)
+        self.date = str(date)
+        self.notes = notes or ''
+        self.user_id = str(user_id) if user_id is not None else None
+        # Attributes we carry along but do not interpret (e.g. source_key)
+        self.extra = extra
+
+    def __repr__(self):
+        return f'UtilityRecord({self.utility_id!r}, {self.type!r}, {self.usage!r}, {self.date!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, UtilityRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    # Django model rows (utilities.models.Utility or anything shaped like it)
+    @classmethod
+    def from_model(cls, utility):
+        return cls(utility.pk, utility.type, utility.usage, utility.date, utility.notes, utility.user_id)
+
+    # DynamoDB items (boto3 resource layer, which does the wire encoding)
+    @classmethod
+    def from_item(cls, item):
+        extra = {k: v for k, v in item.items() if k not in _ITEM_FIELDS} or None
+        return cls(item['utility_id'], item['type'], item['usage'], item['date'], item.get('notes', ''),
+                   item.get('user_id'), extra)
+
+    def to_item(self, timeseries=False):
+        item = {
+            'utility_id': self.utility_id,
+            'type': self.type,
+            'usage': usage_attribute(self.usage),
+            'date': self.date,
+            'notes': self.notes,
+        }
+        if self.extra:
+            item.update(self.extra)
+        if self.user_id is not None:
+            item['user_id'] = self.user_id
+        if timeseries:
+            item['date_id'] = f'{self.date}#{self.utility_id}'
+            item['user_type'] = f'{self.user_id}#{self.type}'
+        return item
+
+    # Outbox payloads (stored as JSON in OutboxMessage.payload)
+    @classmethod
+    def from_payload(cls, payload):
+        return cls(payload['utility_id'], payload['type'], payload['usage'], payload['date'],
+                   payload.get('notes', ''), payload.get('user_id'))
+
+    def to_payload(self):
+        payload = {
+            'utility_id': self.utility_id,
+            'type': self.type,
+            'usage': self.usage,
+            'date': self.date,
+            'notes': self.notes,
+        }
+        if self.user_id is not None:
+            payload['user_id'] = self.user_id
+        return payload
+
+    # SQS task envelope (python_library.utility_messages)
+    def to_message(self, event, user_email=''):
+        return build_task_message(event, self.utility_id, self.type, self.usage, self.date, user_email)
+
+
+def as_record(record):
+    # Bulk APIs also take the plain dicts older callers pass
+    return record if isinstance(record, UtilityRecord) else UtilityRecord.from_payload(record)
@@ -1,4 +1,9 @@
 from django.contrib import admin
-from .models import Utility
+from .models import AdminEvent, FileBlob, OutboxMessage, UsageStats, Utility, UtilityImport
 
 admin.site.register(Utility)
+admin.site.register(OutboxMessage)
+admin.site.register(UtilityImport)
+admin.site.register(UsageStats)
+admin.site.register(AdminEvent)
+admin.site.register(FileBlob)
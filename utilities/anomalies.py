@@ -0,0 +1,175 @@
+# Streaming anomaly detection for incoming readings.
+# Each (user, type) pair keeps one UsageStats row: a Welford running
+# mean/variance over all readings plus an EWMA of recent usage. Scoring a new
+# reading and folding it in is O(1) and touches only that row, so nothing ever
+# rescans history. A reading is flagged when it sits more than
+# ANOMALY_Z_THRESHOLD standard deviations from the running mean, and only
+# flagged readings produce an SNS alert (queued through the outbox).
+# `backfill_usage_stats` rebuilds every row from history in one streaming pass.
+
+import math
+
+from django.db import transaction
+
+from . import outbox
+from .models import UsageStats, Utility
+
+ANOMALY_Z_THRESHOLD = 4.0
+# No verdicts until there is enough history for the variance to mean something
+ANOMALY_MIN_READINGS = 10
+# Spread floor relative to the mean, so a near-constant history does not turn
+# every small wobble into an alert
+ANOMALY_MIN_SPREAD_RATIO = 0.05
+EWMA_ALPHA = 0.2
+MAX_ALERT_LINES = 20
+
+
+def spread(stats):
+    # Sample standard deviation, floored at ANOMALY_MIN_SPREAD_RATIO of the mean
+    variance = stats.m2 / (stats.count - 1) if stats.count > 1 else 0.0
+    return max(math.sqrt(max(variance, 0.0)), ANOMALY_MIN_SPREAD_RATIO * abs(stats.mean))
+
+
+def score(stats, usage):
+    # z-score of a reading against the history seen so far, or None if too little history
+    if stats.count < ANOMALY_MIN_READINGS:
+        return None
+    deviation = spread(stats)
+    if deviation == 0:
+        return None
+    return (usage - stats.mean) / deviation
+
+
+def push(stats, usage, moment=None):
+    # Welford update; the EWMA follows readings in the order they are observed
+    stats.count += 1
+    delta = usage - stats.mean
+    stats.mean += delta / stats.count
+    stats.m2 += delta * (usage - stats.mean)
+    stats.ewma = usage if stats.ewma is None else EWMA_ALPHA * usage + (1 - EWMA_ALPHA) * stats.ewma
+    if moment is not None and (stats.last_reading_at is None or moment > stats.last_reading_at):
+        stats.last_reading_at = moment
+
+
+def pop(stats, usage):
+    # Inverse Welford update for a deleted/edited reading. The EWMA cannot be
+    # unwound and is left as is; it decays away on the next readings.
+    if stats.count <= 1:
+        stats.count, stats.mean, stats.m2 = 0, 0.0, 0.0
+        return
+    mean = (stats.count * stats.mean - usage) / (stats.count - 1)
+    stats.m2 = max(stats.m2 - (usage - stats.mean) * (usage - mean), 0.0)
+    stats.mean = mean
+    stats.count -= 1
+
+
+def _locked_stats(user_id, utility_type):
+    # Row lock so concurrent readings for the same pair serialize their updates
+    stats, _ = UsageStats.objects.select_for_update().get_or_create(user_id=user_id, type=utility_type)
+    return stats
+
+
+def _anomaly(stats, utility_type, moment, usage, z):
+    return {
+        'type': utility_type,
+        'date': str(moment),
+        'usage': usage,
+        'z': round(z, 2),
+        'mean': round(stats.mean, 2),
+        'std': round(spread(stats), 2),
+        'recent': round(stats.ewma, 2) if stats.ewma is not None else None,
+    }
+
+
+def observe(user_id, utility_type, moment, usage):
+    # Scores the reading against the prior state, folds it in and returns an
+    # anomaly dict (or None)
+    found = observe_many(user_id, [(utility_type, moment, usage)])
+    return found[0] if found else None
+
+
+def observe_many(user_id, readings):
+    # readings: iterable of (type, date, usage); one locked row per type touched
+    anomalies, touched = [], {}
+    with transaction.atomic():
+        for utility_type, moment, usage in readings:
+            stats = touched.get(utility_type)
+            if stats is None:
+                stats = touched[utility_type] = _locked_stats(user_id, utility_type)
+            z = score(stats, usage)
+            if z is not None and abs(z) >= ANOMALY_Z_THRESHOLD:
+                anomalies.append(_anomaly(stats, utility_type, moment, usage, z))
+                stats.anomalies += 1
+            push(stats, usage, moment)
+        for stats in touched.values():
+            stats.save()
+    return anomalies
+
+
+def forget(user_id, utility_type, usage):
+    with transaction.atomic():
+        stats = _locked_stats(user_id, utility_type)
+        pop(stats, usage)
+        stats.save()
+
+
+def replace(user_id, old, new):
+    # old/new: (type, date, usage) before and after an edit; the new value is
+    # scored against history without the old one
+    if old == new:
+        return None
+    forget(user_id, old[0], old[2])
+    return observe(user_id, *new)
+
+
+def alert(user, anomalies, context='reading', total=None):
+    # One SNS message per call however many anomalies were found; `total` is
+    # the full count when the caller only kept the first few
+    total = len(anomalies) if total is None else total
+    if not total:
+        return False
+    lines = [
+        f"{a['type']} {a['usage']} on {a['date']}: z={a['z']} "
+        f"(mean {a['mean']}, std {a['std']}, recent {a['recent']})"
+        for a in anomalies[:MAX_ALERT_LINES]
+    ]
+    if total > len(lines):
+        lines.append(f"... and {total - len(lines)} more")
+    outbox.enqueue('sns', {
+        'subject': f"Unusual Utility Usage - {user.username}",
+        'message': f"Unusual {context} usage for {user.username} ({user.email}):\n" + "\n".join(lines),
+    })
+    return True
+
+
+def check_reading(user, utility):
+    anomaly = observe(user.id, utility.type, utility.date, utility.usage)
+    return alert(user, [anomaly]) if anomaly else False
+
+
+def replay(user_id=None, chunk_size=5000):
+    # Rebuilds UsageStats from history in one ordered, streaming pass: readings
+    # arrive grouped by (user, type), so each state is finished before the next
+    # one starts. Returns (rows written, anomalies seen).
+    readings = Utility.objects.exclude(user__isnull=True)
+    existing = UsageStats.objects.all()
+    if user_id is not None:
+        readings = readings.filter(user_id=user_id)
+        existing = existing.filter(user_id=user_id)
+    readings = (readings.order_by('user_id', 'type', 'date', 'id')
+                .values_list('user_id', 'type', 'date', 'usage'))
+
+    rows, stats, flagged = [], None, 0
+    for reading_user, utility_type, moment, usage in readings.iterator(chunk_size=chunk_size):
+        if stats is None or (stats.user_id, stats.type) != (reading_user, utility_type):
+            stats = UsageStats(user_id=reading_user, type=utility_type)
+            rows.append(stats)
+        z = score(stats, usage)
+        if z is not None and abs(z) >= ANOMALY_Z_THRESHOLD:
+            stats.anomalies += 1
+            flagged += 1
+        push(stats, usage, moment)
+    with transaction.atomic():
+        existing.delete()
+        UsageStats.objects.bulk_create(rows, batch_size=1000)
+    return len(rows), flagged
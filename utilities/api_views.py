@@ -0,0 +1,303 @@
+# JSON endpoints.
+# Direct-to-S3 uploads: the browser PUTs/POSTs file bytes straight to S3 using
+# URLs signed here, so a multi-GB upload never occupies a Django worker; only
+# the tiny sign/complete calls reach the app server.
+
+import json
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_date
+from django.utils.text import get_valid_filename
+from django.views.decorators.http import require_GET, require_POST
+
+from python_library.utility_aws_pkg_chetanpatil import (
+    abort_utility_multipart_upload,
+    complete_utility_multipart_upload,
+    presign_utility_upload,
+    presign_utility_upload_part,
+    start_utility_multipart_upload,
+    utility_file_exists,
+)
+from . import blobs, rollups
+from .importer import open_text, run_import
+from .models import Utility, UtilityImport
+from .pagination import day_start
+from .views import build_upload_key, trigger_file_processor
+
+UPLOAD_URL_EXPIRATION = 3600
+MAX_PARTS_PER_REQUEST = 1000
+S3_MAX_PART_NUMBER = 10000
+
+
+def _load_json(request):
+    # Accept either a JSON body (an object) or regular form fields
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    return request.POST.dict()
+
+
+def _user_utility(request, data):
+    # (utility, None), or (None, 400 response) when utility_id is not a number;
+    # someone else's or a missing utility is a 404
+    try:
+        utility_id = int(data.get('utility_id'))
+    except (TypeError, ValueError):
+        return None, JsonResponse({'error': 'utility_id must be an integer'}, status=400)
+    return get_object_or_404(Utility, pk=utility_id, user=request.user), None
+
+
+def _upload_target(utility, data):
+    # The uploads/{type}/{filename} key for the user's Utility, or None
+    filename = get_valid_filename(os.path.basename(data.get('filename') or ''))
+    if not filename:
+        return None
+    return build_upload_key(utility.type, filename)
+
+
+def _owns_key(utility, s3_key):
+    # Completion calls may only point at keys under this utility's upload prefix
+    prefix = build_upload_key(utility.type, '')
+    return isinstance(s3_key, str) and s3_key.startswith(prefix) and '/' not in s3_key[len(prefix):]
+
+
+def _valid_upload_id(upload_id):
+    return isinstance(upload_id, str) and bool(upload_id)
+
+
+def _valid_parts(parts):
+    # [{"PartNumber": int, "ETag": str}, ...] within S3's part number range
+    return (isinstance(parts, list) and 0 < len(parts) <= S3_MAX_PART_NUMBER and all(
+        isinstance(part, dict)
+        and type(part.get('PartNumber')) is int and 1 <= part['PartNumber'] <= S3_MAX_PART_NUMBER
+        and isinstance(part.get('ETag'), str) and part['ETag']
+        for part in parts
+    ))
+
+
+def _record_upload(request, utility, s3_key, action):
+    # A direct upload replaces any content-addressed file the record pointed at
+    old_blob_id = utility.file_blob_id
+    utility.file_s3_key = s3_key
+    utility.file_blob = None
+    with transaction.atomic():
+        utility.save(update_fields=['file_s3_key', 'file_blob'])
+        blobs.release(old_blob_id)
+        trigger_file_processor(s3_key, request.user.id, action)
+    return JsonResponse({'utility_id': utility.pk, 'key': s3_key})
+
+
+@login_required
+@require_POST
+def upload_presign(request):
+    # Single-request uploads: returns a presigned POST policy for uploads/{type}/{filename}
+    data = _load_json(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    utility, error = _user_utility(request, data)
+    if error:
+        return error
+    s3_key = _upload_target(utility, data)
+    if not s3_key:
+        return JsonResponse({'error': 'filename is required'}, status=400)
+    post = presign_utility_upload(
+        s3_key, UPLOAD_URL_EXPIRATION,
+        max_size=settings.UTILITY_UPLOAD_MAX_BYTES,
+        content_type=data.get('content_type') or None,
+        user_id=request.user.id,
+    )
+    if post is None:
+        return JsonResponse({'error': 'Could not sign upload'}, status=502)
+    return JsonResponse({'utility_id': utility.pk, 'key': s3_key, 'url': post['url'], 'fields': post['fields']})
+
+
+@login_required
+@require_POST
+def upload_complete(request):
+    # Called after a presigned POST succeeds; records the key and fires the processor
+    data = _load_json(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    utility, error = _user_utility(request, data)
+    if error:
+        return error
+    s3_key = data.get('key')
+    if not _owns_key(utility, s3_key):
+        return JsonResponse({'error': 'Key does not belong to this utility'}, status=400)
+    if not utility_file_exists(s3_key):
+        return JsonResponse({'error': 'Uploaded object not found'}, status=409)
+    return _record_upload(request, utility, s3_key, 'file_upload')
+
+
+@login_required
+@require_POST
+def multipart_start(request):
+    data = _load_json(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    utility, error = _user_utility(request, data)
+    if error:
+        return error
+    s3_key = _upload_target(utility, data)
+    if not s3_key:
+        return JsonResponse({'error': 'filename is required'}, status=400)
+    upload_id = start_utility_multipart_upload(s3_key, data.get('content_type') or None, request.user.id)
+    if upload_id is None:
+        return JsonResponse({'error': 'Could not start upload'}, status=502)
+    return JsonResponse({'utility_id': utility.pk, 'key': s3_key, 'upload_id': upload_id})
+
+
+@login_required
+@require_POST
+def multipart_parts(request):
+    # Signs upload_part URLs for the requested part numbers (1..10000)
+    data = _load_json(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    utility, error = _user_utility(request, data)
+    if error:
+        return error
+    s3_key, upload_id = data.get('key'), data.get('upload_id')
+    if not _owns_key(utility, s3_key) or not _valid_upload_id(upload_id):
+        return JsonResponse({'error': 'key and upload_id are required'}, status=400)
+    try:
+        part_numbers = [int(n) for n in data.get('part_numbers') or []]
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'part_numbers must be integers'}, status=400)
+    if not part_numbers or len(part_numbers) > MAX_PARTS_PER_REQUEST:
+        return JsonResponse({'error': f'Request between 1 and {MAX_PARTS_PER_REQUEST} parts'}, status=400)
+    if any(n < 1 or n > S3_MAX_PART_NUMBER for n in part_numbers):
+        return JsonResponse({'error': f'Part numbers must be between 1 and {S3_MAX_PART_NUMBER}'}, status=400)
+    urls = {n: presign_utility_upload_part(s3_key, upload_id, n, UPLOAD_URL_EXPIRATION) for n in part_numbers}
+    return JsonResponse({'key': s3_key, 'upload_id': upload_id, 'urls': urls})
+
+
+@login_required
+@require_POST
+def multipart_complete(request):
+    # parts: [{"PartNumber": 1, "ETag": "..."}] as returned by S3 to the browser
+    data = _load_json(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    utility, error = _user_utility(request, data)
+    if error:
+        return error
+    s3_key, upload_id, parts = data.get('key'), data.get('upload_id'), data.get('parts')
+    if not _owns_key(utility, s3_key) or not _valid_upload_id(upload_id):
+        return JsonResponse({'error': 'key and upload_id are required'}, status=400)
+    if not _valid_parts(parts):
+        return JsonResponse({'error': 'parts must be a list of {"PartNumber": int, "ETag": str}'}, status=400)
+    if not complete_utility_multipart_upload(s3_key, upload_id, parts):
+        return JsonResponse({'error': 'Could not complete upload'}, status=502)
+    return _record_upload(request, utility, s3_key, 'file_upload')
+
+
+@login_required
+@require_POST
+def multipart_abort(request):
+    data = _load_json(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    utility, error = _user_utility(request, data)
+    if error:
+        return error
+    s3_key, upload_id = data.get('key'), data.get('upload_id')
+    if not _owns_key(utility, s3_key) or not _valid_upload_id(upload_id):
+        return JsonResponse({'error': 'key and upload_id are required'}, status=400)
+    return JsonResponse({'aborted': abort_utility_multipart_upload(s3_key, upload_id)})
+
+
+def _import_status(utility_import):
+    return {
+        'id': utility_import.pk,
+        'file_name': utility_import.file_name,
+        'status': utility_import.status,
+        'total_rows': utility_import.total_rows,
+        'imported_rows': utility_import.imported_rows,
+        'failed_rows': utility_import.failed_rows,
+        'errors': utility_import.errors,
+        'created_at': utility_import.created_at.isoformat(),
+        'finished_at': utility_import.finished_at.isoformat() if utility_import.finished_at else None,
+    }
+
+
+@login_required
+@require_POST
+def import_create(request):
+    # Streams the uploaded CSV through utilities.importer; very large files are
+    # better run with `python manage.py import_utilities`
+    csv_file = request.FILES.get('file')
+    if not csv_file:
+        return JsonResponse({'error': 'file is required'}, status=400)
+    utility_import = UtilityImport.objects.create(user=request.user, file_name=csv_file.name[:255])
+    utility_import = run_import(utility_import, open_text(csv_file.file))
+    status = 200 if utility_import.status == 'completed' else 400
+    return JsonResponse(_import_status(utility_import), status=status)
+
+
+@login_required
+@require_GET
+def import_status(request, pk):
+    utility_import = get_object_or_404(UtilityImport, pk=pk, user=request.user)
+    return JsonResponse(_import_status(utility_import))
+
+
+@login_required
+@require_GET
+def usage_summary(request):
+    # ?period=day|month&start=YYYY-MM-DD&end=YYYY-MM-DD&type=gas, served from UsageRollup
+    period = request.GET.get('period', 'month')
+    if period not in rollups.PERIODS:
+        return JsonResponse({'error': f"period must be one of {', '.join(rollups.PERIODS)}"}, status=400)
+    utility_type = request.GET.get('type') or None
+    if utility_type and utility_type not in dict(Utility.UTILITY_TYPES):
+        return JsonResponse({'error': 'Unknown utility type'}, status=400)
+    bounds = {}
+    for name in ('start', 'end'):
+        value = request.GET.get(name)
+        try:
+            bounds[name] = parse_date(value) if value else None
+        except ValueError:
+            bounds[name] = None
+        if value and bounds[name] is None:
+            return JsonResponse({'error': f'{name} must be a date (YYYY-MM-DD)'}, status=400)
+    start, end = bounds['start'], bounds['end']
+    return JsonResponse(rollups.summarize(request.user, period, start, end, utility_type))
+
+
+@login_required
+@require_GET
+def usage_chart(request):
+    # ?period=day|week|month&type=gas&start=YYYY-MM-DD&end=YYYY-MM-DD&window=7
+    # Imported here so numpy only loads in workers that actually serve charts
+    from . import analytics
+    period = request.GET.get('period', 'day')
+    if period not in analytics.PERIODS:
+        return JsonResponse({'error': f"period must be one of {', '.join(analytics.PERIODS)}"}, status=400)
+    utility_type = request.GET.get('type') or None
+    if utility_type and utility_type not in analytics.TYPE_CODES:
+        return JsonResponse({'error': 'Unknown utility type'}, status=400)
+    try:
+        window = max(1, min(int(request.GET.get('window', 7)), 365))
+    except ValueError:
+        return JsonResponse({'error': 'window must be an integer'}, status=400)
+    start = day_start(request.GET.get('start'))
+    end = day_start(request.GET.get('end'))
+    for name, value in (('start', start), ('end', end)):
+        if request.GET.get(name) and value is None:
+            return JsonResponse({'error': f'{name} must be a date (YYYY-MM-DD)'}, status=400)
+    series = analytics.load_series(
+        request.user, start,
+        end + timedelta(days=1) if end else None,
+        [utility_type] if utility_type else None,
+    )
+    return JsonResponse(dict(analytics.usage_chart(series, period, window), type=utility_type))
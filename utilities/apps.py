@@ -1,5 +1,25 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 class UtilitiesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'utilities'
+
+    def ready(self):
+        # Pool size / retry / timeout overrides for the shared boto3 clients
+        options = getattr(settings, 'AWS_CLIENT_OPTIONS', None)
+        if options:
+            from python_library.aws_clients import configure
+            configure(**options)
+        # TTL/size of the DynamoDB record cache, and its optional shared tier
+        record_cache = getattr(settings, 'UTILITY_RECORD_CACHE', None)
+        if record_cache:
+            from django.core.cache import caches
+            from python_library.utility_aws_pkg_chetanpatil import aws
+            alias = record_cache.get('shared_alias')
+            aws.record_cache.configure(
+                ttl=record_cache.get('ttl'),
+                max_entries=record_cache.get('max_entries'),
+                shared=caches[alias] if alias else None,
+                shared_ttl=record_cache.get('shared_ttl'),
+            )
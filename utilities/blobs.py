@@ -0,0 +1,125 @@
+# Content-addressed storage for uploaded utility files.
+# HashingUploadHandler computes each upload's SHA-256 while Django streams the
+# request body in, so no extra pass over the file is needed. store() maps the
+# hash to uploads/{type}/sha256/{hash}{ext}: when a FileBlob for that key
+# already exists the S3 upload is skipped entirely, otherwise the bytes are
+# streamed up once. Utility rows point at their blob (Utility.file_blob) and
+# FileBlob.ref_count tracks how many do; `collect_file_blobs` deletes
+# unreferenced blobs from S3 after a grace period.
+#
+# Direct-to-S3 uploads (api_views) never pass through the app server, so they
+# keep their per-filename keys and are not deduplicated.
+#
+# The object's user-id metadata names the user whose upload first stored the
+# bytes; that is also the user the processor Lambda is triggered for, since
+# reused blobs are not processed again.
+
+import hashlib
+import os
+from datetime import timedelta
+
+from django.core.files.uploadhandler import FileUploadHandler
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from python_library.utility_aws_pkg_chetanpatil import delete_utility_file, upload_utility_stream
+from .models import FileBlob
+
+BLOB_GRACE_PERIOD = timedelta(days=1)
+
+
+class HashingUploadHandler(FileUploadHandler):
+    # Listed first in FILE_UPLOAD_HANDLERS: hashes every chunk and passes it on
+    # unchanged to the memory/temporary-file handlers that actually store it
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        hashes = getattr(self.request, 'upload_hashes', None)
+        if hashes is None:
+            hashes = self.request.upload_hashes = {}
+        hashes[(self.field_name, self.file_name)] = self.hasher.hexdigest()
+        return None  # let the next handler build the UploadedFile
+
+
+def content_hash(request, field_name, file_obj):
+    # Hash recorded by HashingUploadHandler, or computed here if it did not run
+    digest = getattr(request, 'upload_hashes', {}).get((field_name, file_obj.name))
+    if digest is None:
+        hasher = hashlib.sha256()
+        for chunk in file_obj.chunks():
+            hasher.update(chunk)
+        digest = hasher.hexdigest()
+    return digest
+
+
+def blob_key(utility_type, digest, filename=''):
+    # The extension is kept so S3 objects still open with the right program
+    extension = os.path.splitext(filename)[1].lower()[:10]
+    return f'uploads/{utility_type}/sha256/{digest}{extension}'
+
+
+def store(file_obj, utility_type, digest, progress_callback=None, user_id=None):
+    # Returns (blob, uploaded) or (None, False) if the upload failed. The blob
+    # is not referenced yet; call add_reference() in the saving transaction.
+    key = blob_key(utility_type, digest, file_obj.name)
+    # Reuse bumps last_used_at so a concurrent collect_file_blobs cannot
+    # remove the object between this check and add_reference()
+    if FileBlob.objects.filter(key=key).update(last_used_at=timezone.now()):
+        print(f"Identical file already stored, skipping upload: {key}")
+        return FileBlob.objects.get(key=key), False
+
+    uploaded = upload_utility_stream(file_obj.chunks(), key, progress_callback=progress_callback,
+                                     content_type=file_obj.content_type, user_id=user_id)
+    if not uploaded:
+        return None, False
+    try:
+        with transaction.atomic():
+            blob = FileBlob.objects.create(key=key, sha256=digest, size=file_obj.size,
+                                           content_type=file_obj.content_type or '')
+    except IntegrityError:
+        # Someone stored the same content meanwhile; same bytes, same key
+        blob = FileBlob.objects.get(key=key)
+    return blob, True
+
+
+def add_reference(blob):
+    FileBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1, last_used_at=timezone.now())
+
+
+def release(blob_id):
+    # Drops one reference; the object itself is removed later by collect()
+    if blob_id:
+        FileBlob.objects.filter(pk=blob_id, ref_count__gt=0).update(
+            ref_count=F('ref_count') - 1, last_used_at=timezone.now()
+        )
+
+
+def collect(grace=BLOB_GRACE_PERIOD, dry_run=False):
+    # Deletes blobs nobody references and nobody has touched for `grace`;
+    # returns the number removed. Each row stays locked while its S3 object is
+    # deleted, so a concurrent add_reference() waits and then sees it gone.
+    cutoff = timezone.now() - grace
+    candidates = list(FileBlob.objects.filter(ref_count=0, last_used_at__lt=cutoff).values_list('pk', flat=True))
+    removed = 0
+    for pk in candidates:
+        with transaction.atomic():
+            blob = FileBlob.objects.select_for_update().filter(
+                pk=pk, ref_count=0, last_used_at__lt=cutoff
+            ).first()
+            if blob is None:
+                continue
+            if dry_run:
+                print(f"Would delete {blob.key}")
+            elif delete_utility_file(blob.key):
+                blob.delete()
+            else:
+                continue
+            removed += 1
+    return removed
@@ -0,0 +1,125 @@
+# Coalesced admin notifications.
+# Instead of one synchronous SNS publish per login/signup, record() stores an
+# AdminEvent row (a single INSERT on the request path). flush_due() later folds
+# all pending events of a kind into one message ("137 logins in the last 5
+# minutes") and hands it to the outbox 'sns' kind for async delivery. Each kind
+# publishes at most once per ADMIN_DIGEST_INTERVALS window, which is also its
+# rate limit. Flushing runs from `run_outbox` and, with OUTBOX_DISPATCH =
+# 'thread', from a per-process timer armed by record().
+
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from . import outbox
+from .models import AdminEvent
+
+# Minimum seconds between two digests of the same kind
+ADMIN_DIGEST_INTERVALS = {
+    'login': 300,
+    'signup': 60,
+}
+ADMIN_DIGEST_DEFAULT_INTERVAL = 300
+# Wait this long after the first event of a burst before publishing, so a burst
+# ends up in one digest even when the kind has not published recently
+ADMIN_DIGEST_MIN_DELAY = 30
+ADMIN_DIGEST_SAMPLE_LINES = 10
+ADMIN_EVENT_RETENTION_DAYS = 7
+
+EVENT_LABELS = {
+    'login': ('login', 'logins'),
+    'signup': ('new signup', 'new signups'),
+}
+
+_timer = None
+_timer_lock = threading.Lock()
+
+
+def interval_for(kind):
+    return timedelta(seconds=ADMIN_DIGEST_INTERVALS.get(kind, ADMIN_DIGEST_DEFAULT_INTERVAL))
+
+
+def record(kind, subject, message=''):
+    # Called on the request path; the publish happens later
+    event = AdminEvent.objects.create(kind=kind, subject=subject, message=message)
+    if getattr(settings, 'OUTBOX_DISPATCH', 'thread') == 'thread':
+        transaction.on_commit(lambda: schedule_flush(ADMIN_DIGEST_MIN_DELAY))
+    return event
+
+
+def schedule_flush(delay):
+    # At most one pending timer per process; an earlier one covers later events
+    global _timer
+    with _timer_lock:
+        if _timer is not None and _timer.is_alive():
+            return
+        _timer = threading.Timer(delay, _flush_in_thread)
+        _timer.daemon = True
+        _timer.start()
+
+
+def _flush_in_thread():
+    global _timer
+    with _timer_lock:
+        _timer = None
+    try:
+        next_due = flush_due()
+        if next_due is not None:
+            schedule_flush(max((next_due - timezone.now()).total_seconds(), 1))
+    except Exception:
+        traceback.print_exc()
+    finally:
+        connection.close()
+
+
+def _describe(kind, count, since, now):
+    singular, plural = EVENT_LABELS.get(kind, (f"{kind} event", f"{kind} events"))
+    minutes = max(1, round((now - since).total_seconds() / 60))
+    return f"{count} {singular if count == 1 else plural} in the last {minutes} minute{'s' if minutes != 1 else ''}"
+
+
+def _publish(kind, now):
+    # Claims every pending event of `kind` and enqueues one digest for them
+    claimed = AdminEvent.objects.filter(kind=kind, digested_at__isnull=True, created_at__lte=now)
+    with transaction.atomic():
+        if not claimed.update(digested_at=now):
+            return 0
+        events = AdminEvent.objects.filter(kind=kind, digested_at=now).order_by('created_at', 'id')
+        count = events.count()
+        first = events.first()
+        summary = _describe(kind, count, first.created_at, now)
+        lines = [f"- {timezone.localtime(e.created_at):%H:%M:%S} {e.message or e.subject}"
+                 for e in events[:ADMIN_DIGEST_SAMPLE_LINES]]
+        if count > ADMIN_DIGEST_SAMPLE_LINES:
+            lines.append(f"... and {count - ADMIN_DIGEST_SAMPLE_LINES} more")
+        subject = first.subject if count == 1 else f"Admin Digest - {summary}"
+        outbox.enqueue('sns', {'subject': subject[:100], 'message': summary + "\n\n" + "\n".join(lines)})
+    return count
+
+
+def flush_due(now=None):
+    # Publishes every kind whose window has elapsed; returns when the next
+    # still-held kind becomes due (or None if nothing is pending)
+    now = now or timezone.now()
+    pending = (AdminEvent.objects.filter(digested_at__isnull=True)
+               .values_list('kind').annotate(first=Min('created_at')).order_by())
+    last_sent = dict(AdminEvent.objects.filter(digested_at__isnull=False)
+                     .values_list('kind').annotate(last=Max('digested_at')).order_by())
+    next_due = None
+    for kind, first in pending:
+        due_at = first + timedelta(seconds=ADMIN_DIGEST_MIN_DELAY)
+        if kind in last_sent:
+            due_at = max(due_at, last_sent[kind] + interval_for(kind))
+        if due_at <= now:
+            _publish(kind, now)
+        elif next_due is None or due_at < next_due:
+            next_due = due_at
+    AdminEvent.objects.filter(
+        digested_at__lt=now - timedelta(days=ADMIN_EVENT_RETENTION_DAYS)
+    ).delete()
+    return next_due
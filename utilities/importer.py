@@ -0,0 +1,196 @@
+# Bulk CSV import of meter readings.
+# Rows flow through a generator pipeline (csv reader -> parse/validate ->
+# fixed-size chunks), so memory stays constant however large the file is.
+# Each chunk is inserted with one bulk_create (plus one rollup update per
+# touched bucket), mirrored to both DynamoDB tables with batch_writer and
+# announced on SQS through the buffered batch producer. A chunk whose batch
+# write fails is handed to the outbox, which retries it record by record.
+# Readings also feed the anomaly statistics; anything unusual is reported in
+# one alert per import.
+#
+# Expected columns: type, usage, date, notes (notes optional), e.g.
+#   type,usage,date,notes
+#   electricity,132.5,2025-01-31T08:00:00,January meter read
+
+import csv
+import io
+import math
+from datetime import datetime
+from itertools import islice
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from python_library.utility_aws_pkg_chetanpatil import (
+    add_timeseries_records,
+    add_utility_records,
+    get_utility_task_producer,
+)
+from python_library.utility_messages import encode_task_message
+from python_library.utility_record import UtilityRecord
+from . import anomalies, outbox, rollups
+from .models import Utility, UtilityImport
+
+IMPORT_CHUNK_SIZE = 2000
+MAX_RECORDED_ERRORS = 100
+# How long the end of an import waits for buffered SQS task messages
+IMPORT_SQS_FLUSH_TIMEOUT = 60
+VALID_TYPES = frozenset(dict(Utility.UTILITY_TYPES))
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def open_text(binary_file):
+    # Wraps an uploaded/opened binary file for csv without reading it into memory
+    return io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+
+
+def parse_date(value):
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ImportRowError(f"invalid date '{value}'")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_row(row):
+    utility_type = (row.get('type') or '').strip().lower()
+    if utility_type not in VALID_TYPES:
+        raise ImportRowError(f"unknown type '{utility_type}'")
+    try:
+        usage = float(row.get('usage') or '')
+    except ValueError:
+        raise ImportRowError(f"invalid usage '{row.get('usage')}'")
+    if not math.isfinite(usage):
+        raise ImportRowError(f"invalid usage '{row.get('usage')}'")
+    return utility_type, usage, parse_date((row.get('date') or '').strip()), (row.get('notes') or '').strip()
+
+
+def parsed_rows(text_stream):
+    # Yields (line_number, parsed tuple or ImportRowError) for every data row
+    reader = csv.DictReader(text_stream)
+    missing = {'type', 'usage', 'date'} - set(reader.fieldnames or [])
+    if missing:
+        raise ImportRowError(f"missing column(s): {', '.join(sorted(missing))}")
+    for line_number, row in enumerate(reader, start=2):
+        try:
+            yield line_number, parse_row(row)
+        except ImportRowError as e:
+            yield line_number, e
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _mirror(user, created):
+    # DynamoDB + SQS mirroring for one inserted chunk, batched on both sides.
+    # Returns False when the DynamoDB batch failed and the chunk was queued in
+    # the outbox instead.
+    records = [UtilityRecord.from_model(utility) for utility in created]
+    mirrored = bool(add_utility_records(records)) and bool(add_timeseries_records(records))
+    if not mirrored:
+        with transaction.atomic():
+            for record in records:
+                outbox.enqueue('dynamodb_put', record.to_payload())
+    producer = get_utility_task_producer()
+    for record in records:
+        producer.send(encode_task_message(record.to_message('utility.created', user.email), compact=True))
+    return mirrored
+
+
+def import_chunk(user, chunk):
+    # Returns (created utilities, [(line, error)], [anomaly]) for one chunk of parsed rows
+    utilities, errors = [], []
+    for line_number, parsed in chunk:
+        if isinstance(parsed, ImportRowError):
+            errors.append((line_number, str(parsed)))
+            continue
+        utility_type, usage, date, notes = parsed
+        utilities.append(Utility(user=user, type=utility_type, usage=usage, date=date, notes=notes))
+    with transaction.atomic():
+        created = Utility.objects.bulk_create(utilities)
+        # One rollup UPDATE per touched (type, day/month) bucket for the whole chunk
+        rollups.add_readings(user.id, ((u.type, u.date, u.usage) for u in created))
+        found = anomalies.observe_many(user.id, ((u.type, u.date, u.usage) for u in created))
+    return created, errors, found
+
+
+def run_import(utility_import, text_stream, chunk_size=IMPORT_CHUNK_SIZE):
+    user = utility_import.user
+    UtilityImport.objects.filter(pk=utility_import.pk).update(status='running')
+    recorded_errors, unusual, unusual_count = [], [], 0
+    producer = get_utility_task_producer()
+    dropped_before = producer.stats['failed']
+    try:
+        for chunk in chunked(parsed_rows(text_stream), chunk_size):
+            created, errors, found = import_chunk(user, chunk)
+            mirrored = _mirror(user, created)
+            unusual.extend(found[:anomalies.MAX_ALERT_LINES - len(unusual)])
+            unusual_count += len(found)
+            room = MAX_RECORDED_ERRORS - len(recorded_errors)
+            recorded_errors.extend({'line': line, 'error': error} for line, error in errors[:room])
+            if not mirrored:
+                recorded_errors.append({'line': chunk[0][0], 'error': f"DynamoDB mirroring failed for "
+                                        f"{len(created)} readings from this line on; queued for retry"})
+            # Progress is committed per chunk so the status endpoint can follow along
+            UtilityImport.objects.filter(pk=utility_import.pk).update(
+                total_rows=F('total_rows') + len(chunk),
+                imported_rows=F('imported_rows') + len(created),
+                failed_rows=F('failed_rows') + len(errors),
+                errors=recorded_errors,
+            )
+        # Bounded: a producer that cannot reach SQS must not hang the import
+        if not producer.flush(timeout=IMPORT_SQS_FLUSH_TIMEOUT):
+            recorded_errors.append({'line': None, 'error': f"SQS task messages still unsent after "
+                                                           f"{IMPORT_SQS_FLUSH_TIMEOUT}s"})
+        dropped = producer.stats['failed'] - dropped_before
+        if dropped:
+            recorded_errors.append({'line': None, 'error': f"{dropped} SQS task messages could not be sent"})
+        status = 'completed'
+    except ImportRowError as e:
+        recorded_errors.append({'line': 1, 'error': str(e)})
+        status = 'failed'
+    except UnicodeDecodeError:
+        recorded_errors.append({'line': None, 'error': 'file is not UTF-8 encoded CSV'})
+        status = 'failed'
+    except Exception as e:
+        # csv.Error, database or AWS errors: never leave the import 'running'
+        recorded_errors.append({'line': None, 'error': f"{type(e).__name__}: {e}"})
+        UtilityImport.objects.filter(pk=utility_import.pk).update(
+            status='failed', errors=recorded_errors, finished_at=timezone.now()
+        )
+        raise
+
+    UtilityImport.objects.filter(pk=utility_import.pk).update(
+        status=status, errors=recorded_errors, finished_at=timezone.now()
+    )
+    utility_import.refresh_from_db()
+    anomalies.alert(user, unusual, context=f"imported ({utility_import.file_name})", total=unusual_count)
+    if user.email:
+        # One summary email per import instead of one per reading
+        send_mail(
+            f"Utility Import {utility_import.get_status_display()}",
+            (f"Hello {user.username},\nYour import of {utility_import.file_name} finished: "
+             f"{utility_import.imported_rows} readings imported, "
+             f"{utility_import.failed_rows} rows rejected."),
+            settings.DEFAULT_FROM_EMAIL,
+            [user.email],
+            fail_silently=False,
+        )
+    return utility_import
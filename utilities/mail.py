@@ -0,0 +1,148 @@
+# Queued email delivery.
+# EMAIL_BACKEND points at QueuedEmailBackend, so send_mail() and friends only
+# serialize the message into the outbox (one INSERT, inside the caller's
+# transaction). The outbox worker then hands queued messages to
+# send_queued(), which sends them over one long-lived SMTP connection per
+# worker thread instead of a fresh TLS handshake per email. Transient SMTP
+# errors are retried with the outbox backoff; permanent ones (5xx, refused
+# recipients) fail the message straight away.
+#
+# To try it against a local debugging server:
+#   python -m aiosmtpd -n -l localhost:1025   (or, before Python 3.12,
+#   python -m smtpd -n -c DebuggingServer localhost:1025)
+# with EMAIL_HOST = 'localhost', EMAIL_PORT = 1025, EMAIL_USE_TLS = False.
+
+import base64
+import smtplib
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+MAIL_DELIVERY_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Reconnect after this long even if the server has not dropped us; most
+# servers close idle sessions after a few minutes anyway
+MAIL_CONNECTION_MAX_AGE = 120
+
+_local = threading.local()
+
+
+class PermanentMailError(Exception):
+    pass
+
+
+def serialize(message):
+    payload = {
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': list(message.to),
+        'cc': list(message.cc),
+        'bcc': list(message.bcc),
+        'reply_to': list(message.reply_to),
+        'headers': dict(message.extra_headers),
+        'alternatives': [list(alt) for alt in getattr(message, 'alternatives', [])],
+        'attachments': [],
+    }
+    for attachment in message.attachments:
+        if not isinstance(attachment, tuple):
+            raise ValueError("Queued email only supports (filename, content, mimetype) attachments")
+        filename, content, mimetype = attachment
+        if isinstance(content, str):
+            content = content.encode()
+        payload['attachments'].append([filename, base64.b64encode(content).decode('ascii'), mimetype])
+    return payload
+
+
+def deserialize(payload):
+    if 'body' not in payload:
+        # Rows queued before this backend existed: {subject, message, recipients}
+        return EmailMessage(payload['subject'], payload['message'], settings.DEFAULT_FROM_EMAIL,
+                            payload['recipients'])
+    message = EmailMultiAlternatives(
+        payload['subject'], payload['body'], payload['from_email'], payload['to'],
+        bcc=payload['bcc'], cc=payload['cc'], reply_to=payload['reply_to'], headers=payload['headers'],
+    )
+    for content, mimetype in payload['alternatives']:
+        message.attach_alternative(content, mimetype)
+    for filename, content, mimetype in payload['attachments']:
+        message.attach(filename, base64.b64decode(content), mimetype)
+    return message
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        # Imported here: the outbox imports this module for its 'email' handler
+        from . import outbox
+        queued = 0
+        for message in email_messages:
+            if not message.recipients():
+                continue
+            try:
+                outbox.enqueue('email', serialize(message))
+            except Exception:
+                if not self.fail_silently:
+                    raise
+                continue
+            queued += 1
+        return queued
+
+
+def _connection():
+    # One open SMTP connection per thread, replaced when it gets too old
+    connection = getattr(_local, 'connection', None)
+    if connection is not None and time.monotonic() - _local.opened_at > MAIL_CONNECTION_MAX_AGE:
+        close_connection()
+        connection = None
+    if connection is None:
+        backend = getattr(settings, 'MAIL_DELIVERY_BACKEND', MAIL_DELIVERY_BACKEND)
+        connection = get_connection(backend, fail_silently=False)
+        connection.open()
+        _local.connection, _local.opened_at = connection, time.monotonic()
+    return connection
+
+
+def close_connection():
+    connection = getattr(_local, 'connection', None)
+    _local.connection = None
+    if connection is not None:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+def _is_permanent(error):
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    code = getattr(error, 'smtp_code', None)
+    return isinstance(error, smtplib.SMTPResponseException) and code is not None and 500 <= code < 600
+
+
+def send_queued(payloads):
+    # Sends each payload over the shared connection; returns one entry per
+    # payload: None on success, otherwise the exception (PermanentMailError for
+    # errors retrying cannot fix)
+    results = []
+    for payload in payloads:
+        message = deserialize(payload)
+        for attempt in (1, 2):
+            try:
+                _connection().send_messages([message])
+                results.append(None)
+                break
+            except (smtplib.SMTPServerDisconnected, ConnectionError) as e:
+                # The server dropped the kept-alive session; reconnect once
+                close_connection()
+                if attempt == 2:
+                    results.append(e)
+            except Exception as e:
+                if _is_permanent(e):
+                    results.append(PermanentMailError(f"{type(e).__name__}: {e}"))
+                else:
+                    close_connection()
+                    results.append(e)
+                break
+    return results
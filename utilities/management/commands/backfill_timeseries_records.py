@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from python_library.utility_aws_pkg_chetanpatil import add_timeseries_records, scan_utility_records
+from python_library.utility_record import UtilityRecord
+from utilities.models import Utility
+
+
+def owners(items):
+    # utility_id -> user_id. Items from the file processor carry their user;
+    # items mirrored by the app are keyed by the Utility pk ("42" or "util-42").
+    # Rows from before utilities.user existed have no owner and are left out.
+    result, pks = {}, {}
+    for item in items:
+        utility_id = item['utility_id']
+        if item.get('user_id'):
+            result[utility_id] = item['user_id']
+            continue
+        pk = utility_id[len('util-'):] if utility_id.startswith('util-') else utility_id
+        if pk.isdigit():
+            pks[int(pk)] = utility_id
+    for pk, user_id in Utility.objects.filter(pk__in=list(pks), user__isnull=False).values_list('pk', 'user_id'):
+        result[pks[pk]] = user_id
+    return result
+
+
+class Command(BaseCommand):
+    help = ("Copy UtilityRecords2025 into the per-user time-series table (UtilityReadings2025) "
+            "with a parallel Scan. Safe to re-run: items are overwritten, not duplicated.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--segments', type=int, default=4,
+                            help="Parallel Scan segments (one thread each)")
+        parser.add_argument('--dry-run', action='store_true', help="Count what would be copied")
+
+    def copy_segment(self, segment, total_segments, dry_run):
+        copied = skipped = 0
+        try:
+            for page in scan_utility_records(segment, total_segments):
+                users = owners(page)
+                records = [UtilityRecord.from_item(dict(item, user_id=users[item['utility_id']])) for item in page
+                           if item['utility_id'] in users and item.get('date') and item.get('type')]
+                skipped += len(page) - len(records)
+                if records and not dry_run and not add_timeseries_records(records):
+                    raise RuntimeError(f"Writing segment {segment} failed")
+                copied += len(records)
+        finally:
+            connection.close()  # worker threads open their own DB connections
+        return copied, skipped
+
+    def handle(self, *args, **options):
+        total = max(1, options['segments'])
+        with ThreadPoolExecutor(max_workers=total) as executor:
+            results = list(executor.map(lambda segment: self.copy_segment(segment, total, options['dry_run']),
+                                        range(total)))
+        copied = sum(result[0] for result in results)
+        skipped = sum(result[1] for result in results)
+        verb = "Would copy" if options['dry_run'] else "Copied"
+        self.stdout.write(f"{verb} {copied} record(s); skipped {skipped} without a known user, date or type")
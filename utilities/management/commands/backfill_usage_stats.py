@@ -0,0 +1,25 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from utilities import anomalies
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the per-user/type usage statistics used for anomaly detection "
+            "by replaying every reading once, oldest first. No alerts are sent.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only rebuild this username or email")
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help="Readings fetched per database round trip")
+
+    def handle(self, *args, **options):
+        user_id = None
+        if options['user']:
+            user = User.objects.filter(Q(username=options['user']) | Q(email=options['user'])).first()
+            if user is None:
+                raise CommandError(f"No user matching {options['user']}")
+            user_id = user.pk
+        rows, flagged = anomalies.replay(user_id, options['chunk_size'])
+        self.stdout.write(f"Rebuilt {rows} usage stats row(s); {flagged} historical reading(s) would have been flagged")
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from utilities import blobs
+
+
+class Command(BaseCommand):
+    help = "Delete content-addressed upload blobs that no utility record references any more."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=blobs.BLOB_GRACE_PERIOD.total_seconds() / 3600,
+                            help="Only delete blobs unreferenced and unused for at least this long")
+        parser.add_argument('--dry-run', action='store_true', help="List what would be deleted")
+
+    def handle(self, *args, **options):
+        removed = blobs.collect(timedelta(hours=options['grace_hours']), options['dry_run'])
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write(f"{verb} {removed} unreferenced blob(s)")
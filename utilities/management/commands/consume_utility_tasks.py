@@ -0,0 +1,56 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from python_library.utility_aws_pkg_chetanpatil import (
+    QUEUE_NAME,
+    SQS_CONSUMER_CONCURRENCY,
+    SQS_RECEIVE_WAIT_SECONDS,
+    SQS_VISIBILITY_TIMEOUT,
+    create_utility_task_consumer,
+)
+from python_library.utility_messages import decode_task_message
+
+
+def handle_task(body, message):
+    # Raises MessageFormatError for garbage, which leaves the message for the redrive policy
+    task = decode_task_message(body)
+    print(f"Processed {task['event']} for util-{task.get('utility_id')}")
+
+
+class Command(BaseCommand):
+    help = "Drain the utility tasks SQS queue with long polling, batched deletes and a worker pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', default=QUEUE_NAME, help="Queue name or URL")
+        parser.add_argument('--concurrency', type=int, default=SQS_CONSUMER_CONCURRENCY)
+        parser.add_argument('--visibility-timeout', type=int, default=SQS_VISIBILITY_TIMEOUT)
+        parser.add_argument('--wait-seconds', type=int, default=SQS_RECEIVE_WAIT_SECONDS)
+        parser.add_argument('--metrics-interval', type=float, default=30.0,
+                            help="Seconds between metrics lines (0 disables)")
+        parser.add_argument('--exit-when-idle', action='store_true',
+                            help="Stop once a receive returns nothing and all work is finished")
+
+    def handle(self, *args, **options):
+        consumer = create_utility_task_consumer(
+            handle_task,
+            options['queue'],
+            concurrency=options['concurrency'],
+            visibility_timeout=options['visibility_timeout'],
+            wait_seconds=options['wait_seconds'],
+        )
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+        if options['metrics_interval'] > 0:
+            def report():
+                while not stop.wait(options['metrics_interval']):
+                    self.stdout.write(f"Consumer metrics: {consumer.metrics_snapshot()}")
+            threading.Thread(target=report, daemon=True).start()
+
+        try:
+            consumer.run(stop, exit_when_idle=options['exit_when_idle'])
+        except KeyboardInterrupt:
+            stop.set()
+        self.stdout.write(f"Consumer stopped: {consumer.metrics_snapshot()}")
@@ -0,0 +1,37 @@
+import os
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from utilities.importer import IMPORT_CHUNK_SIZE, open_text, run_import
+from utilities.models import UtilityImport
+
+
+class Command(BaseCommand):
+    help = "Bulk import meter readings from a CSV file with columns type, usage, date, notes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file to import")
+        parser.add_argument('--user', required=True, help="Username or email of the owner")
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(Q(username=options['user']) | Q(email=options['user'])).first()
+        if user is None:
+            raise CommandError(f"No user matching {options['user']}")
+        if not os.path.exists(options['path']):
+            raise CommandError(f"File not found: {options['path']}")
+
+        utility_import = UtilityImport.objects.create(user=user, file_name=os.path.basename(options['path'])[:255])
+        with open(options['path'], 'rb') as f:
+            utility_import = run_import(utility_import, open_text(f), options['chunk_size'])
+
+        self.stdout.write(
+            f"Import #{utility_import.pk} {utility_import.status}: {utility_import.imported_rows} imported, "
+            f"{utility_import.failed_rows} rejected of {utility_import.total_rows} rows"
+        )
+        for error in utility_import.errors[:10]:
+            self.stdout.write(f"  line {error['line']}: {error['error']}")
+        if utility_import.status != 'completed':
+            raise CommandError("Import failed")
@@ -0,0 +1,22 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from utilities import rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily/monthly usage rollups from the Utility table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only rebuild this username or email")
+
+    def handle(self, *args, **options):
+        user_id = None
+        if options['user']:
+            user = User.objects.filter(Q(username=options['user']) | Q(email=options['user'])).first()
+            if user is None:
+                raise CommandError(f"No user matching {options['user']}")
+            user_id = user.pk
+        written = rollups.rebuild(user_id)
+        self.stdout.write(f"Rebuilt {written} rollup bucket(s)")
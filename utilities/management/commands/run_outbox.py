@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from utilities.digest import flush_due
+from utilities.outbox import deliver_pending
+
+
+class Command(BaseCommand):
+    help = ("Deliver pending outbox messages (email, DynamoDB, SQS, SNS, Lambda) with retries and backoff, "
+            "and publish admin event digests as their windows elapse.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the currently due messages and exit")
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds to sleep when nothing is due")
+
+    def handle(self, *args, **options):
+        while True:
+            flush_due()
+            attempted = deliver_pending(options['batch_size'])
+            if attempted:
+                self.stdout.write(f"Delivered batch of {attempted} outbox message(s)")
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,18 @@
+from django.db import migrations, models
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utilities', '0003_utility_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='utility',
+            index=models.Index(fields=['user', '-date', '-id'], name='utility_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='utility',
+            index=models.Index(fields=['user', 'type', '-date', '-id'], name='utility_user_type_date_idx'),
+        ),
+    ]
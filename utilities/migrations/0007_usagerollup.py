@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('utilities', '0006_utilityimport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('electricity', 'Electricity'), ('gas', 'Gas'), ('steam', 'Steam'), ('air_conditioning', 'Air Conditioning')], max_length=20)),
+                ('period', models.CharField(choices=[('day', 'Day'), ('month', 'Month')], max_length=5)),
+                ('bucket', models.DateField()),
+                ('total', models.FloatField(default=0)),
+                ('minimum', models.FloatField(blank=True, null=True)),
+                ('maximum', models.FloatField(blank=True, null=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'period', 'bucket'], name='usage_rollup_user_bucket_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='usagerollup',
+            constraint=models.UniqueConstraint(fields=('user', 'type', 'period', 'bucket'), name='usage_rollup_unique'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('utilities', '0007_usagerollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsageStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('electricity', 'Electricity'), ('gas', 'Gas'), ('steam', 'Steam'), ('air_conditioning', 'Air Conditioning')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('mean', models.FloatField(default=0)),
+                ('m2', models.FloatField(default=0)),
+                ('ewma', models.FloatField(blank=True, null=True)),
+                ('last_reading_at', models.DateTimeField(blank=True, null=True)),
+                ('anomalies', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='usagestats',
+            constraint=models.UniqueConstraint(fields=('user', 'type'), name='usage_stats_unique'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utilities', '0008_usagestats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdminEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=30)),
+                ('subject', models.CharField(max_length=200)),
+                ('message', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('digested_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'digested_at'], name='admin_event_kind_digest_idx')],
+            },
+        ),
+    ]
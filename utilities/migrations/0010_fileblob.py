@@ -0,0 +1,30 @@
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utilities', '0009_adminevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True)),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('content_type', models.CharField(blank=True, max_length=100)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='utility',
+            name='file_blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='utilities', to='utilities.fileblob'),
+        ),
+    ]
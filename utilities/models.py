@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class Utility(models.Model):
     UTILITY_TYPES = [
@@ -14,7 +15,150 @@ class Utility(models.Model):
     date = models.DateTimeField()
     notes = models.TextField(blank=True)
     file_s3_key = models.CharField(max_length=255, blank=True, null=True)
+    # Set for files stored content-addressed (utilities.blobs); file_s3_key is then blob.key
+    file_blob = models.ForeignKey('FileBlob', on_delete=models.SET_NULL, null=True, blank=True,
+                                  related_name='utilities')
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
 
+    class Meta:
+        # Composite indexes backing the dashboard's keyset pagination and type filter
+        indexes = [
+            models.Index(fields=['user', '-date', '-id'], name='utility_user_date_idx'),
+            models.Index(fields=['user', 'type', '-date', '-id'], name='utility_user_type_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.type} - {self.usage}"
+
+class OutboxMessage(models.Model):
+    # Side effects (email, DynamoDB, SQS, Lambda) written in the same transaction
+    # as the change that caused them and delivered later by utilities.outbox
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=30)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    # Messages sharing a key are delivered strictly in enqueue order (e.g. all
+    # DynamoDB writes for one utility); blank means no ordering constraint
+    ordering_key = models.CharField(max_length=64, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+            models.Index(fields=['ordering_key', 'status'], name='outbox_ordering_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+class UtilityImport(models.Model):
+    # Progress/status record for one bulk CSV import (see utilities.importer)
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    file_name = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    total_rows = models.PositiveIntegerField(default=0)
+    imported_rows = models.PositiveIntegerField(default=0)
+    failed_rows = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Import #{self.pk} ({self.status})"
+
+class UsageRollup(models.Model):
+    # Pre-aggregated usage per user, utility type and day/month bucket,
+    # maintained incrementally by utilities.rollups
+    PERIOD_CHOICES = [
+        ('day', 'Day'),
+        ('month', 'Month'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    type = models.CharField(max_length=20, choices=Utility.UTILITY_TYPES)
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    bucket = models.DateField()  # the day, or the first day of the month
+    total = models.FloatField(default=0)
+    minimum = models.FloatField(null=True, blank=True)
+    maximum = models.FloatField(null=True, blank=True)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'type', 'period', 'bucket'], name='usage_rollup_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'period', 'bucket'], name='usage_rollup_user_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.type} {self.period} {self.bucket}: {self.total}"
+
+class UsageStats(models.Model):
+    # Running usage statistics per user and utility type (Welford mean/variance
+    # plus an EWMA), updated in O(1) per reading by utilities.anomalies
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    type = models.CharField(max_length=20, choices=Utility.UTILITY_TYPES)
+    count = models.PositiveIntegerField(default=0)
+    mean = models.FloatField(default=0)
+    m2 = models.FloatField(default=0)  # sum of squared deviations from the mean
+    ewma = models.FloatField(null=True, blank=True)
+    last_reading_at = models.DateTimeField(null=True, blank=True)
+    anomalies = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'type'], name='usage_stats_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.type} stats for user {self.user_id}: n={self.count} mean={self.mean:.2f}"
+
+class AdminEvent(models.Model):
+    # Buffered admin notification (login, signup, ...); utilities.digest folds
+    # pending events of one kind into a single SNS digest per window
+    kind = models.CharField(max_length=30)
+    subject = models.CharField(max_length=200)
+    message = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    digested_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'digested_at'], name='admin_event_kind_digest_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}: {self.subject}"
+
+class FileBlob(models.Model):
+    # One stored S3 object per distinct file content (and utility type),
+    # shared by every Utility whose upload had the same SHA-256
+    key = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField(default=0)
+    content_type = models.CharField(max_length=100, blank=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped whenever the blob is reused so garbage collection leaves it alone
+    last_used_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.key} ({self.ref_count} refs)"
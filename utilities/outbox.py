@@ -0,0 +1,251 @@
+# Transactional outbox for utility side effects.
+# Views call enqueue() inside the same transaction as the model change, so the
+# request only pays for a local INSERT. Delivery happens afterwards, either on a
+# small in-process thread pool (OUTBOX_DISPATCH = 'thread') or from the
+# `run_outbox` management command. Rows stay in the table until delivered, so a
+# crashed worker just means the message is retried once its lease expires.
+
+import random
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from python_library.utility_aws_pkg_chetanpatil import (
+    SNS_TOPIC_ARN,
+    add_timeseries_records,
+    delete_timeseries_record,
+    delete_utility_record,
+    publish_utility_alert,
+    put_utility_record,
+    send_utility_task,
+    trigger_utility_file_processor,
+)
+from python_library.utility_record import UtilityRecord
+from . import mail
+from .models import OutboxMessage
+
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_BACKOFF_BASE_SECONDS = 5
+OUTBOX_BACKOFF_MAX_SECONDS = 3600
+# A claimed message is invisible to other workers for this long; if the worker
+# dies mid-delivery the message becomes due again afterwards. It has to outlast
+# one handler call (up to OUTBOX_BATCH_SIZE emails for a batch kind).
+OUTBOX_LEASE_SECONDS = 300
+OUTBOX_THREADS = 4
+# Largest group handed to one call of a batch handler
+OUTBOX_BATCH_SIZE = 50
+
+HANDLERS = {}
+# Kinds whose handler takes a list of payloads and returns one result per
+# payload (None or the exception), so a worker can deliver them together
+BATCH_KINDS = set()
+_executor = None
+
+
+class OutboxDeliveryError(Exception):
+    pass
+
+
+class PermanentDeliveryError(OutboxDeliveryError):
+    # Retrying will not help; the message is marked failed immediately
+    pass
+
+
+def handler(kind, batch=False):
+    # Registers the delivery function for one kind of outbox message
+    def register(func):
+        HANDLERS[kind] = func
+        if batch:
+            BATCH_KINDS.add(kind)
+        return func
+    return register
+
+
+def _check(result, what):
+    # The AWS package reports failures as False instead of raising
+    if result is False:
+        raise OutboxDeliveryError(f"{what} failed")
+
+
+@handler('email', batch=True)
+def deliver_email(payloads):
+    # Payloads come from utilities.mail.QueuedEmailBackend; all of them go
+    # over the worker thread's kept-open SMTP connection
+    return [PermanentDeliveryError(str(error)) if isinstance(error, mail.PermanentMailError) else error
+            for error in mail.send_queued(payloads)]
+
+
+@handler('dynamodb_put')
+def deliver_dynamodb_put(payload):
+    record = UtilityRecord.from_payload(payload)
+    _check(put_utility_record(record), 'DynamoDB put')
+    # Messages queued before the time-series table existed carry no user
+    if record.user_id is None:
+        return
+    _check(add_timeseries_records([record]), 'DynamoDB time-series put')
+    # The date is part of the time-series key, so an edited date leaves the
+    # old item behind unless it is removed
+    if payload.get('previous_date') and payload['previous_date'] != record.date:
+        _check(delete_timeseries_record(record.user_id, payload['previous_date'], record.utility_id),
+               'DynamoDB time-series delete')
+
+
+@handler('dynamodb_delete')
+def deliver_dynamodb_delete(payload):
+    _check(delete_utility_record(payload['utility_id']), 'DynamoDB delete')
+    if payload.get('user_id'):
+        _check(delete_timeseries_record(payload['user_id'], payload['date'], payload['utility_id']),
+               'DynamoDB time-series delete')
+
+
+@handler('sqs')
+def deliver_sqs(payload):
+    _check(send_utility_task(payload['queue'], payload['body']), 'SQS send')
+
+
+@handler('sns')
+def deliver_sns(payload):
+    _check(publish_utility_alert(payload.get('topic', SNS_TOPIC_ARN), payload['message'], payload['subject']),
+           'SNS publish')
+
+
+@handler('lambda')
+def deliver_lambda(payload):
+    _check(trigger_utility_file_processor(payload['key'], payload['user_id'], payload['action']),
+           'Lambda invoke')
+
+
+def ordering_key(kind, payload):
+    # A retried put must not land after a later delete of the same record (and
+    # bring it back), so DynamoDB writes are ordered per utility
+    if kind in ('dynamodb_put', 'dynamodb_delete'):
+        return f"utility:{payload['utility_id']}"
+    return ''
+
+
+def enqueue(kind, payload):
+    # Must be called inside the caller's transaction; delivery starts after commit
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown outbox message kind: {kind}")
+    message = OutboxMessage.objects.create(kind=kind, payload=payload, ordering_key=ordering_key(kind, payload))
+    if getattr(settings, 'OUTBOX_DISPATCH', 'thread') == 'thread':
+        transaction.on_commit(lambda: _get_executor().submit(_deliver_in_thread, message.pk))
+    return message
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=OUTBOX_THREADS, thread_name_prefix='outbox')
+    return _executor
+
+
+def _deliver_in_thread(pk):
+    try:
+        while pk is not None and _claim(pk, timezone.now()):
+            message = OutboxMessage.objects.get(pk=pk)
+            pk = None
+            if deliver(message) and message.ordering_key:
+                # The next message for this key waited on this one; send it now
+                # rather than leaving it to run_outbox
+                pk = OutboxMessage.objects.filter(
+                    ordering_key=message.ordering_key, status='pending', pk__gt=message.pk
+                ).order_by('pk').values_list('pk', flat=True).first()
+    except Exception:
+        traceback.print_exc()
+    finally:
+        # Pool threads are not request-scoped, so release their DB connection
+        connection.close()
+
+
+def _claim(pk, now):
+    # Conditional UPDATE so only one worker wins a given message. A message
+    # with an ordering key waits while an earlier one with the same key is
+    # still pending (including one claimed by another worker right now).
+    earlier = OutboxMessage.objects.filter(
+        ordering_key=OuterRef('ordering_key'), status='pending', pk__lt=OuterRef('pk')
+    ).exclude(ordering_key='')
+    return OutboxMessage.objects.filter(
+        pk=pk, status='pending', next_attempt_at__lte=now
+    ).exclude(Exists(earlier)).update(
+        attempts=F('attempts') + 1,
+        next_attempt_at=now + timedelta(seconds=OUTBOX_LEASE_SECONDS),
+    ) == 1
+
+
+def backoff_delay(attempts):
+    delay = min(OUTBOX_BACKOFF_MAX_SECONDS, OUTBOX_BACKOFF_BASE_SECONDS * 2 ** max(attempts - 1, 0))
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def _record_outcome(message, error):
+    if error is not None:
+        message.last_error = f"{type(error).__name__}: {error}"
+        if isinstance(error, PermanentDeliveryError) or message.attempts >= OUTBOX_MAX_ATTEMPTS:
+            message.status = 'failed'
+        else:
+            message.next_attempt_at = timezone.now() + backoff_delay(message.attempts)
+        message.save(update_fields=['status', 'last_error', 'next_attempt_at'])
+        print(f"Outbox delivery failed for {message}: {message.last_error}")
+        return False
+    message.status = 'sent'
+    message.sent_at = timezone.now()
+    message.save(update_fields=['status', 'sent_at'])
+    return True
+
+
+def deliver(message):
+    # Runs the handler for one claimed message and records the outcome
+    try:
+        if message.kind in BATCH_KINDS:
+            error = HANDLERS[message.kind]([message.payload])[0]
+        else:
+            HANDLERS[message.kind](message.payload)
+            error = None
+    except Exception as e:
+        error = e
+    return _record_outcome(message, error)
+
+
+def deliver_batch(messages):
+    # Claimed messages of one batch kind, delivered with a single handler call
+    try:
+        results = HANDLERS[messages[0].kind]([message.payload for message in messages])
+    except Exception as e:
+        results = [e] * len(messages)
+    return sum(_record_outcome(message, error) for message, error in zip(messages, results))
+
+
+def deliver_pending(limit=100):
+    # Delivers up to `limit` due messages; returns how many were attempted.
+    # Each message (or batch-kind group of OUTBOX_BATCH_SIZE) is claimed just
+    # before it is delivered, so the lease only has to cover that one call
+    # rather than the whole pass; anything not reached yet stays claimable.
+    due = list(
+        OutboxMessage.objects.filter(status='pending', next_attempt_at__lte=timezone.now())
+        .order_by('next_attempt_at', 'id')
+        .values_list('pk', 'kind')[:limit]
+    )
+    attempted = 0
+    batches = {}
+    for pk, kind in due:
+        if kind in BATCH_KINDS:
+            batches.setdefault(kind, []).append(pk)
+        elif _claim(pk, timezone.now()):
+            deliver(OutboxMessage.objects.get(pk=pk))
+            attempted += 1
+    for kind, pks in batches.items():
+        for start in range(0, len(pks), OUTBOX_BATCH_SIZE):
+            group = pks[start:start + OUTBOX_BATCH_SIZE]
+            now = timezone.now()
+            claimed = OutboxMessage.objects.in_bulk([pk for pk in group if _claim(pk, now)])
+            messages = [claimed[pk] for pk in group if pk in claimed]
+            if messages:
+                deliver_batch(messages)
+                attempted += len(messages)
+    return attempted
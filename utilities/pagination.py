@@ -0,0 +1,72 @@
+# Keyset (cursor) pagination helpers for the dashboard.
+# Pages are ordered newest first by (date, id) so the database can walk the
+# (user, date, id) index instead of counting/skipping rows with OFFSET.
+
+import base64
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+DASHBOARD_PAGE_SIZE = 50
+
+
+def encode_cursor(utility):
+    # The cursor is just the sort key of the last row on the page
+    raw = f"{utility.date.isoformat()}|{utility.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    # Returns (date, id) or None for a missing/garbled cursor (treated as first page)
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        date_str, pk_str = raw.rsplit('|', 1)
+        date = parse_datetime(date_str)
+        if date is None:
+            return None
+        return date, int(pk_str)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def day_start(value):
+    # Turn a YYYY-MM-DD string into an aware datetime at midnight; None for
+    # anything else, including well-formed dates that do not exist (2024-02-30)
+    try:
+        day = parse_date(value or '')
+    except ValueError:
+        return None
+    if day is None:
+        return None
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def filter_utilities(queryset, utility_type=None, start=None, end=None):
+    # Server-side filters; 'end' is inclusive of the whole day
+    if utility_type:
+        queryset = queryset.filter(type=utility_type)
+    start_dt = day_start(start)
+    if start_dt:
+        queryset = queryset.filter(date__gte=start_dt)
+    end_dt = day_start(end)
+    if end_dt:
+        queryset = queryset.filter(date__lt=end_dt + timedelta(days=1))
+    return queryset
+
+
+def keyset_page(queryset, cursor=None, page_size=DASHBOARD_PAGE_SIZE):
+    # Fetch one page after 'cursor'; one extra row tells us whether there is a next page
+    queryset = queryset.order_by('-date', '-id')
+    position = decode_cursor(cursor)
+    if position:
+        date, pk = position
+        queryset = queryset.filter(Q(date__lt=date) | Q(date=date, id__lt=pk))
+    rows = list(queryset[:page_size + 1])
+    items = rows[:page_size]
+    next_cursor = encode_cursor(items[-1]) if len(rows) > page_size else None
+    return items, next_cursor
@@ -0,0 +1,162 @@
+# Incrementally maintained usage rollups (see models.UsageRollup).
+# Every reading contributes to one 'day' and one 'month' bucket per user and
+# type. Creates/edits/deletes adjust those buckets with single UPDATEs, so
+# totals and trends are read from O(buckets) rows instead of scanning readings.
+# Sums and counts are exact under concurrency (F expressions); min/max are
+# recomputed from the bucket's readings only when a removed value was the
+# current extreme. `rebuild_rollups` regenerates everything from scratch.
+
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Sum, Value
+from django.db.models.functions import Greatest, Least, TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import UsageRollup, Utility
+
+PERIODS = ('day', 'month')
+
+
+def buckets_for(moment):
+    # Buckets follow the site's local calendar, matching the dashboard dates
+    day = timezone.localtime(moment).date() if timezone.is_aware(moment) else moment.date()
+    return (('day', day), ('month', day.replace(day=1)))
+
+
+def bucket_range(period, bucket):
+    # Aware [start, end) datetimes covered by one bucket
+    if period == 'day':
+        end = bucket + timedelta(days=1)
+    else:
+        end = (bucket.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return (timezone.make_aware(datetime.combine(bucket, time.min)),
+            timezone.make_aware(datetime.combine(end, time.min)))
+
+
+def _aggregate(readings):
+    # readings: iterable of (type, date, usage) -> {(type, period, bucket): [sum, min, max, count]}
+    deltas = {}
+    for utility_type, moment, usage in readings:
+        for period, bucket in buckets_for(moment):
+            key = (utility_type, period, bucket)
+            delta = deltas.get(key)
+            if delta is None:
+                deltas[key] = [usage, usage, usage, 1]
+            else:
+                delta[0] += usage
+                delta[1] = min(delta[1], usage)
+                delta[2] = max(delta[2], usage)
+                delta[3] += 1
+    return deltas
+
+
+def add_readings(user_id, readings):
+    # One UPDATE (or INSERT for a new bucket) per touched bucket, however many readings
+    for (utility_type, period, bucket), (total, low, high, count) in _aggregate(readings).items():
+        rollups = UsageRollup.objects.filter(user_id=user_id, type=utility_type, period=period, bucket=bucket)
+        changes = {
+            'total': F('total') + total,
+            'count': F('count') + count,
+            'minimum': Least('minimum', Value(low)),
+            'maximum': Greatest('maximum', Value(high)),
+        }
+        if rollups.update(**changes):
+            continue
+        try:
+            with transaction.atomic():
+                UsageRollup.objects.create(user_id=user_id, type=utility_type, period=period, bucket=bucket,
+                                           total=total, minimum=low, maximum=high, count=count)
+        except IntegrityError:
+            # Another request created the bucket first
+            rollups.update(**changes)
+
+
+def add_reading(user_id, utility_type, moment, usage):
+    add_readings(user_id, [(utility_type, moment, usage)])
+
+
+def remove_reading(user_id, utility_type, moment, usage):
+    # Call after the reading itself has been deleted/changed so a min/max
+    # recompute sees the bucket's remaining readings
+    for period, bucket in buckets_for(moment):
+        rollups = UsageRollup.objects.filter(user_id=user_id, type=utility_type, period=period, bucket=bucket)
+        rollups.update(total=F('total') - usage, count=F('count') - 1)
+        rollup = rollups.first()
+        if rollup is None:
+            continue
+        if rollup.count <= 0:
+            rollup.delete()
+        elif usage <= rollup.minimum or usage >= rollup.maximum:
+            start, end = bucket_range(period, bucket)
+            extremes = Utility.objects.filter(
+                user_id=user_id, type=utility_type, date__gte=start, date__lt=end
+            ).aggregate(low=Min('usage'), high=Max('usage'))
+            rollups.update(minimum=extremes['low'], maximum=extremes['high'])
+
+
+def replace_reading(user_id, old, new):
+    # old/new: (type, date, usage) before and after an edit
+    if old == new:
+        return
+    remove_reading(user_id, *old)
+    add_reading(user_id, *new)
+
+
+def rebuild(user_id=None):
+    # Recomputes every bucket with two GROUP BY queries; returns rows written
+    readings = Utility.objects.exclude(user__isnull=True)
+    existing = UsageRollup.objects.all()
+    if user_id is not None:
+        readings = readings.filter(user_id=user_id)
+        existing = existing.filter(user_id=user_id)
+    rows = []
+    for period, trunc in (('day', TruncDate('date')), ('month', TruncMonth('date'))):
+        grouped = (readings.annotate(bucket=trunc)
+                   .values('user_id', 'type', 'bucket')
+                   .annotate(total=Sum('usage'), minimum=Min('usage'), maximum=Max('usage'), count=Count('id'))
+                   .order_by())
+        for row in grouped:
+            bucket = row['bucket']
+            if isinstance(bucket, datetime):
+                bucket = timezone.localtime(bucket).date() if timezone.is_aware(bucket) else bucket.date()
+            rows.append(UsageRollup(period=period, **dict(row, bucket=bucket)))
+    with transaction.atomic():
+        existing.delete()
+        UsageRollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def summarize(user, period='month', start=None, end=None, utility_type=None):
+    # Series and per-type totals read straight from the rollup table
+    rollups = UsageRollup.objects.filter(user=user, period=period).order_by('bucket', 'type')
+    if utility_type:
+        rollups = rollups.filter(type=utility_type)
+    if start:
+        rollups = rollups.filter(bucket__gte=start)
+    if end:
+        rollups = rollups.filter(bucket__lte=end)
+
+    series, totals = [], {}
+    for rollup in rollups.values('type', 'bucket', 'total', 'minimum', 'maximum', 'count'):
+        series.append(dict(rollup, bucket=rollup['bucket'].isoformat(),
+                           average=rollup['total'] / rollup['count'] if rollup['count'] else None))
+        summary = totals.setdefault(rollup['type'], {'total': 0.0, 'count': 0,
+                                                      'minimum': rollup['minimum'], 'maximum': rollup['maximum']})
+        summary['total'] += rollup['total']
+        summary['count'] += rollup['count']
+        summary['minimum'] = min(summary['minimum'], rollup['minimum'])
+        summary['maximum'] = max(summary['maximum'], rollup['maximum'])
+    return {'period': period, 'series': series, 'totals': totals}
+
+
+def current_month_cards(user):
+    # Dashboard cards: this month's total/count per utility type
+    this_month = timezone.localdate().replace(day=1)
+    rows = {r.type: r for r in UsageRollup.objects.filter(user=user, period='month', bucket=this_month)}
+    return [
+        {'type': value, 'label': label,
+         'total': rows[value].total if value in rows else 0.0,
+         'count': rows[value].count if value in rows else 0}
+        for value, label in Utility.UTILITY_TYPES
+    ]
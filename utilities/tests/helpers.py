@@ -0,0 +1,43 @@
+# Shared setup for tests that talk to AWS: every test runs against moto's
+# in-memory services, with the shared client registry emptied so no client
+# built outside the mock (or for an earlier test) is reused.
+
+import os
+
+from django.test import TestCase, override_settings
+from moto import mock_aws
+
+from python_library import aws_clients
+from python_library.utility_aws_pkg_chetanpatil import BUCKET_NAME, aws
+
+FAKE_CREDENTIALS = {
+    'AWS_ACCESS_KEY_ID': 'testing',
+    'AWS_SECRET_ACCESS_KEY': 'testing',
+    'AWS_SESSION_TOKEN': 'testing',
+    'AWS_DEFAULT_REGION': 'us-east-1',
+}
+
+
+@override_settings(OUTBOX_DISPATCH='worker')
+class AWSTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self._saved_env = {name: os.environ.get(name) for name in FAKE_CREDENTIALS}
+        os.environ.update(FAKE_CREDENTIALS)
+        self.addCleanup(self._restore_env)
+        self.mock = mock_aws()
+        self.mock.start()
+        self.addCleanup(self.mock.stop)
+        aws_clients.reset()
+        self.addCleanup(aws_clients.reset)
+        aws.record_cache.clear()
+        aws._queue_urls.clear()
+        self.s3 = aws_clients.get_client('s3')
+        self.s3.create_bucket(Bucket=BUCKET_NAME)
+
+    def _restore_env(self):
+        for name, value in self._saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
@@ -0,0 +1,145 @@
+import base64
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from python_library.utility_aws_pkg_chetanpatil import BUCKET_NAME
+from utilities.models import OutboxMessage, Utility
+
+from .helpers import AWSTestCase
+
+
+class DirectUploadTests(AWSTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'pw')
+        self.utility = Utility.objects.create(user=self.user, type='gas', usage=12.5, date=timezone.now())
+        self.client.force_login(self.user)
+
+    def post(self, name, data):
+        return self.client.post(reverse(name), json.dumps(data), content_type='application/json')
+
+    def test_presign_policy_limits_key_size_and_type(self):
+        response = self.post('upload_presign', {'utility_id': self.utility.pk, 'filename': '../bill 1.pdf',
+                                                'content_type': 'application/pdf'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['key'], 'uploads/gas/bill_1.pdf')
+        self.assertEqual(data['fields']['key'], 'uploads/gas/bill_1.pdf')
+        self.assertIn(BUCKET_NAME, data['url'])
+        policy = json.loads(base64.b64decode(data['fields']['policy']))
+        self.assertIn(['content-length-range', 1, settings.UTILITY_UPLOAD_MAX_BYTES], policy['conditions'])
+        self.assertIn({'Content-Type': 'application/pdf'}, policy['conditions'])
+        # The processor Lambda reads the uploader from the object's metadata
+        self.assertEqual(data['fields']['x-amz-meta-user-id'], str(self.user.pk))
+        self.assertIn({'x-amz-meta-user-id': str(self.user.pk)}, policy['conditions'])
+
+    def test_presign_requires_filename(self):
+        response = self.post('upload_presign', {'utility_id': self.utility.pk})
+        self.assertEqual(response.status_code, 400)
+
+    def test_non_numeric_utility_id_is_rejected(self):
+        for name in ('upload_presign', 'upload_complete', 'multipart_start', 'multipart_abort'):
+            response = self.post(name, {'utility_id': 'abc', 'filename': 'a.csv'})
+            self.assertEqual(response.status_code, 400, name)
+
+    def test_other_users_utility_is_not_found(self):
+        other = User.objects.create_user('bob', 'bob@example.com', 'pw')
+        theirs = Utility.objects.create(user=other, type='gas', usage=1, date=timezone.now())
+        response = self.post('upload_presign', {'utility_id': theirs.pk, 'filename': 'a.csv'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_complete_rejects_keys_outside_the_utility_prefix(self):
+        for key in ('uploads/electricity/a.csv', 'uploads/gas/nested/a.csv', 'other/a.csv', ''):
+            response = self.post('upload_complete', {'utility_id': self.utility.pk, 'key': key})
+            self.assertEqual(response.status_code, 400, key)
+
+    def test_complete_requires_the_object(self):
+        response = self.post('upload_complete', {'utility_id': self.utility.pk, 'key': 'uploads/gas/a.csv'})
+        self.assertEqual(response.status_code, 409)
+
+    def test_complete_records_key_and_queues_processor(self):
+        self.s3.put_object(Bucket=BUCKET_NAME, Key='uploads/gas/a.csv', Body=b'type,usage,date\n')
+        response = self.post('upload_complete', {'utility_id': self.utility.pk, 'key': 'uploads/gas/a.csv'})
+        self.assertEqual(response.status_code, 200)
+        self.utility.refresh_from_db()
+        self.assertEqual(self.utility.file_s3_key, 'uploads/gas/a.csv')
+        message = OutboxMessage.objects.get(kind='lambda')
+        self.assertEqual(message.payload['key'], 'uploads/gas/a.csv')
+
+    def test_multipart_upload_complete(self):
+        start = self.post('multipart_start', {'utility_id': self.utility.pk, 'filename': 'big.csv'}).json()
+        key, upload_id = start['key'], start['upload_id']
+        parts = self.post('multipart_parts', {'utility_id': self.utility.pk, 'key': key, 'upload_id': upload_id,
+                                              'part_numbers': [1]}).json()
+        self.assertIn('1', parts['urls'])
+        etag = self.s3.upload_part(Bucket=BUCKET_NAME, Key=key, UploadId=upload_id, PartNumber=1,
+                                   Body=b'x' * 1024)['ETag']
+        response = self.post('multipart_complete', {'utility_id': self.utility.pk, 'key': key,
+                                                    'upload_id': upload_id,
+                                                    'parts': [{'PartNumber': 1, 'ETag': etag}]})
+        self.assertEqual(response.status_code, 200)
+        head = self.s3.head_object(Bucket=BUCKET_NAME, Key=key)
+        self.assertEqual(head['ContentLength'], 1024)
+        self.assertEqual(head['Metadata'], {'user-id': str(self.user.pk)})
+        self.utility.refresh_from_db()
+        self.assertEqual(self.utility.file_s3_key, key)
+
+    def test_multipart_parts_validates_part_numbers(self):
+        start = self.post('multipart_start', {'utility_id': self.utility.pk, 'filename': 'big.csv'}).json()
+        for numbers in ([], [0], [10001], ['x']):
+            response = self.post('multipart_parts', {'utility_id': self.utility.pk, 'key': start['key'],
+                                                     'upload_id': start['upload_id'], 'part_numbers': numbers})
+            self.assertEqual(response.status_code, 400, numbers)
+
+    def test_json_body_must_be_an_object(self):
+        for body in ('[]', '"utility_id"', '3', 'null'):
+            response = self.client.post(reverse('upload_presign'), body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+
+    def test_non_string_keys_are_rejected(self):
+        for key in (['uploads/gas/a.csv'], 12, {'key': 'uploads/gas/a.csv'}):
+            response = self.post('upload_complete', {'utility_id': self.utility.pk, 'key': key})
+            self.assertEqual(response.status_code, 400, key)
+
+    def test_multipart_complete_validates_parts(self):
+        start = self.post('multipart_start', {'utility_id': self.utility.pk, 'filename': 'big.csv'}).json()
+        for parts in ([], 'parts', [1], [['1', 'etag']], [{'PartNumber': '1', 'ETag': 'e'}],
+                      [{'PartNumber': True, 'ETag': 'e'}], [{'PartNumber': 1}], [{'PartNumber': 1, 'ETag': 5}]):
+            response = self.post('multipart_complete', {'utility_id': self.utility.pk, 'key': start['key'],
+                                                         'upload_id': start['upload_id'], 'parts': parts})
+            self.assertEqual(response.status_code, 400, parts)
+        response = self.post('multipart_complete', {'utility_id': self.utility.pk, 'key': start['key'],
+                                                     'upload_id': ['x'], 'parts': [{'PartNumber': 1, 'ETag': 'e'}]})
+        self.assertEqual(response.status_code, 400)
+
+    def test_multipart_abort(self):
+        start = self.post('multipart_start', {'utility_id': self.utility.pk, 'filename': 'big.csv'}).json()
+        response = self.post('multipart_abort', {'utility_id': self.utility.pk, 'key': start['key'],
+                                                 'upload_id': start['upload_id']})
+        self.assertEqual(response.json(), {'aborted': True})
+        self.assertEqual(self.s3.list_multipart_uploads(Bucket=BUCKET_NAME).get('Uploads', []), [])
+
+
+class UsageReportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'pw')
+        self.client.force_login(self.user)
+
+    def test_chart_rejects_dates_that_do_not_exist(self):
+        for params in ({'start': '2024-02-30'}, {'end': 'tomorrow'}):
+            response = self.client.get(reverse('usage_chart'), params)
+            self.assertEqual(response.status_code, 400, params)
+        self.assertEqual(self.client.get(reverse('usage_chart'), {'start': '2024-02-29'}).status_code, 200)
+
+    def test_summary_rejects_dates_that_do_not_exist(self):
+        for params in ({'start': '2024-02-30'}, {'end': '2024-13-01'}, {'start': 'last week'}):
+            response = self.client.get(reverse('usage_summary'), params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('must be a date', response.json()['error'])
+        response = self.client.get(reverse('usage_summary'), {'start': '2024-02-01', 'end': '2024-02-29'})
+        self.assertEqual(response.status_code, 200)
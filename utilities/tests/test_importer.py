@@ -0,0 +1,81 @@
+import io
+from unittest import mock
+
+from django.contrib.auth.models import User
+
+from utilities import importer
+from utilities.models import OutboxMessage, Utility, UtilityImport
+
+from .helpers import AWSTestCase
+
+CSV = 'type,usage,date\nelectricity,10.5,2025-01-01T08:00:00\ngas,bad,2025-01-01T08:00:00\n'
+
+
+class StubProducer:
+    # Stands in for the process-wide SQS batch producer
+    def __init__(self, flushed=True, failed=0):
+        self.sent = []
+        self.flushed = flushed
+        self.stats = {'failed': 0}
+        self._failed = failed
+
+    def send(self, body):
+        self.sent.append(body)
+
+    def flush(self, timeout=None):
+        self.timeout = timeout
+        self.stats['failed'] += self._failed
+        return self.flushed
+
+
+class RunImportTests(AWSTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'pw')
+        self.utility_import = UtilityImport.objects.create(user=self.user, file_name='readings.csv')
+
+    def run_import(self, producer, text=CSV):
+        with mock.patch.object(importer, 'get_utility_task_producer', return_value=producer):
+            return importer.run_import(self.utility_import, io.StringIO(text))
+
+    def errors(self):
+        return [error['error'] for error in UtilityImport.objects.get(pk=self.utility_import.pk).errors]
+
+    def test_failed_dynamodb_mirror_is_queued_in_the_outbox(self):
+        # No tables exist in moto, so both batch writes fail
+        producer = StubProducer()
+        result = self.run_import(producer)
+        self.assertEqual(result.status, 'completed')
+        self.assertEqual((result.imported_rows, result.failed_rows), (1, 1))
+        utility = Utility.objects.get(user=self.user)
+        message = OutboxMessage.objects.get(kind='dynamodb_put')
+        self.assertEqual(message.payload['utility_id'], str(utility.pk))
+        self.assertTrue(any('queued for retry' in error for error in self.errors()))
+        self.assertEqual(len(producer.sent), 1)
+        self.assertEqual(producer.timeout, importer.IMPORT_SQS_FLUSH_TIMEOUT)
+
+    def test_non_finite_usage_is_rejected_per_row(self):
+        text = ('type,usage,date\ngas,nan,2025-01-01T08:00:00\nsteam,inf,2025-01-01T08:00:00\n'
+                'gas,-Infinity,2025-01-01T08:00:00\nelectricity,3,2025-01-01T08:00:00\n')
+        result = self.run_import(StubProducer(), text)
+        self.assertEqual(result.status, 'completed')
+        self.assertEqual((result.imported_rows, result.failed_rows), (1, 3))
+        self.assertEqual(list(Utility.objects.values_list('usage', flat=True)), [3.0])
+        self.assertIn("invalid usage 'nan'", self.errors())
+        self.assertIn("invalid usage 'inf'", self.errors())
+        self.assertIn("invalid usage '-Infinity'", self.errors())
+
+    def test_unsent_task_messages_are_recorded(self):
+        self.run_import(StubProducer(flushed=False, failed=2))
+        errors = self.errors()
+        self.assertTrue(any('still unsent' in error for error in errors))
+        self.assertIn('2 SQS task messages could not be sent', errors)
+
+    def test_unexpected_error_marks_the_import_failed(self):
+        with mock.patch.object(importer, 'import_chunk', side_effect=RuntimeError('database went away')):
+            with self.assertRaises(RuntimeError):
+                self.run_import(StubProducer())
+        utility_import = UtilityImport.objects.get(pk=self.utility_import.pk)
+        self.assertEqual(utility_import.status, 'failed')
+        self.assertIsNotNone(utility_import.finished_at)
+        self.assertEqual(self.errors(), ['RuntimeError: database went away'])
@@ -0,0 +1,166 @@
+import importlib
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import boto3
+
+from python_library.utility_record import UtilityRecord
+
+from .helpers import AWSTestCase
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                'lambda_functions'))
+
+BUCKET = 'utility-uploads-test'
+processor = extraction = None
+
+
+class LambdaTestCase(AWSTestCase):
+    # The Lambda's module-level clients, rebuilt inside moto for each test.
+    # The module is imported here because it builds clients at import time,
+    # which needs the fake region from AWSTestCase.
+    def setUp(self):
+        super().setUp()
+        global processor
+        processor = importlib.import_module('lambda_s3_processor')
+        for name in ('s3', 'sns', 'dynamodb'):
+            self.addCleanup(setattr, processor, name, getattr(processor, name))
+        processor.s3 = boto3.client('s3')
+        processor.sns = boto3.client('sns')
+        processor.dynamodb = boto3.resource('dynamodb')
+        self.s3 = processor.s3
+        self.s3.create_bucket(Bucket=BUCKET)
+        topic = processor.sns.create_topic(Name='utility-alerts-topic-2025')['TopicArn']
+        self.addCleanup(setattr, processor, 'SNS_TOPIC_ARN', processor.SNS_TOPIC_ARN)
+        processor.SNS_TOPIC_ARN = topic
+        self.uploads = processor.dynamodb.create_table(
+            TableName=processor.UPLOADS_TABLE,
+            KeySchema=[{'AttributeName': 'file_key', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'file_key', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST',
+        )
+
+    def invoke(self, key):
+        return processor.lambda_handler({'bucket': BUCKET, 'key': key}, None)
+
+
+class ClaimTests(LambdaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.s3.put_object(Bucket=BUCKET, Key='uploads/gas/bill.pdf', Body=b'%PDF', ContentType='application/pdf')
+
+    def claim(self):
+        return self.uploads.get_item(Key={'file_key': 'uploads/gas/bill.pdf'}).get('Item')
+
+    def test_processed_claim_turns_away_duplicates(self):
+        self.assertIn('"count": 1', self.invoke('uploads/gas/bill.pdf')['body'])
+        self.assertTrue(self.claim()['processed'])
+        self.assertIn('"duplicate_files": ["uploads/gas/bill.pdf"]', self.invoke('uploads/gas/bill.pdf')['body'])
+
+    def test_failed_notification_releases_the_claim(self):
+        processor.SNS_TOPIC_ARN = processor.SNS_TOPIC_ARN + '-missing'
+        self.invoke('uploads/gas/bill.pdf')
+        self.assertIsNone(self.claim())
+
+    def test_stale_unprocessed_claim_is_taken_over(self):
+        details = processor.describe_file((BUCKET, 'uploads/gas/bill.pdf', None))
+        self.assertTrue(processor.claim_file_upload(dict(details), 'earlier'))
+        # Still within the function timeout: another invocation may be working on it
+        self.assertFalse(processor.claim_file_upload(dict(details), 'now'))
+
+        stale = int(time.time()) - processor.FUNCTION_TIMEOUT_SECONDS - 1
+        self.uploads.update_item(Key={'file_key': 'uploads/gas/bill.pdf'},
+                                 UpdateExpression='SET claimed_at = :stale',
+                                 ExpressionAttributeValues={':stale': stale})
+        self.assertIn('"count": 1', self.invoke('uploads/gas/bill.pdf')['body'])
+        self.assertTrue(self.claim()['processed'])
+
+
+class ContentExtractionTests(LambdaTestCase):
+    def setUp(self):
+        super().setUp()
+        global extraction
+        extraction = importlib.import_module('content_extraction')
+        self.records = processor.dynamodb.create_table(
+            TableName=extraction.RECORDS_TABLE,
+            KeySchema=[{'AttributeName': 'utility_id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'utility_id', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST',
+        )
+        self.readings = processor.dynamodb.create_table(
+            TableName=extraction.TIMESERIES_TABLE,
+            KeySchema=[{'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                       {'AttributeName': 'date_id', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[{'AttributeName': 'user_id', 'AttributeType': 'S'},
+                                  {'AttributeName': 'date_id', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST',
+        )
+
+    def upload(self, key, body, **extra):
+        self.s3.put_object(Bucket=BUCKET, Key=key, Body=body.encode(), **extra)
+        return processor.describe_file((BUCKET, key, None))
+
+    def extracted(self):
+        items = self.records.scan()['Items']
+        return sorted((int(item['source_row']), item['type'], float(item['usage']), item['date'], item['notes'])
+                      for item in items)
+
+    def test_csv_rows_split_across_ranges(self):
+        body = ('type,usage,date,notes\n'
+                'electricity,132.5,2025-01-31T08:00:00,January meter read\n'
+                'gas,not-a-number,2025-02-01T08:00:00,\n'
+                'gas,nan,2025-02-02T08:00:00,\n'
+                ',7.25,2025-02-28T08:00:00,Café reading\n')
+        details = self.upload('uploads/gas/export.csv', body)
+        # 7-byte ranges cut every row (and the two-byte é) across GETs
+        result = extraction.extract_readings(self.s3, processor.dynamodb, details, range_size=7)
+        self.assertEqual(result, {'readings': 2, 'skipped': 2})
+        self.assertEqual(self.extracted(), [
+            (1, 'electricity', 132.5, '2025-01-31 08:00:00+00:00', 'January meter read'),
+            (4, 'gas', 7.25, '2025-02-28 08:00:00+00:00', 'Café reading'),
+        ])
+
+    def test_json_array_split_across_ranges(self):
+        body = json.dumps([
+            {'type': 'steam', 'usage': 4.5, 'date': '2025-03-01T00:00:00', 'notes': 'split {braces}'},
+            {'type': 'gas', 'usage': 'x', 'date': '2025-03-02T00:00:00'},
+            {'type': 'electricity', 'usage': 12, 'date': '2025-03-03T02:00:00+02:00'},
+            {'type': 'gas', 'usage': 'Infinity', 'date': '2025-03-04T00:00:00'},
+        ], indent=2)
+        details = self.upload('uploads/steam/export.json', body)
+        result = extraction.extract_readings(self.s3, processor.dynamodb, details, range_size=16)
+        self.assertEqual(result, {'readings': 2, 'skipped': 2})
+        self.assertEqual(self.extracted(), [
+            (1, 'steam', 4.5, '2025-03-01 00:00:00+00:00', 'split {braces}'),
+            (3, 'electricity', 12.0, '2025-03-03 00:00:00+00:00', ''),
+        ])
+
+    def test_newline_delimited_json(self):
+        body = ('{"type": "gas", "usage": 1, "date": "2025-04-01T00:00:00"}\n'
+                '{"type": "gas", "usage": 2, "date": "2025-04-02T00:00:00"}\n')
+        details = self.upload('uploads/gas/export.ndjson', body)
+        result = extraction.extract_readings(self.s3, processor.dynamodb, details, range_size=10)
+        self.assertEqual(result, {'readings': 2, 'skipped': 0})
+
+    def test_truncated_json_is_an_error(self):
+        details = self.upload('uploads/gas/export.json', '[{"type": "gas", "usage": 1, "date": "2025-')
+        with self.assertRaises(ValueError):
+            extraction.extract_readings(self.s3, processor.dynamodb, details, range_size=8)
+
+    def test_s3_event_uses_the_uploaders_metadata(self):
+        body = 'type,usage,date\ngas,3.5,2025-05-01T00:00:00\n'
+        self.s3.put_object(Bucket=BUCKET, Key='uploads/gas/sha256/abc.csv', Body=body.encode(),
+                           Metadata={'user-id': '42'})
+        event = {'Records': [{'s3': {'bucket': {'name': BUCKET}, 'object': {'key': 'uploads/gas/sha256/abc.csv'}}}]}
+        processor.lambda_handler(event, None)
+        items = self.readings.scan()['Items']
+        self.assertEqual([(item['user_id'], item['user_type']) for item in items], [('42', '42#gas')])
+        # Same usage type and date_id format as the app's own writes
+        record = UtilityRecord(items[0]['utility_id'], 'gas', 3.5, datetime(2025, 5, 1, tzinfo=timezone.utc),
+                               user_id=42)
+        self.assertEqual(items[0]['usage'], record.to_item()['usage'])
+        self.assertEqual(items[0]['date_id'], record.to_item(timeseries=True)['date_id'])
+        self.assertEqual(self.records.scan()['Items'][0]['user_id'], '42')
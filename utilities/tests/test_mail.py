@@ -0,0 +1,90 @@
+import smtplib
+from unittest import mock
+
+from django.core import mail as django_mail
+from django.core.mail import send_mail
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from utilities import mail, outbox
+from utilities.models import OutboxMessage
+
+
+class FlakyBackend(LocmemBackend):
+    # Delivery backend whose next sends fail with the queued SMTP errors
+    errors = []
+
+    def send_messages(self, messages):
+        if FlakyBackend.errors:
+            raise FlakyBackend.errors.pop(0)
+        return super().send_messages(messages)
+
+
+class ImmediateExecutor:
+    def submit(self, func, *args):
+        func(*args)
+
+
+@override_settings(EMAIL_BACKEND='utilities.mail.QueuedEmailBackend',
+                   MAIL_DELIVERY_BACKEND='utilities.tests.test_mail.FlakyBackend')
+class QueuedEmailTests(TestCase):
+    def setUp(self):
+        FlakyBackend.errors = []
+        mail.close_connection()
+        self.addCleanup(mail.close_connection)
+
+    def send(self):
+        return send_mail('Usage alert', 'Your usage is up', 'noreply@example.com', ['alice@example.com'])
+
+    def make_due(self):
+        OutboxMessage.objects.filter(status='pending').update(next_attempt_at=timezone.now())
+
+    def test_email_is_sent_once_after_commit(self):
+        with mock.patch.object(outbox, '_get_executor', return_value=ImmediateExecutor()), \
+                mock.patch.object(outbox.connection, 'close'):
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                self.assertEqual(self.send(), 1)
+            self.assertEqual(django_mail.outbox, [])
+            self.assertEqual(len(callbacks), 1)
+            callbacks[0]()
+        self.assertEqual(len(django_mail.outbox), 1)
+        self.assertEqual(django_mail.outbox[0].subject, 'Usage alert')
+        self.assertEqual(OutboxMessage.objects.get(kind='email').status, 'sent')
+
+        # A later worker pass finds nothing left to send
+        outbox.deliver_pending()
+        self.assertEqual(len(django_mail.outbox), 1)
+
+    @override_settings(OUTBOX_DISPATCH='worker')
+    def test_transient_failure_is_retried(self):
+        self.send()
+        FlakyBackend.errors = [smtplib.SMTPResponseException(451, b'try again later')]
+        outbox.deliver_pending()
+        message = OutboxMessage.objects.get(kind='email')
+        self.assertEqual((message.status, message.attempts), ('pending', 1))
+        self.assertIn('451', message.last_error)
+        self.assertEqual(django_mail.outbox, [])
+
+        self.make_due()
+        outbox.deliver_pending()
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('sent', 2))
+        self.assertEqual(len(django_mail.outbox), 1)
+
+    @override_settings(OUTBOX_DISPATCH='worker')
+    def test_dropped_connection_is_reopened(self):
+        self.send()
+        FlakyBackend.errors = [smtplib.SMTPServerDisconnected('idle timeout')]
+        outbox.deliver_pending()
+        self.assertEqual(OutboxMessage.objects.get(kind='email').status, 'sent')
+        self.assertEqual(len(django_mail.outbox), 1)
+
+    @override_settings(OUTBOX_DISPATCH='worker')
+    def test_permanent_failure_is_not_retried(self):
+        self.send()
+        FlakyBackend.errors = [smtplib.SMTPResponseException(550, b'mailbox unavailable')]
+        outbox.deliver_pending()
+        message = OutboxMessage.objects.get(kind='email')
+        self.assertEqual(message.status, 'failed')
+        self.assertEqual(django_mail.outbox, [])
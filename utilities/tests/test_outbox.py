@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from utilities import outbox
+from utilities.models import OutboxMessage
+
+
+@override_settings(OUTBOX_DISPATCH='worker')
+class OutboxOrderingTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        self.failures = set()
+
+        def record(kind):
+            def handler(payload):
+                if (kind, payload['utility_id']) in self.failures:
+                    raise outbox.OutboxDeliveryError("simulated failure")
+                self.calls.append((kind, payload['utility_id']))
+            return handler
+
+        patcher = mock.patch.dict(outbox.HANDLERS, {
+            'dynamodb_put': record('dynamodb_put'),
+            'dynamodb_delete': record('dynamodb_delete'),
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_due(self):
+        OutboxMessage.objects.filter(status='pending').update(next_attempt_at=timezone.now())
+
+    def test_retried_put_is_not_overtaken_by_a_later_delete(self):
+        outbox.enqueue('dynamodb_put', {'utility_id': '7'})
+        outbox.enqueue('dynamodb_delete', {'utility_id': '7'})
+        outbox.enqueue('dynamodb_put', {'utility_id': '8'})
+        self.failures.add(('dynamodb_put', '7'))
+
+        outbox.deliver_pending()
+        self.assertEqual(self.calls, [('dynamodb_put', '8')])
+
+        self.make_due()
+        outbox.deliver_pending()
+        self.assertEqual(self.calls, [('dynamodb_put', '8')])  # the delete still waits for the put
+
+        self.failures.clear()
+        self.make_due()
+        outbox.deliver_pending()
+        outbox.deliver_pending()
+        self.assertEqual(self.calls, [('dynamodb_put', '8'), ('dynamodb_put', '7'), ('dynamodb_delete', '7')])
+
+    def test_failed_message_stops_blocking(self):
+        first = outbox.enqueue('dynamodb_put', {'utility_id': '7'})
+        outbox.enqueue('dynamodb_delete', {'utility_id': '7'})
+        OutboxMessage.objects.filter(pk=first.pk).update(status='failed')
+        outbox.deliver_pending()
+        self.assertEqual(self.calls, [('dynamodb_delete', '7')])
+
+    def test_thread_delivery_follows_up_with_the_waiting_message(self):
+        first = outbox.enqueue('dynamodb_put', {'utility_id': '7'})
+        outbox.enqueue('dynamodb_delete', {'utility_id': '7'})
+        with mock.patch.object(outbox.connection, 'close'):
+            outbox._deliver_in_thread(first.pk)
+        self.assertEqual(self.calls, [('dynamodb_put', '7'), ('dynamodb_delete', '7')])
+
+    def test_messages_are_claimed_just_before_delivery(self):
+        outbox.enqueue('dynamodb_put', {'utility_id': '7'})
+        second = outbox.enqueue('dynamodb_put', {'utility_id': '8'})
+        unclaimed = []
+
+        def check(payload):
+            if payload['utility_id'] == '7':
+                # A slow first delivery must not be eating into the second's lease
+                unclaimed.append(OutboxMessage.objects.get(pk=second.pk).attempts == 0)
+
+        with mock.patch.dict(outbox.HANDLERS, {'dynamodb_put': check}):
+            self.assertEqual(outbox.deliver_pending(), 2)
+        self.assertEqual(unclaimed, [True])
+        self.assertEqual(set(OutboxMessage.objects.values_list('status', flat=True)), {'sent'})
+
+    def test_unrelated_kinds_are_not_ordered(self):
+        message = outbox.enqueue('sqs', {'queue': 'q', 'body': 'b'})
+        self.assertEqual(message.ordering_key, '')
@@ -0,0 +1,224 @@
+import io
+import os
+import signal
+import threading
+import time
+from unittest import mock, skipUnless
+
+from botocore.exceptions import EndpointConnectionError
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from python_library.aws_clients import get_client
+from python_library.utility_aws_pkg_chetanpatil import SQSBatchProducer, SQSConsumer, UtilityAWS
+from python_library.utility_messages import build_task_message, encode_task_message
+
+from .helpers import AWSTestCase
+
+
+class UnreachableSQS:
+    # Stands in for UtilityAWS when the SQS endpoint cannot be reached
+    def __init__(self):
+        self.sqs = mock.Mock()
+        self.sqs.send_message_batch.side_effect = EndpointConnectionError(endpoint_url='https://sqs.invalid')
+
+    def resolve_queue_url(self, queue):
+        return f'https://sqs.invalid/{queue}'
+
+    def invalidate_queue_url(self, queue):
+        pass
+
+
+class SQSBatchProducerTests(SimpleTestCase):
+    def test_transport_errors_are_retried_then_dropped(self):
+        dropped = []
+        producer = SQSBatchProducer(UnreachableSQS(), 'tasks', max_linger=0, max_retries=2,
+                                    on_failure=lambda body, error: dropped.append(body))
+        self.addCleanup(producer.close, 1)
+        producer.send('one')
+        self.assertTrue(producer.flush(timeout=5))
+        self.assertEqual(dropped, ['one'])
+        self.assertEqual(producer.stats['failed'], 1)
+        self.assertTrue(producer._thread.is_alive())
+
+    def test_failing_callback_does_not_stop_the_sender(self):
+        def explode(body, error):
+            raise RuntimeError("callback bug")
+
+        producer = SQSBatchProducer(UnreachableSQS(), 'tasks', max_linger=0, max_retries=0, on_failure=explode)
+        self.addCleanup(producer.close, 1)
+        producer.send('one')
+        self.assertTrue(producer.flush(timeout=5))
+        producer.send('two')
+        self.assertTrue(producer.flush(timeout=5))
+        self.assertTrue(producer._thread.is_alive())
+
+    @skipUnless(hasattr(os, 'fork'), "needs os.fork")
+    def test_forked_child_does_not_inherit_a_held_lock(self):
+        producer = SQSBatchProducer(UnreachableSQS(), 'tasks', max_linger=0, max_retries=0)
+        self.addCleanup(producer.close, 1)
+        producer.send('parent')
+        self.assertTrue(producer.flush(timeout=5))
+        held, release = threading.Event(), threading.Event()
+
+        def hold_lock():
+            with producer._cond:
+                held.set()
+                release.wait(10)
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        held.wait(5)
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # Child: the lock's holder does not exist here
+            try:
+                producer.send('child')
+                flushed = producer.flush(timeout=5)
+                os.write(write_end, f"{flushed} {producer.stats['failed']}".encode())
+            finally:
+                os._exit(0)
+        release.set()
+        holder.join()
+        os.close(write_end)
+        deadline = time.monotonic() + 10
+        while os.waitpid(pid, os.WNOHANG) == (0, 0):
+            if time.monotonic() > deadline:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+                self.fail("forked child deadlocked on the producer lock")
+            time.sleep(0.05)
+        with os.fdopen(read_end) as result:
+            self.assertEqual(result.read(), 'True 1')
+        self.assertEqual(producer.stats['failed'], 1)
+
+    def test_stats_are_updated_under_the_lock(self):
+        producer = SQSBatchProducer(UnreachableSQS(), 'tasks', max_linger=0, max_retries=0)
+        self.addCleanup(producer.close, 1)
+        with producer._cond:
+            producer.send('one')
+            # The flusher cannot record the outcome while we hold the lock
+            time.sleep(0.2)
+            self.assertEqual(producer.stats['failed'], 0)
+        self.assertTrue(producer.flush(timeout=5))
+        self.assertEqual(producer.stats['failed'], 1)
+
+
+class SQSBatchProducerMotoTests(AWSTestCase):
+    def test_messages_arrive_in_batches(self):
+        queue_url = get_client('sqs').create_queue(QueueName='tasks')['QueueUrl']
+        producer = SQSBatchProducer(UtilityAWS(), 'tasks', max_linger=0.05)
+        self.addCleanup(producer.close, 1)
+        for i in range(25):
+            producer.send(f'message {i}')
+        self.assertTrue(producer.flush(timeout=5))
+        self.assertEqual(producer.stats['sent'], 25)
+        attributes = get_client('sqs').get_queue_attributes(QueueUrl=queue_url,
+                                                            AttributeNames=['ApproximateNumberOfMessages'])
+        self.assertEqual(attributes['Attributes']['ApproximateNumberOfMessages'], '25')
+
+
+class SQSConsumerTests(AWSTestCase):
+    def setUp(self):
+        super().setUp()
+        self.sqs = get_client('sqs')
+        self.queue_url = self.sqs.create_queue(QueueName='tasks')['QueueUrl']
+        self.api_calls = []
+        self.sqs.meta.events.register('before-call.sqs', lambda model, **kw: self.api_calls.append(model.name))
+
+    def consumer(self, handler, **options):
+        options.setdefault('wait_seconds', 0)
+        return SQSConsumer(UtilityAWS(), 'tasks', handler, **options)
+
+    def queued(self):
+        attributes = self.sqs.get_queue_attributes(
+            QueueUrl=self.queue_url,
+            AttributeNames=['ApproximateNumberOfMessages', 'ApproximateNumberOfMessagesNotVisible'],
+        )['Attributes']
+        return int(attributes['ApproximateNumberOfMessages']) + int(attributes['ApproximateNumberOfMessagesNotVisible'])
+
+    def test_processed_messages_are_deleted_in_batches(self):
+        for i in range(15):
+            self.sqs.send_message(QueueUrl=self.queue_url, MessageBody=f'task {i}')
+        bodies = []
+        consumer = self.consumer(lambda body, message: bodies.append(body), concurrency=4)
+        consumer.run(exit_when_idle=True)
+        self.assertEqual(sorted(bodies), sorted(f'task {i}' for i in range(15)))
+        self.assertEqual(consumer.metrics['deleted'], 15)
+        self.assertNotIn('DeleteMessage', self.api_calls)
+        self.assertLess(self.api_calls.count('DeleteMessageBatch'), 15)
+        self.assertEqual(self.queued(), 0)
+
+    def test_failed_message_is_redelivered(self):
+        self.sqs.send_message(QueueUrl=self.queue_url, MessageBody='flaky')
+        attempts = []
+
+        def handler(body, message):
+            attempts.append(message['Attributes']['ApproximateReceiveCount'])
+            if len(attempts) == 1:
+                raise RuntimeError("first attempt fails")
+
+        first = self.consumer(handler, visibility_timeout=1)
+        first.run(exit_when_idle=True)
+        self.assertEqual((first.metrics['failed'], first.metrics['deleted']), (1, 0))
+        self.assertEqual(self.queued(), 1)
+
+        time.sleep(1.2)  # let the visibility timeout run out
+        second = self.consumer(handler, visibility_timeout=1)
+        second.run(exit_when_idle=True)
+        self.assertEqual(attempts, ['1', '2'])
+        self.assertEqual(second.metrics['deleted'], 1)
+        self.assertEqual(self.queued(), 0)
+
+    def test_transport_error_on_receive_does_not_stop_the_consumer(self):
+        self.sqs.send_message(QueueUrl=self.queue_url, MessageBody='after outage')
+        receive = self.sqs.receive_message
+        outage = [EndpointConnectionError(endpoint_url=self.queue_url)]
+
+        def flaky_receive(**kwargs):
+            if outage:
+                raise outage.pop()
+            return receive(**kwargs)
+
+        bodies = []
+        consumer = self.consumer(lambda body, message: bodies.append(body))
+        with mock.patch.object(self.sqs, 'receive_message', side_effect=flaky_receive):
+            with mock.patch('python_library.utility_aws_pkg_chetanpatil.time.sleep'):
+                consumer.run(exit_when_idle=True)
+        self.assertEqual(bodies, ['after outage'])
+
+    def test_heartbeat_survives_transport_errors(self):
+        self.sqs.send_message(QueueUrl=self.queue_url, MessageBody='slow')
+        runs = []
+
+        def handler(body, message):
+            runs.append(body)
+            if len(runs) == 1:
+                time.sleep(3.5)
+
+        consumer = self.consumer(handler, visibility_timeout=2)
+        error = EndpointConnectionError(endpoint_url=self.queue_url)
+        with mock.patch.object(self.sqs, 'change_message_visibility_batch', side_effect=error) as extend:
+            consumer.run(exit_when_idle=True)
+        self.assertGreaterEqual(extend.call_count, 2)  # kept trying after the first error
+        self.assertEqual(self.queued(), 0)
+
+
+class ConsumeUtilityTasksCommandTests(AWSTestCase):
+    def test_command_drains_valid_tasks_and_leaves_garbage(self):
+        sqs = get_client('sqs')
+        queue_url = sqs.create_queue(QueueName='tasks')['QueueUrl']
+        message = build_task_message('utility.created', 1, 'gas', 2.5, '2025-01-01', 'a@example.com')
+        sqs.send_message(QueueUrl=queue_url, MessageBody=encode_task_message(message, compact=True))
+        sqs.send_message(QueueUrl=queue_url, MessageBody='{not json')
+        out = io.StringIO()
+        call_command('consume_utility_tasks', queue='tasks', wait_seconds=0, visibility_timeout=30,
+                     metrics_interval=0, exit_when_idle=True, stdout=out)
+        self.assertIn("'processed': 1", out.getvalue())
+        self.assertIn("'failed': 1", out.getvalue())
+        left = sqs.receive_message(QueueUrl=queue_url, VisibilityTimeout=0).get('Messages', [])
+        self.assertEqual(len(left), 0)  # still invisible after the failed attempt, not deleted
+        attributes = sqs.get_queue_attributes(QueueUrl=queue_url,
+                                              AttributeNames=['ApproximateNumberOfMessagesNotVisible'])
+        self.assertEqual(attributes['Attributes']['ApproximateNumberOfMessagesNotVisible'], '1')
@@ -0,0 +1,73 @@
+from datetime import date, datetime, timezone
+from unittest import mock
+
+from django.contrib.auth.models import User
+
+import utility_database
+from python_library.utility_aws_pkg_chetanpatil import TABLE_NAME, TIMESERIES_TABLE_NAME, aws
+from python_library.utility_record import UtilityRecord, timeseries_bound
+from utilities.management.commands import backfill_timeseries_records as backfill
+from utilities.models import Utility
+
+from .helpers import AWSTestCase
+
+
+class TimeseriesBoundTests(AWSTestCase):
+    def test_bounds_use_the_stored_date_format(self):
+        stamp = datetime(2025, 1, 31, 8, tzinfo=timezone.utc)
+        self.assertEqual(timeseries_bound(stamp), '2025-01-31 08:00:00+00:00')
+        self.assertEqual(timeseries_bound(date(2025, 1, 31)), '2025-01-31')
+        self.assertEqual(timeseries_bound('2025-01-31T08:00'), '2025-01-31 08:00')
+        self.assertEqual(timeseries_bound(' 2025-01-31 '), '2025-01-31')
+
+
+class QueryUtilityRecordsTests(AWSTestCase):
+    def setUp(self):
+        super().setUp()
+        utility_database.create_timeseries_table()
+        readings = [(1, 'gas', datetime(2025, 1, 30, 23, tzinfo=timezone.utc)),
+                    (2, 'gas', datetime(2025, 1, 31, 8, tzinfo=timezone.utc)),
+                    (3, 'electricity', datetime(2025, 1, 31, 20, tzinfo=timezone.utc)),
+                    (4, 'gas', datetime(2025, 2, 1, 0, tzinfo=timezone.utc))]
+        aws.put_timeseries_records(TIMESERIES_TABLE_NAME, [
+            UtilityRecord(pk, utility_type, 1.5, when, user_id=7) for pk, utility_type, when in readings
+        ])
+
+    def ids(self, items):
+        return [item['utility_id'] for item in items]
+
+    def test_iso_start_includes_the_whole_start_time(self):
+        items = aws.query_utility_records(TIMESERIES_TABLE_NAME, 7, start='2025-01-31T08:00:00')
+        self.assertEqual(self.ids(items), ['2', '3', '4'])
+
+    def test_end_day_covers_every_reading_on_that_day(self):
+        items = aws.query_utility_records(TIMESERIES_TABLE_NAME, 7, start=date(2025, 1, 31), end='2025-01-31')
+        self.assertEqual(self.ids(items), ['2', '3'])
+        items = aws.query_utility_records(TIMESERIES_TABLE_NAME, 7, end=date(2025, 1, 31), utility_type='gas')
+        self.assertEqual(self.ids(items), ['1', '2'])
+
+    def test_script_query_delegates_to_the_app(self):
+        self.assertIs(utility_database.record_cache, aws.record_cache)
+        items = utility_database.query_utility_records(7, start='2025-01-31T00:00', utype='gas')
+        self.assertEqual(self.ids(items), ['2', '4'])
+
+
+class BackfillTimeseriesTests(AWSTestCase):
+    def setUp(self):
+        super().setUp()
+        utility_database.create_utility_table()
+        utility_database.create_timeseries_table()
+
+    def test_rows_without_an_owner_are_skipped(self):
+        user = User.objects.create_user('alice', 'alice@example.com', 'pw')
+        when = datetime(2025, 1, 31, 8, tzinfo=timezone.utc)
+        owned = Utility.objects.create(user=user, type='gas', usage=2, date=when)
+        orphan = Utility.objects.create(user=None, type='gas', usage=3, date=when)
+        aws.add_utility_records(TABLE_NAME, [UtilityRecord.from_model(owned), UtilityRecord.from_model(orphan)])
+
+        # One segment on this thread: worker threads would not see the test's transaction
+        with mock.patch.object(backfill.connection, 'close'):
+            copied, skipped = backfill.Command().copy_segment(0, 1, dry_run=False)
+        self.assertEqual((copied, skipped), (1, 1))
+        items = aws.query_utility_records(TIMESERIES_TABLE_NAME, user.pk)
+        self.assertEqual([item['utility_id'] for item in items], [str(owned.pk)])
@@ -0,0 +1,30 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+
+from python_library.utility_messages import MessageFormatError, build_task_message
+from python_library.utility_record import UtilityRecord
+
+
+class UtilityRecordTests(SimpleTestCase):
+    def setUp(self):
+        self.date = datetime(2025, 1, 31, 8, tzinfo=timezone.utc)
+        self.record = UtilityRecord(42, 'gas', 12.1, self.date, 'read', user_id=7)
+
+    def test_items_store_usage_as_a_decimal(self):
+        item = self.record.to_item()
+        self.assertEqual(item['usage'], Decimal('12.1'))
+        self.assertEqual(UtilityRecord.from_item(item), self.record)
+        timeseries = self.record.to_item(timeseries=True)
+        self.assertEqual(timeseries['date_id'], '2025-01-31 08:00:00+00:00#42')
+        self.assertEqual(timeseries['user_type'], '7#gas')
+
+    def test_message_matches_build_task_message(self):
+        self.assertEqual(self.record.to_message('utility.created', 'a@example.com'),
+                         build_task_message('utility.created', 42, 'gas', 12.1, self.date, 'a@example.com'))
+        with self.assertRaises(MessageFormatError):
+            self.record.to_message('utility.renamed')
+
+    def test_payload_round_trip(self):
+        self.assertEqual(UtilityRecord.from_payload(self.record.to_payload()), self.record)
@@ -0,0 +1,19 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from utilities.models import Utility
+
+
+class DashboardFilterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'pw')
+        Utility.objects.create(user=self.user, type='gas', usage=12.5, date=timezone.now())
+        self.client.force_login(self.user)
+
+    def test_impossible_dates_are_ignored(self):
+        for params in ({'start': '2024-02-30'}, {'end': '2024-13-01'}, {'start': 'yesterday'}):
+            response = self.client.get(reverse('dashboard'), params)
+            self.assertEqual(response.status_code, 200, params)
+            self.assertEqual(len(response.context['utilities']), 1, params)
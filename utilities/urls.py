@@ -1,6 +1,6 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import api_views, views
 
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
@@ -18,4 +18,15 @@ urlpatterns = [
     path('create/', views.utility_create, name='utility_create'),
     path('edit/<int:pk>/', views.utility_edit, name='utility_edit'),
     path('delete/<int:pk>/', views.utility_delete, name='utility_delete'),
+    path('files/<int:pk>/', views.utility_file, name='utility_file'),
+    path('api/uploads/presign/', api_views.upload_presign, name='upload_presign'),
+    path('api/uploads/complete/', api_views.upload_complete, name='upload_complete'),
+    path('api/uploads/multipart/start/', api_views.multipart_start, name='multipart_start'),
+    path('api/uploads/multipart/parts/', api_views.multipart_parts, name='multipart_parts'),
+    path('api/uploads/multipart/complete/', api_views.multipart_complete, name='multipart_complete'),
+    path('api/uploads/multipart/abort/', api_views.multipart_abort, name='multipart_abort'),
+    path('api/imports/', api_views.import_create, name='import_create'),
+    path('api/imports/<int:pk>/', api_views.import_status, name='import_status'),
+    path('api/summary/', api_views.usage_summary, name='usage_summary'),
+    path('api/charts/usage/', api_views.usage_chart, name='usage_chart'),
 ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import User
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.signals import user_logged_in
@@ -10,80 +11,123 @@ from django.utils.encoding import force_bytes
 from django.core.mail import send_mail
 from django.conf import settings
 from django.dispatch import receiver
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
+from django.utils.http import urlencode
+from . import anomalies, blobs, digest, outbox, rollups
 from .models import Utility
 from .forms import UtilityForm
+from .pagination import filter_utilities, keyset_page
 from python_library.utility_aws_pkg_chetanpatil import (
-    upload_utility_file,
-    add_utility_record,
-    delete_utility_record,
-    send_utility_task,
+    generate_utility_file_url,
     create_utility_queue,
-    publish_utility_alert
 )
-from decimal import Decimal
-import boto3, os
-from botocore.exceptions import ClientError
-import json
-
-lambda_client = boto3.client('lambda', region_name='us-east-1')
-
-SNS_TOPIC_ARN = 'arn:aws:sns:us-east-1:263072075949:utility-alerts-topic-2025'
-sns = boto3.client('sns', region_name='us-east-1') 
+from python_library.utility_messages import encode_task_message
+from python_library.utility_record import UtilityRecord
 
 def generate_presigned_url(s3_key, expiration=3600):
-    s3_client = boto3.client('s3', region_name='us-east-1')
-    try:
-        url = s3_client.generate_presigned_url(
-            'get_object',
-            Params={
-                'Bucket': 'utility-management-files-2025',
-                'Key': s3_key
-            },
-            ExpiresIn=expiration
-        )
-        return url
-    except ClientError as e:
-        print(f"Error generating presigned URL: {e}")
-        return None
+    # Shared S3 client + TTL cache live in the AWS package
+    return generate_utility_file_url(s3_key, expiration)
 
-def send_admin_notification(subject, message):
-    try:
-        publish_utility_alert(SNS_TOPIC_ARN, f"{subject}\n\n{message}")
-        return True
-    except Exception:
-        return False
+def send_admin_notification(subject, message, kind='general'):
+    # Buffered and coalesced by utilities.digest; SNS is published off the request path
+    digest.record(kind, subject, message)
+    return True
 
 def send_user_utility_notification(user, action, utility):
-    try:
-        user_email = user.email
-        if not user_email:
-            return False
-        if action == 'created':
-            subject = f"Utility Record Created - {utility.type.title()}"
-            message = f"Hello {user.username},\nYour utility record was created."
-        elif action == 'edited':
-            subject = f"Utility Record Updated - {utility.type.title()}"
-            message = f"Hello {user.username},\nYour utility record was updated."
-        elif action == 'deleted':
-            subject = f"Utility Record Deleted - {utility.type.title()}"
-            message = f"Hello {user.username},\nYour utility record was deleted."
-        else:
-            return False
-        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user_email], fail_silently=False)
-        return True
-    except Exception:
+    # EMAIL_BACKEND queues the email in the outbox; it is sent after the transaction commits
+    user_email = user.email
+    if not user_email:
+        return False
+    if action == 'created':
+        subject = f"Utility Record Created - {utility.type.title()}"
+        message = f"Hello {user.username},\nYour utility record was created."
+    elif action == 'edited':
+        subject = f"Utility Record Updated - {utility.type.title()}"
+        message = f"Hello {user.username},\nYour utility record was updated."
+    elif action == 'deleted':
+        subject = f"Utility Record Deleted - {utility.type.title()}"
+        message = f"Hello {user.username},\nYour utility record was deleted."
+    else:
         return False
+    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user_email], fail_silently=False)
+    return True
+
+def queue_utility_task(event, utility, user):
+    # Structured envelope (python_library.utility_messages) instead of free text
+    message = UtilityRecord.from_model(utility).to_message(event, user.email)
+    body = encode_task_message(message, compact=settings.UTILITY_TASK_MESSAGE_COMPACT)
+    outbox.enqueue('sqs', {'queue': create_utility_queue(), 'body': body})
+
+def build_upload_key(utility_type, filename):
+    # All uploads live under uploads/{type}/ so the S3 trigger and Lambda can classify them
+    return f'uploads/{utility_type}/{filename}'
+
+def trigger_file_processor(s3_key, user_id, action):
+    # The processor Lambda is invoked by the outbox once the record is committed
+    outbox.enqueue('lambda', {'key': s3_key, 'user_id': user_id, 'action': action})
+
+def store_utility_file(request, instance, file_obj):
+    # Content-addressed upload (utilities.blobs): identical files are stored
+    # once and shared. Returns (blob, uploaded) or (None, False) on failure.
+    content_digest = blobs.content_hash(request, 'file', file_obj)
+    print(f"Storing {file_obj.name} as sha256 {content_digest}")
+    try:
+        blob, uploaded = blobs.store(
+            file_obj, instance.type, content_digest,
+            progress_callback=lambda sent: print(f"Uploaded {sent} of {file_obj.size} bytes for {file_obj.name}"),
+            user_id=request.user.id,
+        )
+        if blob is None:
+            print(f"Upload failed for: {file_obj.name}")
+        elif uploaded:
+            print(f"Upload successful: {blob.key}")
+        return blob, uploaded
+    except Exception as e:
+        print(f"Error during file upload: {e}")
+        return None, False
 
 @login_required
 def dashboard(request):
-    utilities = Utility.objects.filter(user=request.user)
-    
-    for utility in utilities:
-        if utility.file_s3_key:
-            utility.presigned_url = generate_presigned_url(utility.file_s3_key)
-    
-    return render(request, 'utilities/dashboard.html', {'utilities': utilities})
+    filters = {
+        'type': request.GET.get('type', ''),
+        'start': request.GET.get('start', ''),
+        'end': request.GET.get('end', ''),
+    }
+    if filters['type'] not in dict(Utility.UTILITY_TYPES):
+        filters['type'] = ''
+
+    utilities = filter_utilities(
+        Utility.objects.filter(user=request.user),
+        utility_type=filters['type'],
+        start=filters['start'],
+        end=filters['end'],
+    )
+    utilities, next_cursor = keyset_page(utilities, request.GET.get('cursor'))
+
+    # Keep the active filters on the pagination links
+    active_filters = {k: v for k, v in filters.items() if v}
+    next_query = urlencode({**active_filters, 'cursor': next_cursor}) if next_cursor else ''
+
+    return render(request, 'utilities/dashboard.html', {
+        'utilities': utilities,
+        'month_cards': rollups.current_month_cards(request.user),
+        'filters': filters,
+        'utility_types': Utility.UTILITY_TYPES,
+        'is_first_page': not request.GET.get('cursor'),
+        'first_query': urlencode(active_filters),
+        'next_query': next_query,
+    })
+
+@login_required
+def utility_file(request, pk):
+    # Presign on click instead of for every row while rendering the dashboard
+    utility = get_object_or_404(Utility, pk=pk, user=request.user)
+    if not utility.file_s3_key:
+        raise Http404("No file attached to this record")
+    url = generate_presigned_url(utility.file_s3_key)
+    if not url:
+        raise Http404("File link could not be generated")
+    return redirect(url)
 
 @login_required
 def utility_create(request):
@@ -92,61 +136,25 @@ def utility_create(request):
         if form.is_valid():
             instance = form.save(commit=False)
             
+            blob, uploaded = None, False
             if request.FILES.get('file'):
-                file_obj = request.FILES['file']
-                file_path = f'/tmp/{file_obj.name}'
-                
-                try:
-                    # Save file locally first
-                    with open(file_path, 'wb+') as f:
-                        for chunk in file_obj.chunks():
-                            f.write(chunk)
-                    
-                    # Upload to S3
-                    s3_key = f'uploads/{instance.type}/{file_obj.name}'
-                    print(f"Uploading to S3: {s3_key}")
-                    
-                    upload_success = upload_utility_file(file_path, s3_key)
-                    
-                    if upload_success:
-                        instance.file_s3_key = s3_key
-                        print(f"Upload successful: {s3_key}")
-
-                        # ========== LAMBDA INVOCATION HERE ==========
-                        payload = {
-                            'bucket': 'utility-management-files-2025',
-                            'key': s3_key,
-                            'user_id': request.user.id,
-                            'action': 'file_upload'
-                        }
-                        lambda_client.invoke(
-                            FunctionName='utility-file-processor',  # Use your Lambda function name or ARN
-                            InvocationType='Event',  # Async
-                            Payload=json.dumps(payload)
-                        )
-                        print("Lambda function triggered for file processing.")
-                        # ========== END LAMBDA INVOCATION ==========
-                    else:
-                        print(f"Upload failed for: {s3_key}")
-                        instance.file_s3_key = None
-                    
-                    # Clean up temp file
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                        
-                except Exception as e:
-                    print(f"Error during file upload: {e}")
-                    instance.file_s3_key = None
+                blob, uploaded = store_utility_file(request, instance, request.FILES['file'])
+                instance.file_blob = blob
+                instance.file_s3_key = blob.key if blob else None
             
             instance.user = request.user
-            instance.save()
-            
-            send_user_utility_notification(request.user, 'created', instance)
-            add_utility_record(instance.id, instance.type, Decimal(str(instance.usage)), str(instance.date), instance.notes or '')
-            
-            queue_url = create_utility_queue()
-            msg = f"New utility record created: type={instance.type}, usage={instance.usage}, date={instance.date}, id=util-{instance.id}, user_email={request.user.email}"
-            send_utility_task(queue_url, msg)
+            with transaction.atomic():
+                instance.save()
+                rollups.add_reading(request.user.id, instance.type, instance.date, instance.usage)
+                anomalies.check_reading(request.user, instance)
+                if blob:
+                    blobs.add_reference(blob)
+                if uploaded:
+                    # Reused blobs were processed when their bytes first arrived
+                    trigger_file_processor(blob.key, request.user.id, 'file_upload')
+                send_user_utility_notification(request.user, 'created', instance)
+                outbox.enqueue('dynamodb_put', UtilityRecord.from_model(instance).to_payload())
+                queue_utility_task('utility.created', instance, request.user)
             
             return redirect('dashboard')
     else:
@@ -157,40 +165,36 @@ def utility_create(request):
 def utility_edit(request, pk):
     utility = get_object_or_404(Utility, pk=pk, user=request.user)
     if request.method == 'POST':
+        # Captured before validation, which writes the new values onto the instance
+        old_reading = (utility.type, utility.date, utility.usage)
+        old_blob_id = utility.file_blob_id
         form = UtilityForm(request.POST, request.FILES, instance=utility)
         if form.is_valid():
             instance = form.save(commit=False)
+            blob, uploaded = None, False
             if request.FILES.get('file'):
-                file_obj = request.FILES['file']
-                file_path = f'/tmp/{file_obj.name}'
-                with open(file_path, 'wb+') as f:
-                    for chunk in file_obj.chunks():
-                        f.write(chunk)
-                s3_key = f'uploads/{instance.type}/{file_obj.name}'
-                upload_utility_file(file_path, s3_key)
-                instance.file_s3_key = s3_key
-                os.remove(file_path)
-                
-                # ========== LAMBDA INVOCATION HERE ==========
-                payload = {
-                    'bucket': 'utility-management-files-2025',
-                    'key': s3_key,
-                    'user_id': request.user.id,
-                    'action': 'file_edit'
-                }
-                lambda_client.invoke(
-                    FunctionName='utility-file-processor',
-                    InvocationType='Event',
-                    Payload=json.dumps(payload)
-                )
-                print("Lambda function triggered for file edit.")
-                # ========== END LAMBDA INVOCATION ==========
+                blob, uploaded = store_utility_file(request, instance, request.FILES['file'])
+                if blob:
+                    instance.file_blob = blob
+                    instance.file_s3_key = blob.key
             instance.user = request.user
-            instance.save()
-            send_user_utility_notification(request.user, 'edited', instance)
-            queue_url = create_utility_queue()
-            msg = f"Utility record edited: type={instance.type}, usage={instance.usage}, date={instance.date}, id=util-{instance.id}, user_email={request.user.email}"
-            send_utility_task(queue_url, msg)
+            with transaction.atomic():
+                instance.save()
+                new_reading = (instance.type, instance.date, instance.usage)
+                rollups.replace_reading(request.user.id, old_reading, new_reading)
+                anomaly = anomalies.replace(request.user.id, old_reading, new_reading)
+                if anomaly:
+                    anomalies.alert(request.user, [anomaly])
+                if blob:
+                    blobs.add_reference(blob)
+                    blobs.release(old_blob_id)
+                if uploaded:
+                    trigger_file_processor(blob.key, request.user.id, 'file_edit')
+                send_user_utility_notification(request.user, 'edited', instance)
+                # The date is part of the time-series key; the handler drops the old item
+                outbox.enqueue('dynamodb_put', dict(UtilityRecord.from_model(instance).to_payload(),
+                                                    previous_date=str(old_reading[1])))
+                queue_utility_task('utility.edited', instance, request.user)
             return redirect('dashboard')
     else:
         form = UtilityForm(instance=utility)
@@ -199,12 +203,14 @@ def utility_edit(request, pk):
 @login_required
 def utility_delete(request, pk):
     utility = get_object_or_404(Utility, pk=pk, user=request.user)
-    send_user_utility_notification(request.user, 'deleted', utility)
-    queue_url = create_utility_queue()
-    msg = f"Utility record deleted: type={utility.type}, usage={utility.usage}, date={utility.date}, id=util-{utility.id}, user_email={request.user.email}"
-    send_utility_task(queue_url, msg)
-    delete_utility_record(pk)
-    utility.delete()
+    with transaction.atomic():
+        send_user_utility_notification(request.user, 'deleted', utility)
+        queue_utility_task('utility.deleted', utility, request.user)
+        outbox.enqueue('dynamodb_delete', UtilityRecord.from_model(utility).to_payload())
+        utility.delete()
+        rollups.remove_reading(request.user.id, utility.type, utility.date, utility.usage)
+        anomalies.forget(request.user.id, utility.type, utility.usage)
+        blobs.release(utility.file_blob_id)
     return redirect('dashboard')
 
 def login_view(request):
@@ -268,7 +274,7 @@ def signup(request):
             )
             subject = "New User Registered"
             message = f"A new user has registered, username={user.username}, email={user.email}"
-            send_admin_notification(subject, message)
+            send_admin_notification(subject, message, kind='signup')
             login(request, user)
             return redirect('dashboard')
         except IntegrityError:
@@ -284,7 +290,7 @@ def signup(request):
 def notify_admin_on_login(sender, request, user, **kwargs):
     subject = "User Logged In"
     message = f"A user has logged in: {user.username}, {user.email}"
-    send_admin_notification(subject, message)
+    send_admin_notification(subject, message, kind='login')
 
 def custom_password_reset(request):
     if request.method == 'POST':
@@ -1,13 +1,22 @@
-import boto3
+from python_library.aws_clients import get_resource  # Shared boto3 resources, created on first use
+from python_library.utility_aws_pkg_chetanpatil import aws  # Its record cache and time-series query are shared
+from python_library.utility_record import UtilityRecord, usage_attribute  # One conversion per record, shared with the app
 from botocore.exceptions import ClientError
 
-dynamodb = boto3.resource('dynamodb')  # Connect to DynamoDB using default AWS credentials
 TABLE_NAME = 'UtilityRecords2025'       # Our DynamoDB table for storing all utility records
+TIMESERIES_TABLE_NAME = 'UtilityReadings2025'   # Same records laid out per user and date (see below)
+TYPE_INDEX = 'user-type-date-index'     # Per-user, per-type index on the time-series table
+record_cache = aws.record_cache  # The app's cache, so settings.UTILITY_RECORD_CACHE applies here too
 
-def create_utility_table():
-    # Creates a table for utility records if it doesn't already exist
+def create_utility_table(layout='legacy'):
+    # Creates a table for utility records if it doesn't already exist.
+    # layout='timeseries' creates UtilityReadings2025 instead: user_id partition
+    # key and "date#utility_id" sort key, so one user's readings between two
+    # dates are a single Query, plus a "user_id#type" index for one utility type
+    if layout == 'timeseries':
+        return create_timeseries_table()
     try:
-        table = dynamodb.create_table(
+        table = get_resource('dynamodb').create_table(
             TableName=TABLE_NAME,
             KeySchema=[{'AttributeName': 'utility_id', 'KeyType': 'HASH'}],  # Each record is uniquely identified by its utility_id
             AttributeDefinitions=[{'AttributeName': 'utility_id', 'AttributeType': 'S'}],  # Declares utility_id as a string
@@ -18,42 +27,84 @@ def create_utility_table():
     except ClientError as e:
         print(f"Table creation error: {e}")  # Helpful feedback if AWS blocks the table creation
 
+def create_timeseries_table():
+    try:
+        table = get_resource('dynamodb').create_table(
+            TableName=TIMESERIES_TABLE_NAME,
+            KeySchema=[
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'date_id', 'KeyType': 'RANGE'},  # "2025-01-31 08:00:00+00:00#42": sorts by date
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'date_id', 'AttributeType': 'S'},
+                {'AttributeName': 'user_type', 'AttributeType': 'S'},
+            ],
+            GlobalSecondaryIndexes=[{
+                'IndexName': TYPE_INDEX,
+                # Partitioned per user as well: a bare "type" key would put every
+                # user's gas readings on one hot partition
+                'KeySchema': [
+                    {'AttributeName': 'user_type', 'KeyType': 'HASH'},
+                    {'AttributeName': 'date_id', 'KeyType': 'RANGE'},
+                ],
+                'Projection': {'ProjectionType': 'ALL'},
+            }],
+            BillingMode='PAY_PER_REQUEST'  # Backfills and imports burst far past 1 WCU
+        )
+        table.wait_until_exists()
+        print(f"Table '{TIMESERIES_TABLE_NAME}' created in us-east-1.")
+    except ClientError as e:
+        print(f"Table creation error: {e}")
+
 def build_util_id(pk):
     return f'util-{pk}'  # Build a unique ID string using the record's primary key
 
 def add_utility_record(pk, utype, usage, date, notes):
-    table = dynamodb.Table(TABLE_NAME)
+    table = get_resource('dynamodb').Table(TABLE_NAME)
     util_id = build_util_id(pk)
-    table.put_item(Item={
-        'utility_id': util_id,        # Unique string for this record
-        'type': utype,                # Utility type (e.g., electricity, gas)
-        'usage': usage,               # How much was used (float or int)
-        'date': date,                 # When this usage entry was made
-        'notes': notes                # Any extra info the user added
-    })
+    # utility_id, type, usage (as a Decimal: DynamoDB has no floats), date, notes
+    table.put_item(Item=UtilityRecord(util_id, utype, usage, date, notes).to_item())
+    record_cache.invalidate(TABLE_NAME, [util_id])
     print(f"Record {util_id} added.")
 
 def get_utility_record(pk):
-    table = dynamodb.Table(TABLE_NAME)
     util_id = build_util_id(pk)
+    item = record_cache.get(TABLE_NAME, util_id)  # Repeated lookups skip DynamoDB
+    if item is not None:
+        return item
+    generation = record_cache.generation()
+    table = get_resource('dynamodb').Table(TABLE_NAME)
     # Fetch a single record by primary key (returns None if not found)
     item = table.get_item(Key={'utility_id': util_id}).get('Item')
+    if item is not None:
+        record_cache.set_many(TABLE_NAME, {util_id: item}, generation)
     print(f"Fetched: {item}")
     return item
 
 def update_utility_record(pk, updates):
-    table = dynamodb.Table(TABLE_NAME)
+    table = get_resource('dynamodb').Table(TABLE_NAME)
     util_id = build_util_id(pk)
     # Only updates the 'usage' field—change as needed for more fields
     table.update_item(
         Key={'utility_id': util_id},
         UpdateExpression="SET usage = :u",
-        ExpressionAttributeValues={':u': updates['usage']}  # expects a single value for 'usage'
+        ExpressionAttributeValues={':u': usage_attribute(updates['usage'])}  # expects a single value for 'usage'
     )
+    record_cache.invalidate(TABLE_NAME, [util_id])
     print(f"Record {util_id} updated.")
 
 def delete_utility_record(pk):
-    table = dynamodb.Table(TABLE_NAME)
+    table = get_resource('dynamodb').Table(TABLE_NAME)
     util_id = build_util_id(pk)
     table.delete_item(Key={'utility_id': util_id})  # Permanently removes the entry (danger: no undo)
+    record_cache.invalidate(TABLE_NAME, [util_id])
     print(f"Record {util_id} deleted.")
+
+def query_utility_records(user_id, start=None, end=None, utype=None):
+    # Readings of one user with start <= date <= end (end covers that whole
+    # day), optionally of one type, oldest first; same Query as the app uses
+    items = aws.query_utility_records(TIMESERIES_TABLE_NAME, user_id, start, end, utype)
+    if items is not None:
+        print(f"Fetched {len(items)} records for user {user_id}")
+    return items
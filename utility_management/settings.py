@@ -72,11 +72,46 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Uploads are hashed while they stream in (utilities.blobs) before the default
+# handlers buffer them
+FILE_UPLOAD_HANDLERS = [
+    'utilities.blobs.HashingUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Largest file accepted by presigned browser uploads (matches nginx client_max_body_size)
+UTILITY_UPLOAD_MAX_BYTES = 5000 * 1024 * 1024
+
+# Outbox delivery: 'thread' delivers right after commit on an in-process pool,
+# 'worker' leaves everything to `python manage.py run_outbox`
+OUTBOX_DISPATCH = 'thread'
+
+# Encode SQS task messages as positional arrays instead of JSON objects
+UTILITY_TASK_MESSAGE_COMPACT = False
+
+# Overrides for the shared boto3 clients (python_library.aws_clients), e.g.
+# {'max_pool_connections': 100, 'read_timeout': 30, 'max_attempts': 8}
+AWS_CLIENT_OPTIONS = {}
+
+# Read-through cache for DynamoDB utility records (python_library.record_cache).
+# 'shared_alias' names a CACHES entry shared by all workers (Redis/memcached);
+# leave it None to keep only the per-process tier.
+UTILITY_RECORD_CACHE = {
+    'ttl': 30,
+    'max_entries': 10000,
+    'shared_alias': None,
+    'shared_ttl': 300,
+}
+
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/login/'
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Outgoing mail is queued in the outbox (utilities.mail) and sent by the outbox
+# worker through MAIL_DELIVERY_BACKEND over a reused connection
+EMAIL_BACKEND = 'utilities.mail.QueuedEmailBackend'
+MAIL_DELIVERY_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
@@ -1,26 +1,35 @@
 # SQS basic utility functions for queued task processing in my Utility Management System.
 # These functions use boto3 to interact with Amazon Simple Queue Service (SQS).
 
-import boto3
+from python_library.aws_clients import get_client  # Shared boto3 clients, created on first use
+from python_library.utility_messages import MessageFormatError, decode_task_message
 
-sqs = boto3.client('sqs')  # Connect to AWS SQS using your current credentials
 QUEUE_NAME = 'utility-tasks-queue-2025'  # This is the name of the queue we'll use for all app tasks
 
 def create_utility_queue():
     # Create the SQS queue. If it already exists, AWS just returns its info.
-    url = sqs.create_queue(QueueName=QUEUE_NAME)['QueueUrl']  # Get URL (unique address) for queue operations
+    url = get_client('sqs').create_queue(QueueName=QUEUE_NAME)['QueueUrl']  # Get URL (unique address) for queue operations
     print(f"Queue URL: {url}")  # Print it for fast reference or troubleshooting
     return url
 
 def send_utility_task(queue_url, message):
     # Add a new message (task) to the SQS queue for later processing
-    sqs.send_message(QueueUrl=queue_url, MessageBody=message)  # SQS will store this for worker/Lambda pickup
+    get_client('sqs').send_message(QueueUrl=queue_url, MessageBody=message)  # SQS will store this for worker/Lambda pickup
     print(f"Sent: {message}")  # Confirm success so users/devs know it worked
 
 def receive_utility_task(queue_url):
-    # Pull one message from the queue (if present) for processing
-    messages = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=1)
+    # Long-poll for up to 10 messages at once (20s is the SQS maximum wait)
+    messages = get_client('sqs').receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10, WaitTimeSeconds=20)
+    handled = []
     for msg in messages.get('Messages', []):  # There might be 0 or more messages
-        print("Received:", msg['Body'])  # Show the message content
+        try:
+            task = decode_task_message(msg['Body'])  # Versioned envelope -> dict, no regex parsing
+        except MessageFormatError as e:
+            print(f"Skipping malformed message: {e}")  # Left on the queue for the DLQ/redrive policy
+            continue
+        print("Received:", task)  # Show the decoded task
         # This is where you would handle the message logic in a real app
-        sqs.delete_message(QueueUrl=queue_url, ReceiptHandle=msg['ReceiptHandle'])  # Remove from queue after handling
+        handled.append({'Id': str(len(handled)), 'ReceiptHandle': msg['ReceiptHandle']})
+    if handled:
+        get_client('sqs').delete_message_batch(QueueUrl=queue_url, Entries=handled)  # One call removes every handled message
+    # For continuous draining use: python manage.py consume_utility_tasks